@@ -22,10 +22,52 @@ def parse_arguments():
     # Optional audio file or mic
     parser.add_argument("--audio-source", choices=["mic", "file"], default=None,
                         help="Choose the audio source: 'mic' to record from microphone or 'file' for an audio file.")
+    parser.add_argument("--audio-file", default=None,
+                        help="Audio file to send with --audio-source file: WAV, or any format ffmpeg reads.")
+
+    # Stream microphone audio while capturing
+    parser.add_argument("--stream-input", action="store_true",
+                        help="Stream microphone audio to the server as it is captured instead of after you stop speaking.")
+
+    # Audio format for input and output audio
+    parser.add_argument("--audio-format", choices=["pcm16", "g711_ulaw", "g711_alaw"], default="pcm16",
+                        help="Audio format for both directions. G.711 is 8kHz telephony audio at a sixth of the bandwidth.")
+
+    # Barge-in
+    parser.add_argument("--barge-in", action="store_true",
+                        help="Keep listening while the assistant speaks and interrupt it when you start talking "
+                             "(use headphones, so the microphone does not pick up the assistant). With --stream-input "
+                             "the server's VAD detects the turns and the interruptions.")
+
+    # Playback jitter buffer
+    parser.add_argument("--underrun-probability", type=float, default=0.01,
+                        help="Share of audio deltas allowed to arrive too late for playback. Lower values buffer more "
+                             "audio before playing, higher values start sooner but glitch more on jittery links.")
+    parser.add_argument("--concealment", choices=["fade", "silence"], default="fade",
+                        help="How playback gaps are filled when audio arrives late.")
+
+    # Reconnection
+    parser.add_argument("--reconnect-attempts", type=int, default=5,
+                        help="Attempts to reconnect and resume the conversation when the connection drops (0 disables).")
+    parser.add_argument("--standby-connection", action="store_true",
+                        help="Keep a second connection open to fail over to without a new handshake.")
+
+    # Per-turn latency timeline
+    parser.add_argument("--turn-metrics", action="store_true",
+                        help="Log the latency timeline of every turn and print a breakdown when exiting.")
+    parser.add_argument("--turn-metrics-file", default=None,
+                        help="Append the latency timeline of every turn to this file, one JSON object per line.")
+
+    # Event-loop lag monitor
+    parser.add_argument("--loop-monitor", action="store_true",
+                        help="Measure event-loop lag and log what blocked the loop whenever it stalls for over 100 ms.")
 
     # System prompt and voice parameters
     parser.add_argument("--system-prompt", default=DEFAULT_SYSTEM_MESSAGE, help="Set a custom system prompt.")
     parser.add_argument("--voice", default=DEFAULT_VOICE, help="Set the voice for audio responses.")
 
     # Parse arguments
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.audio_source == "file" and not args.audio_file:
+        parser.error("--audio-source file needs --audio-file")
+    return args
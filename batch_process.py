@@ -0,0 +1,295 @@
+"""
+Offline batch mode: send a directory of recorded audio files through a bounded pool of realtime sessions.
+
+Every file is streamed as one user utterance in a fresh conversation, and the assistant's transcript and audio are
+written next to each other in the output directory: <file>.txt and <file>.wav, under the file's path relative to the
+input directory, extension included, so calls/a.wav and calls/a.mp3 give a.wav.txt and a.mp3.txt. Finished files are
+appended to a state file as they complete, so a batch that crashed or was interrupted picks up where it left off
+when run again; files that failed are retried. At the end, throughput is reported in files per minute and in hours
+of audio processed per hour.
+
+Run from the repository root:
+    python batch_process.py calls/ --output-dir transcripts/ --concurrency 8
+    python batch_process.py manifest.txt --output-dir transcripts/ --input-transcription whisper-1
+    python batch_process.py calls/ --output-dir /tmp/out --mock
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import wave
+from dataclasses import dataclass
+from client.audio.audio_formats import AUDIO_FORMATS, PCM16, sample_rate_for
+from client.audio.audio_message_sender import UPLOAD_SPEED
+from client.audio.audio_sinks import CallbackSink
+from client.realtime_session import SessionConfig, SessionManager
+from mock_realtime_server import ResponseScript, start_mock_server
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Audio files picked up from an input directory
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".webm")
+
+# Name of the resume state file in the output directory
+STATE_FILE = "batch_state.jsonl"
+
+# Seconds to wait after the response for the transcription of the caller's audio, which may come later
+TRANSCRIPTION_TIMEOUT = 30.0
+
+@dataclass
+class BatchFile:
+    """One input file and where its outputs go."""
+    path: str
+    name: str   # input path relative to the common root, extension included; the outputs add theirs to it
+    size: int
+    mtime: float
+
+    @property
+    def key(self):
+        """Identifies this version of the file in the state file: a file changed since it was done is done again."""
+        return f"{self.path}:{self.size}:{self.mtime:.0f}"
+
+def find_files(source, extensions=AUDIO_EXTENSIONS):
+    """
+    List the files of a batch: the audio files under a directory, or the files listed in a manifest, one path per
+    line (relative to the manifest, # for comments). Outputs are named after the path relative to the common root,
+    so every file gets its own. A file listed twice is processed once.
+    """
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(directory, name)
+                       for directory, _, names in os.walk(source)
+                       for name in names if name.lower().endswith(extensions))
+        root = source
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source) as f:
+            lines = [line.strip() for line in f]
+        paths = [os.path.join(base, line) for line in lines if line and not line.startswith("#")]
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths]) if paths else base
+
+    files = []
+    for path in dict.fromkeys(os.path.abspath(path) for path in paths):
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logger.warning(f"Skipping {path}: {e}")
+            continue
+        name = os.path.relpath(path, os.path.abspath(root))
+        files.append(BatchFile(path, name, stat.st_size, stat.st_mtime))
+    return files
+
+class BatchState:
+    """
+    Append-only JSON-lines record of the files done, one line per file, flushed to disk as each one completes.
+    The last record of a file wins; only files whose last record is "done" are skipped when the batch is resumed.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # the last line of a crashed run may be cut short
+                        continue
+                    self.records[record["key"]] = record
+        self._file = open(path, "a")
+
+    def is_done(self, batch_file):
+        return self.records.get(batch_file.key, {}).get("status") == "done"
+
+    def record(self, batch_file, status, **details):
+        record = {"key": batch_file.key, "path": batch_file.path, "name": batch_file.name, "status": status, **details}
+        self.records[batch_file.key] = record
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+class WavWriter:
+    """Writes the assistant audio of one file to <name>.wav.part as it arrives, renamed to <name>.wav once done."""
+    def __init__(self, path, sample_rate):
+        self.path = path
+        self.part_path = path + ".part"
+        self.bytes = 0
+        self._wav = wave.open(self.part_path, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, pcm_audio, item_id=None):
+        self._wav.writeframes(pcm_audio)
+        self.bytes += len(pcm_audio)
+
+    def commit(self):
+        self._wav.close()
+        os.replace(self.part_path, self.path)
+
+    def discard(self):
+        self._wav.close()
+        os.remove(self.part_path)
+
+def write_text(path, text):
+    """Write a text file in one go, so a crash never leaves half of it behind."""
+    with open(path + ".part", "w") as f:
+        f.write(text)
+    os.replace(path + ".part", path)
+
+async def process_file(manager, config, batch_file, output_dir, max_speed):
+    """Send one file in its own session and write its outputs. Returns the details recorded in the state file."""
+    base = os.path.join(output_dir, batch_file.name)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    rate = sample_rate_for(config.audio_format)
+    writer = WavWriter(base + ".wav", rate) if "audio" in config.modalities else None
+    caller = {"transcript": None, "done": asyncio.Event()}
+
+    def on_event(session, event):
+        event_type = event.get("type")
+        if event_type == "conversation.item.input_audio_transcription.completed":
+            caller["transcript"] = event.get("transcript", "")
+            caller["done"].set()
+        elif event_type == "conversation.item.input_audio_transcription.failed":
+            caller["done"].set()
+
+    sink = CallbackSink(writer.write if writer else lambda *_: None, sample_rate=rate)
+    session = None
+    started = time.perf_counter()
+    try:
+        # a fresh conversation per file, so one call does not end up in the context of the next
+        session = await manager.open(config, sink, on_event=on_event)
+        result = await session.send_audio_file(batch_file.path, max_speed)
+        if result["status"] != "completed":
+            raise RuntimeError(f"response {result['status']}")
+        if config.input_transcription:
+            try:
+                await asyncio.wait_for(caller["done"].wait(), TRANSCRIPTION_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"{batch_file.name}: no transcription of the caller's audio.")
+    except BaseException:
+        if writer is not None:
+            writer.discard()
+        raise
+    finally:
+        if session is not None:
+            await manager.close(session.id)
+
+    lines = []
+    if caller["transcript"] is not None:
+        lines.append(f"Caller: {caller['transcript'].strip()}")
+    lines.append(f"Assistant: {result['transcript'].strip()}")
+    write_text(base + ".txt", "\n\n".join(lines) + "\n")
+    if writer is not None:
+        writer.commit()
+    return {
+        "audio_seconds": result["input_bytes"] / (rate * 2),
+        "response_audio_seconds": writer.bytes / (rate * 2) if writer else 0.0,
+        "seconds": time.perf_counter() - started,
+        "response_id": result["id"],
+    }
+
+async def worker(queue, manager, config, state, args, totals):
+    """Take files off the queue until it is empty, retrying each one up to args.retries times."""
+    while True:
+        try:
+            batch_file = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        for attempt in range(args.retries + 1):
+            try:
+                details = await process_file(manager, config, batch_file, args.output_dir, args.max_speed)
+            except Exception as e:
+                if attempt < args.retries:
+                    logger.warning(f"{batch_file.name}: {e!r}, retrying.")
+                    await asyncio.sleep(args.retry_delay * 2 ** attempt)
+                    continue
+                logger.error(f"{batch_file.name}: failed: {e!r}")
+                state.record(batch_file, "failed", error=repr(e))
+                totals["failed"] += 1
+            else:
+                state.record(batch_file, "done", **details)
+                totals["done"] += 1
+                totals["audio_seconds"] += details["audio_seconds"]
+                print(f"[{totals['done'] + totals['failed']}/{totals['pending']}] {batch_file.name}: "
+                      f"{details['audio_seconds']:.1f} s of audio in {details['seconds']:.1f} s")
+            break
+
+async def run(args):
+    files = find_files(args.input, tuple(args.extensions.split(",")))
+    os.makedirs(args.output_dir, exist_ok=True)
+    state = BatchState(args.state or os.path.join(args.output_dir, STATE_FILE))
+    pending = [batch_file for batch_file in files if not state.is_done(batch_file)]
+    print(f"{len(files)} files, {len(files) - len(pending)} already done, {len(pending)} to process "
+          f"with {args.concurrency} sessions")
+
+    server = None
+    url = args.url
+    if args.mock:
+        server, url = start_mock_server(ResponseScript(audio_chunks=args.audio_chunks, chunk_ms=args.chunk_ms,
+                                                       delta_interval=args.delta_interval_ms / 1000))
+    config = SessionConfig(modalities=["text"] if args.text_only else ["text", "audio"], voice=args.voice,
+                           system_message=args.system_message, audio_format=args.audio_format,
+                           turn_detection=None, url=url, connect_retries=args.retries + 1,
+                           response_timeout=args.response_timeout, input_transcription=args.input_transcription)
+    queue = asyncio.Queue()
+    for batch_file in pending:
+        queue.put_nowait(batch_file)
+    totals = {"pending": len(pending), "done": 0, "failed": 0, "audio_seconds": 0.0}
+
+    started = time.perf_counter()
+    try:
+        async with SessionManager(max_sessions=args.concurrency, connect_concurrency=args.concurrency) as manager:
+            await asyncio.gather(*(worker(queue, manager, config, state, args, totals)
+                                   for _ in range(min(args.concurrency, len(pending)))))
+    finally:
+        state.close()
+        if server is not None:
+            server.terminate()
+            server.wait()
+    wall_time = time.perf_counter() - started
+
+    print(f"\n{totals['done']} files done, {totals['failed']} failed in {wall_time:.1f} s")
+    if totals["done"] and wall_time > 0:
+        print(f"Throughput: {totals['done'] / wall_time * 60:.1f} files/min, "
+              f"{totals['audio_seconds'] / wall_time:.1f} audio-hours/hour "
+              f"({totals['audio_seconds'] / 3600:.2f} h of audio)")
+    return totals
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Send a batch of audio files through concurrent realtime sessions.")
+    parser.add_argument("input", help="Directory of audio files, or a manifest listing one file per line.")
+    parser.add_argument("--output-dir", required=True, help="Directory for the transcripts and assistant audio.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Sessions running at once.")
+    parser.add_argument("--state", help=f"Resume state file, by default {STATE_FILE} in the output directory.")
+    parser.add_argument("--extensions", default=",".join(AUDIO_EXTENSIONS),
+                        help="Comma-separated extensions of the files picked up from a directory.")
+    parser.add_argument("--audio-format", choices=AUDIO_FORMATS, default=PCM16, help="Session audio format.")
+    parser.add_argument("--voice", default="alloy", help="Assistant voice.")
+    parser.add_argument("--system-message", default="You are a helpful assistant.", help="Session instructions.")
+    parser.add_argument("--text-only", action="store_true", help="Ask for text responses only, without audio.")
+    parser.add_argument("--input-transcription", help="Also transcribe the caller's audio with this model, "
+                                                      "e.g. whisper-1.")
+    parser.add_argument("--max-speed", type=float, default=UPLOAD_SPEED,
+                        help="Upload speed limit per file as a multiple of real time, 0 for none.")
+    parser.add_argument("--response-timeout", type=float, default=300.0, help="Seconds to wait for each response.")
+    parser.add_argument("--retries", type=int, default=2, help="Attempts after the first for a file that fails.")
+    parser.add_argument("--retry-delay", type=float, default=2.0, help="Seconds before the first retry, doubling.")
+    parser.add_argument("--url", help="Realtime endpoint, by default the configured one.")
+    parser.add_argument("--mock", action="store_true", help="Run against a local mock server instead.")
+    parser.add_argument("--audio-chunks", type=int, default=10, help="Mock server: audio deltas per response.")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Mock server: audio carried by each delta.")
+    parser.add_argument("--delta-interval-ms", type=float, default=0.0, help="Mock server: pause between deltas.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s:%(name)s:%(message)s')
+    try:
+        asyncio.run(run(parse_arguments()))
+    except KeyboardInterrupt:
+        print("\nInterrupted, run again to resume the batch.")
@@ -0,0 +1,61 @@
+"""
+Benchmark the receive-side path of one response.audio.delta frame, from websocket text to bytes handed to the device.
+
+Run from the repository root:
+    python -m benchmarks.bench_audio_delta_path --chunk-ms 200
+"""
+import argparse
+import base64
+import json
+import os
+import tracemalloc
+import numpy as np
+from client.audio.audio_decoder import decode_audio
+from client.event_decoder import decode_event
+from benchmarks.common import time_per_call
+
+def legacy_path(frame):
+    """json.loads, decode, frombuffer().tobytes(), accumulate in a bytearray and copy it out for stream.write."""
+    event = json.loads(frame)
+    decoded = base64.b64decode(event["delta"])
+    pcm = np.frombuffer(decoded, dtype=np.int16).tobytes()
+    buffer = bytearray()
+    buffer.extend(pcm)
+    return bytes(buffer)
+
+def current_path(frame):
+    """Fast-path event decode, base64 decode, and the decoded bytes go to the device untouched."""
+    event = decode_event(frame)
+    return decode_audio(event["delta"])
+
+def transient_bytes(func, frame, repeat=20):
+    """Return the peak memory allocated while handling one frame, beyond what the frame itself holds."""
+    func(frame)
+    tracemalloc.start()
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = func(frame)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        del result
+    tracemalloc.stop()
+    return peak
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark handling of audio delta frames.")
+    parser.add_argument("--chunk-ms", type=int, default=200, help="Audio duration per delta in milliseconds.")
+    args = parser.parse_args()
+
+    pcm = os.urandom(24000 * 2 * args.chunk_ms // 1000)
+    frame = json.dumps({"type": "response.audio.delta", "event_id": "event_1", "response_id": "resp_1",
+                        "item_id": "item_1", "output_index": 0, "content_index": 0,
+                        "delta": base64.b64encode(pcm).decode()})
+    assert legacy_path(frame) == current_path(frame) == pcm
+
+    print(f"Audio delta of {args.chunk_ms} ms: {len(pcm)} bytes of PCM, {len(frame)} byte frame")
+    print(f"{'path':<16}{'per delta':>14}{'peak transient':>18}{'x payload':>12}")
+    for label, func in (("legacy", legacy_path), ("current", current_path)):
+        per_delta = time_per_call(func, frame, number=500)
+        transient = transient_bytes(func, frame)
+        print(f"{label:<16}{per_delta * 1e6:>11.1f} us{transient:>16} B{transient / len(pcm):>12.1f}")
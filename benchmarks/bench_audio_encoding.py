@@ -0,0 +1,122 @@
+"""
+Benchmark how long sending recorded utterances stalls the event loop: several sessions each send one utterance as a
+conversation.item.create frame at the same time, while a task sleeping 1 ms at a time records how late it wakes up,
+which is how late an incoming audio delta would be handled.
+The previous send_audio_chunk, which base64 encoded the audio and ran json.dumps over it on the event loop, is
+compared with the current one, which builds the frame around the base64 audio on a worker thread, each with and
+without permessage-deflate, which websockets negotiates by default and runs inside send() on the event loop.
+The frames go to a server in its own process that discards them. The run fails if the two send different frames, or
+if the current path stalls the loop for longer than the previous one, with or without deflate.
+
+Run from the repository root:
+    python -m benchmarks.bench_audio_encoding --seconds 30 --sessions 4
+"""
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import time
+import numpy as np
+import websockets
+from client.audio.audio_message_sender import send_audio_chunk
+from client.audio.audio_payloads import encode_audio_item
+from client.connection_handler import WRITE_LIMIT
+from client.loop_monitor import LoopMonitor
+from mock_realtime_server import free_port
+from benchmarks.common import print_histograms, print_summary
+
+RATE = 24000
+
+async def previous_send_audio_chunk(ws, audio_data, rate, channels, audio_format="pcm16"):
+    """The previous send_audio_chunk for audio already at the session's rate, encoded on the event loop."""
+    await ws.send(json.dumps({
+        "type": "conversation.item.create",
+        "item": {"type": "message", "role": "user",
+                 "content": [{"type": "input_audio", "audio": base64.b64encode(audio_data).decode()}]},
+    }))
+
+# name -> (sender, permessage-deflate)
+PATHS = {
+    "before: on the loop, deflate": (previous_send_audio_chunk, "deflate"),
+    "on the loop, no deflate": (previous_send_audio_chunk, None),
+    "worker thread, deflate": (send_audio_chunk, "deflate"),
+    "now: worker thread, no deflate": (send_audio_chunk, None),
+}
+
+def run_sink_server(port):
+    """Accept connections and discard every frame, in a process of its own."""
+    async def discard(ws, path=None):
+        async for _ in ws:
+            pass
+
+    async def serve():
+        async with websockets.serve(discard, "127.0.0.1", port, max_size=None):
+            await asyncio.Future()
+
+    asyncio.run(serve())
+
+def utterance(seconds):
+    """PCM16 speech-like audio: a wavering tone with noise."""
+    t = np.arange(int(seconds * RATE)) / RATE
+    audio = 6000 * np.sin(2 * np.pi * (180 + 40 * np.sin(2 * np.pi * 3 * t)) * t)
+    return (audio + np.random.default_rng(0).normal(0, 300, len(t))).astype(np.int16).tobytes()
+
+async def run_path(url, sender, compression, pcm_audio, sessions, rounds):
+    """Send the utterance from every session at once, rounds times. Returns the loop lags and the send times."""
+    connections = [await websockets.connect(url, compression=compression, max_size=None, write_limit=WRITE_LIMIT)
+                   for _ in range(sessions)]
+    monitor = LoopMonitor(interval=0.001, stall_threshold=float("inf"), capture_stacks=False)
+    send_times = []
+    monitor.start()
+    try:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            await asyncio.gather(*(sender(ws, pcm_audio, RATE, 1) for ws in connections))
+            send_times.append(time.perf_counter() - started)
+            await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+        for ws in connections:
+            await ws.close()
+    return monitor.lag, send_times
+
+async def run_benchmark(url, pcm_audio, sessions, rounds):
+    return {name: await run_path(url, sender, compression, pcm_audio, sessions, rounds)
+            for name, (sender, compression) in PATHS.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark event-loop stalls while sending recorded utterances.")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Length of each utterance.")
+    parser.add_argument("--sessions", type=int, default=4, help="Sessions sending at the same time.")
+    parser.add_argument("--rounds", type=int, default=5, help="Times every session sends its utterance.")
+    args = parser.parse_args()
+
+    pcm_audio = utterance(args.seconds)
+    previous_frame = json.dumps({
+        "type": "conversation.item.create",
+        "item": {"type": "message", "role": "user",
+                 "content": [{"type": "input_audio", "audio": base64.b64encode(pcm_audio).decode()}]},
+    })
+    assert encode_audio_item(pcm_audio, RATE, 1) == previous_frame, "the frames differ"
+
+    port = free_port()
+    server = multiprocessing.Process(target=run_sink_server, args=(port,), daemon=True)
+    server.start()
+    try:
+        time.sleep(0.5)
+        results = asyncio.run(run_benchmark(f"ws://127.0.0.1:{port}", pcm_audio, args.sessions, args.rounds))
+    finally:
+        server.terminate()
+        server.join()
+
+    print(f"{args.sessions} sessions sending a {args.seconds:g} s utterance ({len(previous_frame) / 2 ** 20:.1f} MB "
+          f"frame) at once, {args.rounds} rounds")
+    print_histograms("Event-loop lag, 1 ms sleeps", {name: lag for name, (lag, _) in results.items()})
+    print_summary("Time to send every session's utterance",
+                  {name: send_times for name, (_, send_times) in results.items()})
+
+    before, inline, now = (results[name][0] for name in ("before: on the loop, deflate", "on the loop, no deflate",
+                                                         "now: worker thread, no deflate"))
+    assert now.max < before.max, "sending stalls the event loop as long as before"
+    assert now.max < inline.max, "encoding on a worker thread does not shorten the stalls"
@@ -0,0 +1,214 @@
+"""
+Benchmark barge-in: while the assistant is speaking the mock server reports that the user started talking, and the
+client has to silence playback, cancel the response and truncate the item at the audio actually played.
+The run fails if playback is not silenced within one device period or the truncation point is off.
+Then main() itself runs with a simulated microphone, once with the local VAD and once streaming to the server's VAD
+(--stream-input): the user asks a question and talks over the answer. The run fails unless the microphone picks the
+user up while the assistant talks, the answer is cut and truncated, and the next answer follows.
+
+Run from the repository root:
+    python -m benchmarks.bench_barge_in --trials 10
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import random
+import time
+import main as client_main
+import client.audio.audio_playback as audio_playback
+from client.barge_in import BargeIn, SOURCE_LOCAL_VAD, SOURCE_SERVER_VAD
+from client.connection_handler import connect_to_server, close_connection
+from client.session import send_session_update
+from client.text_message_sender import send_text_message
+from mock_realtime_server import MockRealtimeServer, ResponseScript, SAMPLE_RATE
+from benchmarks.common import SimulatedMicrophone, SimulatedOutputDevice, print_summary
+
+async def wait_for(predicate, timeout=10.0):
+    """Poll predicate until it is true."""
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("Condition not reached in time.")
+        await asyncio.sleep(0.002)
+
+async def run_benchmark(trials, script, seed=0):
+    """Interrupt the assistant once per trial and return the measurements in seconds, and the truncation errors."""
+    rng = random.Random(seed)
+    results = {"speech_started_to_silence": [], "interrupt_to_silence": [], "speech_started_to_cancel": [],
+               "speech_started_to_truncate": []}
+    truncation_errors = []
+    devices = []
+
+    def open_device(**kwargs):
+        devices.append(SimulatedOutputDevice(**kwargs))
+        return devices[-1]
+
+    playback_thread = audio_playback.start_playback_thread(stream_factory=open_device)
+    modalities = ["text", "audio"]
+
+    async with MockRealtimeServer(script=script) as server:
+        ws = await connect_to_server(url=server.url, retry_count=1)
+        if ws is None:
+            raise RuntimeError("Could not connect to the mock server.")
+        barge_in = BargeIn(ws, audio_playback.interrupt_playback, audio_playback.is_playback_active)
+        state = {"response_started": False, "exit_requested": False, "failure_count": 0, "barge_in": barge_in}
+        message_queue = asyncio.Queue()
+        await send_session_update(ws, modalities, "alloy", "benchmark")
+        receive_task = asyncio.create_task(client_main.receive_messages(ws, True, message_queue, modalities, state))
+
+        try:
+            await wait_for(lambda: devices)
+            device = devices[0]
+            block = device.blocksize / device.samplerate
+            for _ in range(trials):
+                device.first_audible_at = None
+                device.audible_frames = 0
+                received_before = len(server.received)
+
+                # let the assistant talk for a while, then talk over it
+                await send_text_message(ws, modalities, "Tell me something long.", "benchmark", "alloy")
+                talk_for = rng.uniform(0.2, 1.0)
+                await wait_for(lambda: device.first_audible_at is not None
+                               and time.perf_counter() - device.first_audible_at >= talk_for)
+                interrupted = len(barge_in.interruptions)
+                emitted_at = time.perf_counter()
+                emitted_monotonic = await server.emit_speech_started()
+                await wait_for(lambda: len(barge_in.interruptions) > interrupted)
+                record = barge_in.interruptions[-1]
+
+                # wait for the device to go quiet and the turn to close
+                await asyncio.sleep(4 * block)
+                while await message_queue.get() != client_main.SIGNAL_PROMPT:
+                    pass
+
+                engine = audio_playback.playback_engine
+                results["interrupt_to_silence"].append(engine.flush_latencies[-1])
+                results["speech_started_to_silence"].append(device.last_audible_at + block - emitted_at)
+                for event in server.received[received_before:]:
+                    if event["type"] == "response.cancel":
+                        results["speech_started_to_cancel"].append(event["_received_at"] - emitted_monotonic)
+                    elif event["type"] == "conversation.item.truncate":
+                        results["speech_started_to_truncate"].append(event["_received_at"] - emitted_monotonic)
+                        assert event["audio_end_ms"] == record["audio_end_ms"]
+
+                # the truncation point is what the device pulled, up to the partial blocks at either end
+                heard_ms = device.audible_frames * 1000 / SAMPLE_RATE
+                truncation_errors.append(record["audio_end_ms"] - heard_ms)
+        finally:
+            receive_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await receive_task
+            with contextlib.redirect_stdout(io.StringIO()):
+                await close_connection(ws)
+            audio_playback.stop_playback_thread(playback_thread)
+
+    return results, truncation_errors, block
+
+class LogRecords(logging.Handler):
+    """Keeps the messages logged to a logger while it is attached."""
+    def __init__(self, name):
+        super().__init__(logging.INFO)
+        self.messages = []
+        self.logger = logging.getLogger(name)
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+    def __enter__(self):
+        self._saved = self.logger.level, self.logger.propagate
+        self.logger.addHandler(self)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        return self
+
+    def __exit__(self, *exc_info):
+        self.logger.removeHandler(self)
+        level, self.logger.propagate = self._saved
+        self.logger.setLevel(level)
+
+async def run_main_flow(stream_input, script, talk_after=0.5, talk_for=1.0):
+    """
+    Run main() with --barge-in against the mock server, with a simulated microphone and output device: the user asks
+    a question, and talks over the answer talk_after seconds into it. Returns the barge-in log messages, the seconds
+    from the user talking over the answer to playback going silent, and the events the server received.
+    """
+    outputs, microphones = [], []
+
+    def open_device(**kwargs):
+        outputs.append(SimulatedOutputDevice(**kwargs))
+        return outputs[-1]
+
+    def open_microphone(**kwargs):
+        microphones.append(SimulatedMicrophone(**kwargs))
+        return microphones[-1]
+
+    async with MockRealtimeServer(script=script) as server:
+        with LogRecords("client.barge_in") as barge_ins:
+            task = asyncio.create_task(client_main.main(
+                ["text", "audio"], True, "mic", "benchmark", "alloy", stream_input, barge_in=True, url=server.url,
+                stream_factory=open_device, input_stream_factory=open_microphone))
+            try:
+                await wait_for(lambda: outputs and microphones)
+                device, microphone = outputs[0], microphones[0]
+                block = device.blocksize / device.samplerate
+
+                # ask, and talk over the answer
+                microphone.talk(talk_for)
+                await wait_for(lambda: device.first_audible_at is not None
+                               and time.perf_counter() - device.first_audible_at >= talk_after)
+                microphone.talk(talk_for)
+                talked_at, stopped_at = microphone.talks[-1]
+                await wait_for(lambda: barge_ins.messages)
+                await asyncio.sleep(4 * block)
+                silence = device.last_audible_at + block - talked_at
+
+                # the conversation carries on: the next answer is heard
+                await wait_for(lambda: device.last_audible_at > stopped_at + block)
+            finally:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+    return barge_ins.messages, silence, server.received
+
+async def check_main_flow(script):
+    """Run main()'s turn flow with either VAD and check the barge-in. Returns the seconds until silence per mode."""
+    silences = {}
+    for stream_input, source in ((False, SOURCE_LOCAL_VAD), (True, SOURCE_SERVER_VAD)):
+        messages, silence, received = await run_main_flow(stream_input, script)
+        types = [event["type"] for event in received]
+        assert any(f"Barge-in ({source})" in message for message in messages), f"{source} did not interrupt"
+        assert "conversation.item.truncate" in types, f"{source}: the answer was not truncated"
+        if stream_input:
+            # the server detects the turns in the streamed audio and answers by itself
+            assert "response.create" not in types and "input_audio_buffer.commit" not in types
+        else:
+            assert types.count("response.create") == 2, "the client did not ask for the next answer"
+        assert silence < 0.5, f"{source}: the answer kept playing after the user talked over it"
+        silences[f"main(), {source}"] = [silence]
+    return silences
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark barge-in against the mock realtime server.")
+    parser.add_argument("--trials", type=int, default=10, help="Number of interruptions.")
+    parser.add_argument("--audio-chunks", type=int, default=30, help="Audio deltas per response.")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Audio duration per delta in milliseconds.")
+    parser.add_argument("--delta-interval", type=float, default=0.05, help="Server delay between deltas.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    script = ResponseScript(audio_chunks=args.audio_chunks, chunk_ms=args.chunk_ms, delta_interval=args.delta_interval)
+    with contextlib.redirect_stdout(io.StringIO()):
+        measurements, errors, block = asyncio.run(run_benchmark(args.trials, script))
+        main_flow = asyncio.run(check_main_flow(script))
+
+    print_summary(f"Barge-in over {args.trials} interruptions", measurements)
+    print_summary("Talking over the answer until silence, through main() with a simulated microphone", main_flow)
+    print(f"\nTruncation point minus audio pulled by the device: "
+          f"{min(errors):+.1f} to {max(errors):+.1f} ms (device period {block * 1000:.0f} ms)")
+
+    # playback must go quiet within one device period of the interrupt, plus scheduling slack
+    assert max(measurements["interrupt_to_silence"]) <= 2 * block, "playback was not silenced within a device period"
+    assert all(abs(error) <= 2 * block * 1000 for error in errors), "truncation point does not match the audio played"
+    assert len(measurements["speech_started_to_truncate"]) == args.trials, "an interruption was not truncated"
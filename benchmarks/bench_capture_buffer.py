@@ -0,0 +1,58 @@
+"""
+Micro-benchmark for accumulating a long microphone utterance: bytes concatenation versus AudioCaptureBuffer.
+
+Run from the repository root:
+    python -m benchmarks.bench_capture_buffer --seconds 60
+"""
+import argparse
+import base64
+import os
+import time
+from client.audio.capture_buffer import AudioCaptureBuffer
+
+RATE = 24000
+CHUNK_SIZE = 1024  # frames per microphone callback
+SAMPLE_WIDTH = 2
+
+def accumulate_bytes(chunks):
+    """The previous approach: concatenate every callback onto an immutable bytes object."""
+    worst = 0.0
+    accumulated = b""
+    for chunk in chunks:
+        start = time.perf_counter()
+        accumulated += chunk
+        worst = max(worst, time.perf_counter() - start)
+    start = time.perf_counter()
+    base64.b64encode(accumulated)
+    return worst, time.perf_counter() - start
+
+def accumulate_buffer(chunks, seconds):
+    """Append into a preallocated capture buffer and encode straight from its view."""
+    worst = 0.0
+    buffer = AudioCaptureBuffer(seconds, RATE, SAMPLE_WIDTH, 1)
+    for chunk in chunks:
+        start = time.perf_counter()
+        buffer.append(chunk)
+        worst = max(worst, time.perf_counter() - start)
+    start = time.perf_counter()
+    base64.b64encode(buffer.view())
+    return worst, time.perf_counter() - start
+
+def run(label, func, *args):
+    start = time.perf_counter()
+    worst, encode = func(*args)
+    total = time.perf_counter() - start
+    print(f"{label:<24}{total * 1000:>12.2f} ms{worst * 1e6:>16.1f} us{encode * 1000:>14.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare utterance accumulation strategies.")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Utterance length in seconds.")
+    args = parser.parse_args()
+
+    chunk_count = int(args.seconds * RATE / CHUNK_SIZE)
+    chunks = [os.urandom(CHUNK_SIZE * SAMPLE_WIDTH) for _ in range(chunk_count)]
+
+    print(f"Accumulating {args.seconds:.0f} s of 24 kHz PCM16 in {chunk_count} callbacks of {CHUNK_SIZE} frames")
+    print(f"{'strategy':<24}{'total':>15}{'worst append':>19}{'encode':>17}")
+    run("bytes +=", accumulate_bytes, chunks)
+    run("AudioCaptureBuffer", accumulate_buffer, chunks, args.seconds)
@@ -0,0 +1,127 @@
+"""
+End-to-end latency benchmark: drives the real client receive path and playback thread against the local mock server.
+
+Run from the repository root:
+    python -m benchmarks.bench_end_to_end --turns 20 --mode audio
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import time
+import main as client_main
+import client.audio.audio_playback as audio_playback
+from client import turn_metrics
+from client.connection_handler import connect_to_server, close_connection
+from client.session import send_session_update
+from client.text_message_sender import send_text_message
+from mock_realtime_server import MockRealtimeServer, ResponseScript
+from benchmarks.common import SimulatedOutputDevice, print_summary
+
+# Speed of the simulated device relative to real time, unless --realtime-device is given
+FAST_DEVICE_SPEED = 20.0
+
+class TimedConnection:
+    """Wraps a websocket and stamps the arrival of the first delta frame of each turn."""
+    def __init__(self, ws):
+        self._ws = ws
+        self.first_delta_at = None
+
+    @property
+    def closed(self):
+        return self._ws.closed
+
+    async def send(self, message):
+        await self._ws.send(message)
+
+    async def close(self):
+        await self._ws.close()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        async for message in self._ws:
+            if self.first_delta_at is None and '.delta"' in message[:128]:
+                self.first_delta_at = time.perf_counter()
+            yield message
+
+async def run_benchmark(turns, modalities, script, realtime_device=False):
+    """Run the turns and return per-turn measurements in seconds."""
+    results = {"time_to_first_delta": [], "time_to_first_audible_sample": [], "turn_wall_time": []}
+    devices = []
+
+    def open_device(**kwargs):
+        device = SimulatedOutputDevice(speed=1.0 if realtime_device else FAST_DEVICE_SPEED, **kwargs)
+        devices.append(device)
+        return device
+
+    playback_thread = audio_playback.start_playback_thread(stream_factory=open_device)
+
+    async with MockRealtimeServer(script=script) as server:
+        ws = await connect_to_server(url=server.url, retry_count=1)
+        if ws is None:
+            raise RuntimeError("Could not connect to the mock server.")
+        conn = TimedConnection(ws)
+        message_queue = asyncio.Queue()
+        state = {"response_started": False, "exit_requested": False, "failure_count": 0}
+
+        await send_session_update(conn, modalities, "alloy", "benchmark")
+        receive_task = asyncio.create_task(
+            client_main.receive_messages(conn, True, message_queue, modalities, state))
+
+        try:
+            for _ in range(turns):
+                conn.first_delta_at = None
+                device = devices[0] if devices else None
+                if device is not None:
+                    device.first_audible_at = None
+                start = time.perf_counter()
+
+                # send the prompt and wait for the client to ask for the next one
+                await send_text_message(conn, modalities, "Tell me something.", "benchmark", "alloy")
+                while await message_queue.get() != client_main.SIGNAL_PROMPT:
+                    pass
+                end = time.perf_counter()
+
+                results["turn_wall_time"].append(end - start)
+                if conn.first_delta_at is not None:
+                    results["time_to_first_delta"].append(conn.first_delta_at - start)
+                if device is not None and device.first_audible_at is not None:
+                    results["time_to_first_audible_sample"].append(device.first_audible_at - start)
+        finally:
+            receive_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await receive_task
+            with contextlib.redirect_stdout(io.StringIO()):
+                await close_connection(ws)
+            audio_playback.stop_playback_thread(playback_thread)
+
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark client turn latency against the mock realtime server.")
+    parser.add_argument("--turns", type=int, default=20, help="Number of conversation turns.")
+    parser.add_argument("--mode", choices=["text", "audio"], default="audio", help="Response modalities.")
+    parser.add_argument("--audio-chunks", type=int, default=10, help="Audio deltas per response.")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Audio duration per delta in milliseconds.")
+    parser.add_argument("--first-delta-delay", type=float, default=0.05, help="Server delay before the first delta.")
+    parser.add_argument("--delta-interval", type=float, default=0.0, help="Server delay between deltas.")
+    parser.add_argument("--realtime-device", action="store_true",
+                        help=f"Make the simulated device play audio in real time instead of {FAST_DEVICE_SPEED:.0f}x faster.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    modalities = ["text", "audio"] if args.mode == "audio" else ["text"]
+    script = ResponseScript(audio_chunks=args.audio_chunks, chunk_ms=args.chunk_ms,
+                            first_delta_delay=args.first_delta_delay, delta_interval=args.delta_interval)
+
+    # the client prints the conversation, keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        measurements = asyncio.run(run_benchmark(args.turns, modalities, script, args.realtime_device))
+
+    print_summary(f"End-to-end latency over {args.turns} turns ({args.mode} mode)", measurements)
+
+    # where the turns spent their time, from the client's own turn timeline
+    print(f"\nTurn timeline breakdown\n{turn_metrics.default_recorder.metrics.summary()}")
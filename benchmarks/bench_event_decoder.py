@@ -0,0 +1,77 @@
+"""
+Benchmark the per-frame CPU cost of decoding server events, on recorded or synthetic traffic.
+
+A recording is a text file with one raw server frame per line.
+Run from the repository root:
+    python -m benchmarks.bench_event_decoder
+    python -m benchmarks.bench_event_decoder --recording traffic.jsonl
+"""
+import argparse
+import base64
+import json
+import os
+import time
+from collections import defaultdict
+from client.event_decoder import EventDecoder, JSON_BACKEND, peek_event_type, json_loads
+
+def synthetic_traffic(responses=20, audio_chunks=20, chunk_ms=200):
+    """Frames shaped like a spoken response: a few control events, then interleaved transcript and audio deltas."""
+    frames = []
+    audio = base64.b64encode(os.urandom(24000 * 2 * chunk_ms // 1000)).decode()
+    for r in range(responses):
+        ids = {"response_id": f"resp_{r}", "item_id": f"item_{r}", "output_index": 0, "content_index": 0}
+        frames.append(json.dumps({"type": "response.created", "event_id": "event_a",
+                                  "response": {"id": f"resp_{r}", "status": "in_progress", "output": []}}))
+        for i in range(audio_chunks):
+            frames.append(json.dumps({"type": "response.audio_transcript.delta", "event_id": f"event_t{i}",
+                                      **ids, "delta": "word "}))
+            frames.append(json.dumps({"type": "response.audio.delta", "event_id": f"event_d{i}",
+                                      **ids, "delta": audio}))
+        frames.append(json.dumps({"type": "response.done", "event_id": "event_z",
+                                  "response": {"id": f"resp_{r}", "status": "completed", "output": [
+                                      {"id": f"item_{r}", "content": [{"type": "audio", "transcript": "word " * 20}]}]}}))
+    return frames
+
+def measure(frames, decode, repeat=5):
+    """Return the best-of-repeat decode time per frame, grouped by event type."""
+    types = [peek_event_type(frame) or "unknown" for frame in frames]
+    best = defaultdict(lambda: float("inf"))
+    counts = defaultdict(int)
+    for event_type in types:
+        counts[event_type] += 1
+    for _ in range(repeat):
+        totals = defaultdict(float)
+        for event_type, frame in zip(types, frames):
+            start = time.perf_counter()
+            decode(frame)
+            totals[event_type] += time.perf_counter() - start
+        for event_type, total in totals.items():
+            best[event_type] = min(best[event_type], total)
+    return {event_type: best[event_type] / counts[event_type] for event_type in counts}, counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark server event decoding.")
+    parser.add_argument("--recording", help="File with one raw server frame per line.")
+    args = parser.parse_args()
+
+    if args.recording:
+        with open(args.recording) as f:
+            frames = [line.rstrip("\n") for line in f if line.strip()]
+    else:
+        frames = synthetic_traffic()
+
+    decoders = {"json.loads": json.loads}
+    if JSON_BACKEND != "json":
+        decoders[f"{JSON_BACKEND}.loads"] = json_loads
+    decoders["EventDecoder"] = EventDecoder().decode
+
+    results = {label: measure(frames, decode) for label, decode in decoders.items()}
+    counts = next(iter(results.values()))[1]
+
+    print(f"Per-frame decode cost over {len(frames)} frames (us)")
+    print(f"{'event type':<36}{'n':>6}" + "".join(f"{label:>18}" for label in decoders))
+    for event_type in sorted(counts, key=lambda t: -counts[t]):
+        row = "".join(f"{results[label][0][event_type] * 1e6:>18.2f}" for label in decoders)
+        print(f"{event_type:<36}{counts[event_type]:>6}{row}")
+    totals = "".join(f"{sum(results[label][0][t] * counts[t] for t in counts) * 1e3:>15.2f} ms" for label in decoders)
+    print(f"{'total':<42}{totals}")
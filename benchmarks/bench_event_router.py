@@ -0,0 +1,157 @@
+"""
+Benchmark server event dispatch: the EventRouter's dict lookup against the if/elif chain it replaced in
+receive_messages and handle_message, which compared the type against each branch in turn and rebuilt the list of
+ignored types for every event that reached its end.
+Both run no-op handlers, so the numbers are the dispatch overhead alone, per event type. A second run feeds the same
+traffic through the full handlers of many RealtimeSessions, interleaved, and reports events per second.
+The run fails if unknown events are not counted.
+
+Run from the repository root:
+    python -m benchmarks.bench_event_router --sessions 100
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+from client.audio.audio_sinks import AudioSink
+from client.event_decoder import decode_event
+from client.event_router import EventRouter
+from client.message_handler import IGNORED_EVENT_TYPES
+from client.realtime_session import RealtimeSession
+from benchmarks.bench_event_decoder import synthetic_traffic
+
+UNKNOWN_TYPE = "response.something_new"
+
+def traffic(responses, audio_chunks):
+    """Decoded events of spoken responses, with the control events around them and an event type nobody handles."""
+    events = []
+    for frame in synthetic_traffic(responses, audio_chunks, chunk_ms=20):
+        event = decode_event(frame)
+        events.append(event)
+        if event["type"] == "response.created":
+            ids = {"response_id": event["response"]["id"], "output_index": 0}
+            events.append({"type": "rate_limits.updated", "rate_limits": []})
+            events.append({"type": "response.output_item.added", **ids, "item": {"id": "item", "content": []}})
+            events.append({"type": UNKNOWN_TYPE, **ids})
+        elif event["type"] == "response.done":
+            events.insert(-1, {"type": "response.audio_transcript.done", "response_id": event["response"]["id"],
+                               "item_id": "item", "content_index": 0, "transcript": "word " * 20})
+    return events
+
+def noop(event):
+    pass
+
+def previous_chain(response):
+    """The checks an event went through before, with the branch bodies left out."""
+    message_type = response.get('type')
+    if message_type == 'response.audio.delta':
+        return noop(response)
+    if message_type == 'response.created':
+        noop(response)
+    elif message_type in ('response.text.delta', 'response.audio_transcript.delta'):
+        noop(response)
+    elif message_type == 'response.done':
+        noop(response)
+
+    # handle_message
+    msg_type = response.get("type", "")
+    if msg_type == "response.text.delta":
+        noop(response)
+    elif msg_type == "response.text.done":
+        noop(response)
+    elif msg_type == "response.audio_transcript.delta":
+        noop(response)
+    elif msg_type == "response.output_item.done":
+        noop(response)
+    elif msg_type == "response.done":
+        noop(response)
+    elif msg_type == "response.audio.delta":
+        noop(response)
+    else:
+        ignored_message_types = [
+            "session.created", "session.updated", "response.created",
+            "rate_limits.updated", "response.output_item.added",
+            "conversation.item.created", "response.content_part.added",
+            "response.output_item.done"
+        ]
+        if msg_type in ignored_message_types:
+            noop(response)
+
+    if message_type == 'response.output_item.done':
+        noop(response)
+    if message_type == 'response.done':
+        noop(response)
+
+def noop_router():
+    """A router with a no-op handler for every type the previous chain handled."""
+    router = EventRouter()
+    router.ignore(*IGNORED_EVENT_TYPES)
+    for event_type in ("response.audio.delta", "response.created", "response.text.delta", "response.text.done",
+                       "response.audio_transcript.delta", "response.audio_transcript.done", "response.done"):
+        router.on(event_type, noop)
+    return router
+
+def time_by_type(events, dispatch, repeat=5, number=200):
+    """Best-of-repeat seconds per event, by event type, timing each type's events in a batch."""
+    groups = defaultdict(list)
+    for event in events:
+        groups[event["type"]].append(event)
+    results = {}
+    for event_type, group in groups.items():
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                for event in group:
+                    dispatch(event)
+            best = min(best, (time.perf_counter() - started) / (number * len(group)))
+        results[event_type] = best
+    return results, {event_type: len(group) for event_type, group in groups.items()}
+
+async def run_sessions(events, sessions):
+    """Feed the traffic to every session, interleaved as on a shared event loop. Returns events per second."""
+    pool = [RealtimeSession(sink=AudioSink()) for _ in range(sessions)]
+    started = time.perf_counter()
+    for event in events:
+        for session in pool:
+            pending = session.router.dispatch(event)
+            if pending is not None:
+                await pending
+    elapsed = time.perf_counter() - started
+    return len(events) * sessions / elapsed, pool
+
+async def run_benchmark(args):
+    events = traffic(args.responses, args.audio_chunks)
+    previous, counts = time_by_type(events, previous_chain)
+    routed, _ = time_by_type(events, noop_router().dispatch)
+
+    # one more pass, to check what the router counted
+    router = noop_router()
+    for event in events:
+        router.dispatch(event)
+    rate, pool = await run_sessions(events, args.sessions)
+    return events, counts, previous, routed, router, rate, pool
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark server event dispatch.")
+    parser.add_argument("--responses", type=int, default=20, help="Responses in the traffic.")
+    parser.add_argument("--audio-chunks", type=int, default=50, help="Audio deltas per response.")
+    parser.add_argument("--sessions", type=int, default=100, help="Sessions the traffic is fed to.")
+    args = parser.parse_args()
+
+    events, counts, previous, routed, router, rate, pool = asyncio.run(run_benchmark(args))
+
+    print(f"Dispatch overhead per event, {len(events)} events with no-op handlers")
+    print(f"{'event type':<36}{'n':>6}{'if/elif':>12}{'router':>12}")
+    for event_type in sorted(counts, key=counts.get, reverse=True):
+        print(f"{event_type:<36}{counts[event_type]:>6}{previous[event_type] * 1e9:>9.0f} ns"
+              f"{routed[event_type] * 1e9:>9.0f} ns")
+    print(f"\nFull session handlers: {rate:,.0f} events/s across {args.sessions} sessions "
+          f"({1e6 / rate:.2f} us per event)")
+    print(f"Unknown events counted: {dict(router.unknown)}")
+
+    responses = counts["response.done"]
+    assert dict(router.unknown) == {UNKNOWN_TYPE: counts[UNKNOWN_TYPE]}, "unknown events were not counted"
+    assert all(session.stats()["unknown_events"] == counts[UNKNOWN_TYPE] for session in pool), \
+        "a session did not count its unknown events"
+    assert all(session.responses_done == responses for session in pool), "sessions missed responses"
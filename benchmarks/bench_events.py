@@ -0,0 +1,126 @@
+"""
+Benchmark the lazy slotted event objects of client.events against the event dicts the decoder produced before, for
+the high-volume event types.
+For each type it reports the CPU time to decode a frame alone, and to decode it and read the fields the client's
+handlers read, and the memory each decoded event holds, before and after those reads. Types without an event class
+are decoded as dicts, and are measured that way only.
+An audio delta is also read with its item_id after the audio, where the lazy event must skip the audio rather than
+scan it for the id.
+The run fails if a lazy event reads differently from its dict, or costs more than it once its fields are read, or
+if one of the other hot types is not decoded as a dict, or if reading the id after the audio costs twice the dict.
+
+Run from the repository root:
+    python -m benchmarks.bench_events
+"""
+import argparse
+import json
+import tracemalloc
+from client.event_decoder import EventDecoder
+from client.events import EVENT_CLASSES
+from benchmarks.bench_event_decoder import synthetic_traffic
+from benchmarks.common import time_per_call
+
+def read_audio_delta(event):
+    return event.get("item_id"), event.get("delta", "")
+
+def read_text_delta(event):
+    return event.get("response_id"), event.get("item_id"), event.get("content_index", 0), event.get("delta", "")
+
+def read_response_done(event):
+    response = event.get("response", {})
+    return response.get("id"), response.get("status")
+
+# The fields the session and terminal handlers read, by event type
+READS = {
+    "response.audio.delta": read_audio_delta,
+    "response.text.delta": read_text_delta,
+    "response.audio_transcript.delta": read_text_delta,
+    "response.done": read_response_done,
+}
+
+def frames_by_type(responses, audio_chunks, chunk_ms):
+    """Sample frames of each hot event type."""
+    frames = {}
+    for frame in synthetic_traffic(responses, audio_chunks, chunk_ms):
+        frames.setdefault(json.loads(frame)["type"], []).append(frame)
+    frames["response.text.delta"] = [json.dumps({"type": "response.text.delta", "event_id": f"event_{i}",
+                                                 "response_id": "resp_1", "item_id": "item_1", "output_index": 0,
+                                                 "content_index": 0, "delta": "Ahoy, \"matey\" "})
+                                     for i in range(len(frames["response.audio_transcript.delta"]))]
+    return {event_type: frames[event_type] for event_type in READS}
+
+def held_bytes(decode, frames, read=None):
+    """
+    Memory the decoded events of the frames hold, per event, optionally after their fields were read.
+    Every event is decoded from a fresh copy of its frame, which is freed unless the event keeps it.
+    """
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    events = [decode(frame.encode().decode()) for frame in frames]
+    if read is not None:
+        for event in events:
+            read(event)
+    held = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del events
+    return held / len(frames)
+
+def check_equivalent(dict_decode, lazy_decode, frames):
+    """A lazy event must read exactly like the dict of the same frame."""
+    for frame in frames:
+        expected, event = dict_decode(frame), lazy_decode(frame)
+        assert event.get("type") == expected["type"]
+        for key, value in expected.items():
+            assert event.get(key) == value and event[key] == value, f"{expected['type']}: {key} differs"
+        assert dict(event) == expected and len(event) == len(expected)
+        assert event.get("missing", "default") == "default"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark lazy slotted events against event dicts.")
+    parser.add_argument("--chunk-ms", type=int, default=200, help="Audio carried by each audio delta.")
+    args = parser.parse_args()
+
+    frames = frames_by_type(responses=5, audio_chunks=40, chunk_ms=args.chunk_ms)
+    dict_decode = EventDecoder().decode  # the decoder as it was, with its audio delta fast path
+    lazy_decode = EventDecoder(event_classes=EVENT_CLASSES).decode
+
+    print(f"Per event, {args.chunk_ms} ms audio deltas")
+    print(f"{'event type':<34}{'path':<7}{'decode':>10}{'+ reads':>10}{'held':>11}{'held after reads':>19}")
+    results = {}
+    for event_type, sample in frames.items():
+        frame = sample[0]
+        read = READS[event_type]
+        paths = [("dict", dict_decode)]
+        if event_type in EVENT_CLASSES:
+            check_equivalent(dict_decode, lazy_decode, sample)
+            paths.append(("lazy", lazy_decode))
+        else:
+            assert type(lazy_decode(frame)) is dict, f"{event_type} is not decoded as a dict"
+        for name, decode in paths:
+            decode_only = time_per_call(decode, frame, number=2000)
+            with_reads = time_per_call(lambda: read(decode(frame)), number=2000)
+            held = held_bytes(decode, sample)
+            held_after = held_bytes(decode, sample, read)
+            results[event_type, name] = decode_only, with_reads, held_after
+            print(f"{event_type:<34}{name:<7}{decode_only * 1e6:>7.2f} us{with_reads * 1e6:>7.2f} us"
+                  f"{held:>9.0f} B{held_after:>17.0f} B")
+
+    # the server may put item_id after the audio: it is found by skipping the audio, not scanning it
+    audio_deltas = [json.loads(frame) for frame in frames["response.audio.delta"]]
+    item_id_last = [json.dumps({**{key: value for key, value in event.items() if key != "item_id"},
+                                "item_id": event["item_id"]}) for event in audio_deltas]
+    check_equivalent(dict_decode, lazy_decode, item_id_last)
+    last_reads = {name: time_per_call(lambda: read_audio_delta(decode(item_id_last[0])), number=2000)
+                  for name, decode in (("dict", dict_decode), ("lazy", lazy_decode))}
+    for name, with_reads in last_reads.items():
+        print(f"{'audio delta, item_id last':<34}{name:<7}{'':>10}{with_reads * 1e6:>7.2f} us")
+    assert last_reads["lazy"] < 2 * last_reads["dict"], "reading item_id after the audio scans the audio"
+
+    print("\nheld is the memory a decoded event keeps while queued: a lazy event keeps its frame until a read needs "
+          "the parsed fields, then only those.")
+    for event_type in EVENT_CLASSES:
+        (dict_decode_only, dict_reads, dict_held), (lazy_decode_only, lazy_reads, lazy_held) = (
+            results[event_type, "dict"], results[event_type, "lazy"])
+        assert lazy_decode_only < dict_decode_only, f"lazy {event_type} is not cheaper to decode"
+        assert lazy_reads < dict_reads, f"lazy {event_type} costs more than its dict once read"
+        assert lazy_held <= dict_held, f"lazy {event_type} holds more than its dict once read"
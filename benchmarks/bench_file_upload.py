@@ -0,0 +1,209 @@
+"""
+Benchmark sending a long recording: the streaming upload against the previous path, which read the whole file,
+decoded it with pydub and sent it as one conversation.item.create frame.
+A WAV file of the given length is generated and sent to a mock server running in its own process. The streaming
+upload goes through a ResilientConnection and a SendQueue, as main.py sends it, once as is and once with the
+connection dropped half way through, after which the file is sent again from the start. For each path the peak
+Python memory (tracemalloc), the growth of the resident set, the largest websocket frame and the time until the
+response completes are reported. The run fails if the streaming upload's memory grows with the file, if the send
+queue hands the connection frames while it is down, or if the server does not end up with the whole file after the
+drop.
+
+Run from the repository root:
+    python -m benchmarks.bench_file_upload --minutes 10
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+import wave
+import numpy as np
+import websockets
+from pydub import AudioSegment
+from client.audio.audio_message_sender import send_audio_file
+from client.audio.audio_formats import sample_rate_for
+from client.event_decoder import json_loads, peek_event_type
+from client.resilient_connection import ResilientConnection
+from client.response_handler import trigger_response
+from client.resource_usage import current_rss, sample_peak_rss
+from client.send_queue import SendQueue
+from mock_realtime_server import ResponseScript, start_mock_server
+
+MODALITIES = ["text", "audio"]
+
+class FrameCounter:
+    """Wraps a websocket, counting the frames sent and the largest one."""
+    def __init__(self, ws):
+        self.ws = ws
+        self.frames = 0
+        self.largest = 0
+
+    @property
+    def closed(self):
+        return self.ws.closed
+
+    async def send(self, message):
+        self.frames += 1
+        self.largest = max(self.largest, len(message))
+        await self.ws.send(message)
+
+class CountingConnection(ResilientConnection):
+    """A ResilientConnection counting the frames sent through it, the largest one and those sent while it was down."""
+    frames = 0
+    largest = 0
+    bytes_sent = 0
+    sent_while_down = 0
+
+    async def send(self, message):
+        self.frames += 1
+        if not self._connected.is_set():
+            self.sent_while_down += 1
+        self.largest = max(self.largest, len(message))
+        self.bytes_sent += len(message)
+        await super().send(message)
+
+def write_wav(path, minutes, rate, channels):
+    """Write a recording of noisy tones, a block at a time."""
+    rng = np.random.default_rng(0)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        for second in range(int(minutes * 60)):
+            t = np.arange(rate) / rate
+            block = 6000 * np.sin(2 * np.pi * (200 + second % 50 * 10) * t) + rng.normal(0, 300, rate)
+            f.writeframes(np.repeat(block.astype(np.int16)[:, None], channels, axis=1).tobytes())
+
+async def previous_upload(ws, path, audio_format):
+    """The previous send_audio_file, with the file read whole and converted by pydub into one frame."""
+    with open(path, "rb") as f:
+        audio_bytes = f.read()
+    # from_wav rather than from_file, which needs ffprobe to sniff the format
+    audio = AudioSegment.from_wav(io.BytesIO(audio_bytes))
+    pcm_audio = audio.set_frame_rate(sample_rate_for(audio_format)).set_channels(1).set_sample_width(2).raw_data
+    await ws.send(json.dumps({
+        "type": "conversation.item.create",
+        "item": {"type": "message", "role": "user",
+                 "content": [{"type": "input_audio", "audio": base64.b64encode(pcm_audio).decode()}]},
+    }))
+    await trigger_response(ws, MODALITIES, "benchmark", "alloy", audio_format)
+    return len(pcm_audio)
+
+async def drop_midway(conn, after_bytes):
+    """Abort the connection's socket, as when the network goes away, once after_bytes have been sent."""
+    while conn.bytes_sent < after_bytes:
+        await asyncio.sleep(0.005)
+    conn.ws.transport.abort()
+
+async def run_path(url, upload, path, audio_format, resilient=False, drop_after=None):
+    """
+    Upload the file with one path and wait for the response. Returns its measurements.
+    With resilient, the upload goes through a ResilientConnection and a SendQueue, and the connection is dropped
+    once drop_after bytes have been sent, if given.
+    """
+    if resilient:
+        conn = counter = CountingConnection(url, headers={})
+        if not await conn.connect(retry_count=1):
+            raise RuntimeError("Could not connect to the mock server.")
+        ws = SendQueue(conn)
+        # the mock server reports how much audio each commit holds through the input transcription
+        session = {"modalities": MODALITIES, "input_audio_transcription": {"model": "mock"}}
+        await ws.send(json.dumps({"type": "session.update", "session": session}))
+    else:
+        # no frame size limit: the mock echoes the previous path's item back, audio and all
+        ws = await websockets.connect(url, max_size=None)
+        counter = FrameCounter(ws)
+    dropper = asyncio.create_task(drop_midway(conn, drop_after)) if drop_after else None
+    peak = {"rss": current_rss()}
+    baseline_rss = peak["rss"]
+    sampler = asyncio.create_task(sample_peak_rss(peak, 0.01))
+    tracemalloc.start()
+    started = time.perf_counter()
+    transcript = None
+    try:
+        sent = await upload(ws if resilient else counter, path, audio_format)
+        uploaded = time.perf_counter() - started
+        async for message in ws:
+            event_type = peek_event_type(message)
+            if event_type == "conversation.item.input_audio_transcription.completed":
+                transcript = json_loads(message)["transcript"]
+            elif event_type == "response.done":
+                break
+        finished = time.perf_counter() - started
+        _, peak_traced = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        sampler.cancel()
+        if dropper is not None:
+            dropper.cancel()
+        await ws.close()
+    return {"sent": sent, "upload": uploaded, "response": finished, "traced": peak_traced,
+            "rss": peak["rss"] - baseline_rss, "frames": counter.frames, "largest": counter.largest,
+            "transcript": transcript, "resumes": len(conn.recoveries) if resilient else 0,
+            "sent_while_down": conn.sent_while_down if resilient else 0}
+
+async def run_benchmark(url, path, audio_format, max_speed, file_bytes):
+    async def streaming_upload(ws, path, audio_format):
+        return await send_audio_file(ws, path, MODALITIES, "benchmark", "alloy", audio_format, max_speed=max_speed)
+
+    # streaming first, so it does not run in memory the previous path has already grown the heap into
+    return {"streaming": await run_path(url, streaming_upload, path, audio_format, resilient=True),
+            "dropped": await run_path(url, streaming_upload, path, audio_format, resilient=True,
+                                      drop_after=file_bytes // 2),
+            "previous": await run_path(url, previous_upload, path, audio_format)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark uploading a long audio file.")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Length of the generated recording.")
+    parser.add_argument("--rate", type=int, default=48000, help="Sample rate of the recording.")
+    parser.add_argument("--channels", type=int, default=2, help="Channels of the recording.")
+    parser.add_argument("--audio-format", default="pcm16", help="Session audio format.")
+    parser.add_argument("--max-speed", type=float, default=0.0,
+                        help="Upload speed limit as a multiple of real time, 0 for none.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+    expected = int(args.minutes * 60 * sample_rate_for(args.audio_format)) * 2
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "recording.wav")
+        write_wav(path, args.minutes, args.rate, args.channels)
+        file_size = os.path.getsize(path)
+        server, url = start_mock_server(ResponseScript(audio_chunks=2))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = asyncio.run(run_benchmark(url, path, args.audio_format, args.max_speed, expected * 4 // 3))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{args.minutes:g} minutes of {args.rate} Hz {args.channels}-channel WAV ({file_size / 2 ** 20:.0f} MB) "
+          f"sent as {args.audio_format}")
+    print(f"{'path':<12}{'peak traced':>14}{'rss growth':>13}{'frames':>9}{'largest frame':>16}{'upload':>10}"
+          f"{'response':>11}")
+    for name, result in results.items():
+        print(f"{name:<12}{result['traced'] / 2 ** 20:>11.1f} MB{result['rss'] / 2 ** 20:>10.1f} MB"
+              f"{result['frames']:>9}{result['largest'] / 1024:>13.0f} KB{result['upload']:>9.2f}s"
+              f"{result['response']:>10.2f}s")
+
+    print(f"The dropped upload was resumed {results['dropped']['resumes']} time(s), the server committed: "
+          f"{results['dropped']['transcript']}")
+
+    # what the mock server committed, in ms
+    expected_ms = expected * 1000 // (sample_rate_for(args.audio_format) * 2)
+    for name in ("streaming", "dropped"):
+        result = results[name]
+        assert abs(result["sent"] - expected) <= 4, f"{name}: streamed {result['sent']} bytes, expected {expected}"
+        committed_ms = int(result["transcript"].split()[3])
+        assert abs(committed_ms - expected_ms) <= 1, f"{name}: the server committed {committed_ms} ms of audio"
+        assert result["traced"] < 8 * 2 ** 20, f"{name}: the streaming upload's memory grows with the file"
+        assert result["largest"] < 64 * 1024, f"{name}: the streaming upload sent an oversized frame"
+    assert results["dropped"]["resumes"] == 1, "the dropped connection was not resumed"
+    # the send queue waits for the connection to be back rather than hand it frames to hold
+    assert results["dropped"]["sent_while_down"] == 0, "frames were sent while the connection was down"
@@ -0,0 +1,88 @@
+"""
+Compare bridging capture-thread frames to the event loop with run_coroutine_threadsafe per block versus FrameQueue,
+while the loop is busy with other work.
+
+Run from the repository root:
+    python -m benchmarks.bench_frame_queue --seconds 5 --busy-ms 100
+"""
+import argparse
+import asyncio
+import time
+from client.audio.frame_queue import FrameQueue
+from benchmarks.common import print_summary
+
+FRAME = bytes(2048)  # 1024 PCM16 frames
+
+def produce(put, block_seconds, duration):
+    """Simulate the PortAudio callback thread, delivering one block every block_seconds."""
+    deadline = time.perf_counter() + duration
+    next_block = time.perf_counter()
+    while next_block < deadline:
+        put()
+        next_block += block_seconds
+        time.sleep(max(0.0, next_block - time.perf_counter()))
+
+async def busy_loop(stop, busy_seconds):
+    """Keep the loop busy with periodic blocking work, like decoding or json on a loaded session."""
+    while not stop.is_set():
+        time.sleep(busy_seconds)
+        await asyncio.sleep(0.005)
+
+async def run_coroutine_per_block(block_seconds, duration, busy_seconds):
+    loop = asyncio.get_running_loop()
+    delays = []
+
+    async def process(queued_at, frame):
+        delays.append(time.perf_counter() - queued_at)
+
+    def put():
+        asyncio.run_coroutine_threadsafe(process(time.perf_counter(), FRAME), loop)
+
+    stop = asyncio.Event()
+    busy = asyncio.create_task(busy_loop(stop, busy_seconds))
+    await asyncio.to_thread(produce, put, block_seconds, duration)
+    await asyncio.sleep(0.1)
+    stop.set()
+    await busy
+    return delays, len(delays)
+
+async def run_frame_queue(block_seconds, duration, busy_seconds):
+    queue = FrameQueue(asyncio.get_running_loop(), maxsize=1024)
+    delays = []
+
+    def put():
+        queue.put((time.perf_counter(), FRAME))
+
+    async def consume():
+        while True:
+            batch = await queue.get_batch()
+            if not batch:
+                return
+            now = time.perf_counter()
+            delays.extend(now - queued_at for queued_at, _ in batch)
+
+    stop = asyncio.Event()
+    busy = asyncio.create_task(busy_loop(stop, busy_seconds))
+    consumer = asyncio.create_task(consume())
+    await asyncio.to_thread(produce, put, block_seconds, duration)
+    queue.close()
+    await consumer
+    stop.set()
+    await busy
+    return delays, queue.batches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the capture-thread to event-loop bridge.")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Capture duration.")
+    parser.add_argument("--block-ms", type=float, default=42.7, help="Capture block duration in milliseconds.")
+    parser.add_argument("--busy-ms", type=float, default=100.0, help="Blocking work the loop does between yields.")
+    args = parser.parse_args()
+
+    block, busy = args.block_ms / 1000, args.busy_ms / 1000
+    per_block, wakeups_a = asyncio.run(run_coroutine_per_block(block, args.seconds, busy))
+    batched, wakeups_b = asyncio.run(run_frame_queue(block, args.seconds, busy))
+
+    print_summary(f"Callback-to-loop delay, {args.block_ms} ms blocks, {args.busy_ms} ms of loop work per yield",
+                  {"run_coroutine_threadsafe": per_block, "FrameQueue": batched})
+    print(f"\nrun_coroutine_threadsafe scheduled {wakeups_a} tasks (one Task and Future per block), "
+          f"FrameQueue drained {len(batched)} frames in {wakeups_b} batches")
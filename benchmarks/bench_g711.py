@@ -0,0 +1,74 @@
+"""
+Benchmark G.711 decoding and encoding per audio delta, and the wire size of each session audio format.
+
+Run from the repository root:
+    python -m benchmarks.bench_g711 --chunk-ms 100
+"""
+import argparse
+import base64
+import warnings
+import numpy as np
+from client.audio.audio_decoder import decode_audio
+from client.audio.audio_formats import G711_ALAW, G711_ULAW, PCM16, SAMPLE_RATES, encode_audio
+from client.audio.g711_codec import alaw_decode, ulaw_decode
+from benchmarks.common import time_per_call
+
+# Reference implementations, when installed
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        import audioop
+except ImportError:
+    audioop = None
+try:
+    import g711
+except ImportError:
+    g711 = None
+
+def legacy_decode_ulaw(data):
+    """The previous decode path: the g711 package, re-wrapped in an int16 array."""
+    return np.array(g711.decode_ulaw(data), dtype=np.int16).tobytes()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the G.711 codec.")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Audio carried by each delta in milliseconds.")
+    args = parser.parse_args()
+
+    rate = SAMPLE_RATES[G711_ULAW]
+    samples = rate * args.chunk_ms // 1000
+    rng = np.random.default_rng(0)
+    pcm = (np.sin(np.arange(samples) * 2 * np.pi * 220 / rate) * 6000 + rng.normal(0, 200, samples)).astype('<i2')
+    ulaw = encode_audio(pcm.tobytes(), G711_ULAW)
+    alaw = encode_audio(pcm.tobytes(), G711_ALAW)
+    ulaw_b64 = base64.b64encode(ulaw).decode()
+
+    # the tables must agree with the reference codec bit for bit
+    if audioop is not None:
+        codes = bytes(range(256))
+        every_sample = np.arange(-32768, 32768, dtype=np.int16).tobytes()
+        assert ulaw_decode(codes).tobytes() == audioop.ulaw2lin(codes, 2)
+        assert alaw_decode(codes).tobytes() == audioop.alaw2lin(codes, 2)
+        assert encode_audio(every_sample, G711_ULAW) == audioop.lin2ulaw(every_sample, 2)
+        assert encode_audio(every_sample, G711_ALAW) == audioop.lin2alaw(every_sample, 2)
+        print("Lookup tables match audioop for every code and every PCM16 sample.")
+
+    cases = [("LUT u-law decode", lambda: ulaw_decode(ulaw)),
+             ("LUT A-law decode", lambda: alaw_decode(alaw)),
+             ("LUT u-law encode", lambda: encode_audio(pcm, G711_ULAW)),
+             ("decode_audio g711_ulaw", lambda: decode_audio(ulaw_b64, G711_ULAW))]
+    if g711 is not None:
+        cases.append(("g711 package u-law decode", lambda: legacy_decode_ulaw(ulaw)))
+    if audioop is not None:
+        cases.append(("audioop u-law decode", lambda: audioop.ulaw2lin(ulaw, 2)))
+        cases.append(("audioop u-law encode", lambda: audioop.lin2ulaw(pcm.tobytes(), 2)))
+
+    print(f"\nDelta of {samples} samples ({args.chunk_ms} ms at {rate} Hz)")
+    print(f"{'operation':<30}{'per delta':>14}")
+    for label, func in cases:
+        print(f"{label:<30}{time_per_call(func, number=5000) * 1e6:>11.2f} us")
+
+    # base64 payload per second of audio in each format
+    print(f"\n{'format':<14}{'payload per second':>22}")
+    for audio_format in (PCM16, G711_ULAW, G711_ALAW):
+        payload = SAMPLE_RATES[audio_format] * (2 if audio_format == PCM16 else 1)
+        print(f"{audio_format:<14}{len(base64.b64encode(bytes(payload))):>16} bytes")
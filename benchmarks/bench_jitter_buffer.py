@@ -0,0 +1,70 @@
+"""
+Benchmark the startup latency against glitches trade-off of the playback jitter buffer: fixed start levels against
+the adaptive depth at several target underrun probabilities, over a sequence of responses with network jitter.
+The run fails if an adaptive depth has more underruns than the fixed 60 ms start level, or if a lower target
+probability does not give at least as deep a buffer.
+
+Run from the repository root:
+    python -m benchmarks.bench_jitter_buffer --responses 3 --deltas 40 --jitter-ms 80
+"""
+import argparse
+from client.audio.jitter_buffer import JitterBuffer
+from client.audio.playback_engine import PlaybackEngine
+from benchmarks.bench_playback import RATE, arrival_schedule, feed
+from benchmarks.common import SimulatedOutputDevice, format_ms
+
+def run(schedules, chunk, jitter_buffer=None, start_duration=0.06):
+    """Play each response through one engine and return the per-response startup latencies and the engine stats."""
+    devices = []
+
+    def open_device(**kwargs):
+        devices.append(SimulatedOutputDevice(**kwargs))
+        return devices[-1]
+
+    engine = PlaybackEngine(RATE, start_duration=start_duration, stream_factory=open_device,
+                            jitter_buffer=jitter_buffer)
+    engine.start()
+    startup = []
+    for schedule in schedules:
+        devices[0].first_audible_at = None
+        start = feed(schedule, chunk, engine.write)
+        engine.drain()
+        startup.append(devices[0].first_audible_at - start)
+    stats = engine.stats()
+    engine.close()
+    return startup, stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the playback jitter buffer.")
+    parser.add_argument("--responses", type=int, default=3, help="Responses played in sequence.")
+    parser.add_argument("--deltas", type=int, default=40, help="Audio deltas per response.")
+    parser.add_argument("--chunk-ms", type=int, default=50, help="Audio duration per delta in milliseconds.")
+    parser.add_argument("--jitter-ms", type=float, default=80.0, help="Mean extra network delay per delta.")
+    parser.add_argument("--pace", type=float, default=1.0, help="Send interval relative to the audio duration.")
+    args = parser.parse_args()
+
+    chunk = b"\x10\x00" * (RATE * args.chunk_ms // 1000)
+    schedules = [arrival_schedule(args.deltas, args.chunk_ms, args.jitter_ms, args.pace, seed)
+                 for seed in range(args.responses)]
+
+    configs = [("fixed 60 ms", None, 0.06), ("fixed 100 ms", None, 0.1)]
+    for probability in (0.1, 0.01, 0.001):
+        configs.append((f"adaptive p={probability:g}", JitterBuffer(probability), None))
+
+    print(f"{args.responses} responses of {args.deltas} x {args.chunk_ms} ms deltas, mean jitter {args.jitter_ms:.0f} ms")
+    print(f"{'start level':<20}{'first response':>16}{'later responses':>17}{'underruns':>11}{'concealed':>14}"
+          f"{'final depth':>14}")
+    results = {}
+    for label, jitter_buffer, start_duration in configs:
+        startup, stats = run(schedules, chunk, jitter_buffer, start_duration or 0.06)
+        results[label] = stats
+        later = sum(startup[1:]) / len(startup[1:]) if len(startup) > 1 else None
+        concealed = stats["jitter"]["concealed_seconds"] if jitter_buffer else None
+        print(f"{label:<20}{format_ms(startup[0]):>16}{format_ms(later):>17}{stats['underruns']:>11}"
+              f"{format_ms(concealed):>14}{format_ms(stats['start_level_seconds']):>14}")
+
+    adaptive = [stats for label, stats in results.items() if label.startswith("adaptive")]
+    assert all(stats["underruns"] <= results["fixed 60 ms"]["underruns"] for stats in adaptive), \
+        "the adaptive depth ran dry more often than the fixed 60 ms start level"
+    depths = [stats["start_level_seconds"] for stats in adaptive]
+    assert depths == sorted(depths), "a lower underrun probability gave a shallower buffer"
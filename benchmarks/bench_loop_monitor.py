@@ -0,0 +1,100 @@
+"""
+Benchmark the event-loop lag monitor: whether it attributes stalls to what caused them, and what it costs.
+Three stalls are injected while it runs: a task that calls a blocking function, a callback scheduled with
+call_soon that blocks, and a task spinning in Python code. Each must be reported with its duration, the task or
+callback that caused it and a stack naming the blocking function. Then server events are fed through the handlers of
+many RealtimeSessions with and without the monitor, and the throughput is compared.
+The run fails if a stall is missed or misattributed, or if the monitor costs more than 10% of the throughput.
+
+Run from the repository root:
+    python -m benchmarks.bench_loop_monitor
+"""
+import argparse
+import asyncio
+import logging
+import time
+from client.loop_monitor import LoopMonitor
+from client.turn_metrics import TurnMetrics, LOOP_LAG
+from benchmarks.bench_event_router import run_sessions, traffic
+
+def blocking_io(seconds):
+    """Stands in for a blocking call, e.g. a synchronous device or file operation."""
+    time.sleep(seconds)
+
+def blocking_callback(seconds):
+    time.sleep(seconds)
+
+def spin(seconds):
+    """Busy Python code, which lets the watchdog take the GIL in between."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+async def blocking_task(seconds):
+    blocking_io(seconds)
+
+async def spinning_task(seconds):
+    spin(seconds)
+
+async def run_stalls(stall, threshold):
+    """Inject the stalls under a monitor. Returns it and the stalls expected: (culprit, blocking function)."""
+    metrics = TurnMetrics()
+    monitor = LoopMonitor(stall_threshold=threshold, metrics=metrics)
+    async with monitor:
+        await asyncio.sleep(0.05)
+        await asyncio.create_task(blocking_task(stall), name="blocking-task")
+        await asyncio.sleep(0.05)
+        asyncio.get_running_loop().call_soon(blocking_callback, stall)
+        await asyncio.sleep(0.05)
+        await asyncio.create_task(spinning_task(stall), name="spinning-task")
+        await asyncio.sleep(0.05)
+    expected = [("task blocking-task", "blocking_io"), ("callback blocking_callback", "blocking_callback"),
+                ("task spinning-task", "spin")]
+    return monitor, metrics, expected
+
+async def events_per_second(events, sessions, monitored):
+    """Throughput of the session handlers, optionally under the monitor."""
+    monitor = LoopMonitor()
+    if monitored:
+        monitor.start()
+    rate, _ = await run_sessions(events, sessions)
+    if monitored:
+        await monitor.stop()
+    return rate
+
+async def run_overhead(sessions, repeat):
+    events = traffic(responses=20, audio_chunks=50)
+    rates = {False: [], True: []}
+    for _ in range(repeat):
+        for monitored in (False, True):
+            rates[monitored].append(await events_per_second(events, sessions, monitored))
+    return max(rates[False]), max(rates[True])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the event-loop lag monitor.")
+    parser.add_argument("--stall-ms", type=float, default=200.0, help="Length of each injected stall.")
+    parser.add_argument("--threshold-ms", type=float, default=100.0, help="Lag reported as a stall.")
+    parser.add_argument("--sessions", type=int, default=100, help="Sessions fed the traffic in the overhead run.")
+    parser.add_argument("--repeat", type=int, default=5, help="Overhead runs with and without the monitor.")
+    args = parser.parse_args()
+
+    logging.getLogger("client.loop_monitor").setLevel(logging.ERROR)
+    monitor, metrics, expected = asyncio.run(run_stalls(args.stall_ms / 1000, args.threshold_ms / 1000))
+    print(f"Injected {len(expected)} stalls of {args.stall_ms:.0f} ms, threshold {args.threshold_ms:.0f} ms")
+    for stall in monitor.stalls:
+        print(f"  {stall['duration'] * 1000:6.0f} ms  {stall['culprit']}  at {stall['where']}")
+    lag = metrics.histograms[LOOP_LAG]
+    print(f"Lag over {lag.count} samples: p50 {lag.percentile(50) * 1000:.0f} ms, max {lag.max * 1000:.0f} ms")
+
+    baseline, monitored = asyncio.run(run_overhead(args.sessions, args.repeat))
+    overhead = 1 - monitored / baseline
+    print(f"\nSession handlers: {baseline:,.0f} events/s without the monitor, {monitored:,.0f} with it "
+          f"({overhead * 100:+.1f}% cost)")
+
+    stalls = list(monitor.stalls)
+    assert len(stalls) == len(expected), f"{len(stalls)} stalls reported, {len(expected)} injected"
+    for stall, (culprit, function) in zip(stalls, expected):
+        assert stall["duration"] >= args.stall_ms / 1000 * 0.9, f"{culprit}: stall too short"
+        assert stall["culprit"].startswith(culprit), f"stall of {culprit} attributed to {stall['culprit']}"
+        assert any(f", in {function}\n" in line for line in stall["stack"]), f"{function} missing from the stack"
+    assert overhead < 0.1, "the monitor costs more than 10% of the throughput"
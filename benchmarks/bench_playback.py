@@ -0,0 +1,132 @@
+"""
+Benchmark assistant audio playback under bursty delta arrival: the previous polling thread with blocking writes
+against the callback-driven playback engine. The run fails if the engine has more underruns than the polling thread.
+
+Run from the repository root:
+    python -m benchmarks.bench_playback --deltas 60 --chunk-ms 50 --jitter-ms 80
+"""
+import argparse
+import queue
+import random
+import threading
+import time
+from client.audio.playback_engine import PlaybackEngine
+from benchmarks.common import SimulatedOutputDevice
+
+RATE = 24000
+FRAME_SIZE = 2
+
+class BlockingDevice:
+    """A blocking-write output stream: write returns once the audio fits in a small host buffer, gaps are underruns."""
+    def __init__(self, host_buffer=0.05):
+        self.host_buffer = host_buffer
+        self.play_until = None
+        self.first_audible_at = None
+        self.underruns = 0
+
+    def write(self, data):
+        now = time.perf_counter()
+        if self.play_until is None:
+            self.first_audible_at = now
+            self.play_until = now
+        elif now > self.play_until:
+            # the device ran dry before this write
+            self.underruns += 1
+            self.play_until = now
+        self.play_until += len(data) / (RATE * FRAME_SIZE)
+        delay = self.play_until - self.host_buffer - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+def legacy_playback(chunks, device, buffer_threshold=5000, max_wait_time=0.5):
+    """The previous playback loop: poll the queue every 100 ms and write batches with blocking writes."""
+    pending = []
+    pending_bytes = 0
+    last_play_time = time.time()
+    while True:
+        try:
+            chunk = chunks.get(timeout=0.1)
+        except queue.Empty:
+            if pending:
+                for data in pending:
+                    device.write(data)
+                pending, pending_bytes, last_play_time = [], 0, time.time()
+            continue
+        if chunk is None:
+            break
+        pending.append(chunk)
+        pending_bytes += len(chunk)
+        if pending_bytes >= buffer_threshold or (time.time() - last_play_time) >= max_wait_time:
+            for data in pending:
+                device.write(data)
+            pending, pending_bytes, last_play_time = [], 0, time.time()
+    for data in pending:
+        device.write(data)
+
+def arrival_schedule(deltas, chunk_ms, jitter_ms, pace=1.0, seed=0):
+    """Arrival offsets in seconds: deltas are sent every pace * chunk_ms and delayed by exponential network jitter."""
+    rng = random.Random(seed)
+    interval = chunk_ms / 1000 * pace
+    offsets = [i * interval + rng.expovariate(1000 / jitter_ms) if jitter_ms else i * interval for i in range(deltas)]
+    return sorted(offsets)
+
+def feed(schedule, chunk, deliver):
+    """Deliver the chunk at each scheduled offset and return the start time."""
+    start = time.perf_counter()
+    for offset in schedule:
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        deliver(chunk)
+    return start
+
+def run_legacy(schedule, chunk):
+    device = BlockingDevice()
+    chunks = queue.Queue()
+    thread = threading.Thread(target=legacy_playback, args=(chunks, device))
+    thread.start()
+    start = feed(schedule, chunk, chunks.put)
+    chunks.put(None)
+    thread.join()
+    end = max(device.play_until, time.perf_counter())
+    return device.first_audible_at - start, device.underruns, end - start
+
+def run_engine(schedule, chunk):
+    devices = []
+
+    def open_device(**kwargs):
+        devices.append(SimulatedOutputDevice(**kwargs))
+        return devices[-1]
+
+    engine = PlaybackEngine(RATE, stream_factory=open_device)
+    engine.start()
+    start = feed(schedule, chunk, engine.write)
+    engine.drain()
+    end = time.perf_counter()
+    engine.close()
+    return devices[0].first_audible_at - start, engine.underruns, end - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark playback under bursty delta arrival.")
+    parser.add_argument("--deltas", type=int, default=60, help="Audio deltas per response.")
+    parser.add_argument("--chunk-ms", type=int, default=50, help="Audio duration per delta in milliseconds.")
+    parser.add_argument("--jitter-ms", type=float, default=80.0, help="Mean extra network delay per delta.")
+    parser.add_argument("--pace", type=float, default=1.0, help="Send interval relative to the audio duration.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the arrival schedule.")
+    args = parser.parse_args()
+
+    chunk = (b"\x10\x00" * (RATE * args.chunk_ms // 1000))
+    schedule = arrival_schedule(args.deltas, args.chunk_ms, args.jitter_ms, args.pace, args.seed)
+    audio_seconds = args.deltas * args.chunk_ms / 1000
+
+    print(f"{args.deltas} deltas of {args.chunk_ms} ms ({audio_seconds:.1f} s of audio), mean jitter {args.jitter_ms:.0f} ms")
+    print(f"{'playback':<20}{'first audio':>14}{'underruns':>12}{'total time':>14}")
+    underruns_of = {}
+    for label, run in (("polling thread", run_legacy), ("callback engine", run_engine)):
+        first_audio, underruns, total = run(schedule, chunk)
+        underruns_of[label] = underruns
+        print(f"{label:<20}{first_audio * 1000:>11.1f} ms{underruns:>12}{total * 1000:>11.0f} ms")
+
+    assert underruns_of["callback engine"] <= underruns_of["polling thread"], \
+        "the callback engine ran dry more often than the polling thread"
+
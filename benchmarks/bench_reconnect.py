@@ -0,0 +1,195 @@
+"""
+Benchmark recovery from a dropped connection: in the middle of each response the mock server drops the socket, and
+the client has to reconnect, replay the session and the conversation, and get the response going again, while the
+audio it already received keeps playing. The cut off response is generated again from the start, so what is left
+of it is dropped first, and the regenerated one must not play over it.
+The run fails if the replay does not restore the conversation, playback stops during the outage, or the rest of the
+cut off response is still played.
+With --standby the client keeps a second connection open and fails over to it, so only the replay is left to wait for.
+
+Run from the repository root:
+    python -m benchmarks.bench_reconnect --trials 10
+    python -m benchmarks.bench_reconnect --trials 10 --standby
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import random
+import time
+import main as client_main
+import client.audio.audio_playback as audio_playback
+from client.event_decoder import peek_event_type
+from client.audio.audio_payloads import encode_append
+from client.resilient_connection import ResilientConnection
+from client.session import send_session_update
+from client.text_message_sender import send_text_message
+from mock_realtime_server import MockRealtimeServer, ResponseScript, SAMPLE_RATE
+from benchmarks.common import SimulatedOutputDevice, print_summary
+
+class TimedResilientConnection(ResilientConnection):
+    """Stamps the first audio delta received over the new connection after each drop."""
+    dropped_at = None
+    first_audio_after_drop = None
+    recoveries_at_drop = 0
+
+    def _record_incoming(self, message):
+        # deltas still queued on the dropped socket come in first, they are not the resumed response
+        if (self.dropped_at is not None and self.first_audio_after_drop is None
+                and len(self.recoveries) > self.recoveries_at_drop
+                and peek_event_type(message) == "response.audio.delta"):
+            self.first_audio_after_drop = time.monotonic()
+        super()._record_incoming(message)
+
+async def wait_for(predicate, timeout=10.0):
+    """Poll predicate until it is true."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Condition not reached in time.")
+        await asyncio.sleep(0.002)
+
+async def check_replay_budget(max_replay_bytes, utterances=40, utterance_seconds=2.0):
+    """
+    Record many committed utterances and check that the oldest are forgotten once the replay exceeds its byte budget,
+    then send a long uncommitted one while disconnected, of which only the last max_replay_bytes / 4 may be kept.
+    Returns the bytes kept of each.
+    """
+    conn = ResilientConnection("ws://localhost", max_replay_bytes=max_replay_bytes,
+                               max_replay_input=max_replay_bytes // 4)
+    chunk = bytes(int(0.1 * SAMPLE_RATE) * 2)
+    for _ in range(utterances):
+        for _ in range(int(utterance_seconds * 10)):
+            conn._record_outgoing(encode_append(chunk))
+        conn._record_outgoing('{"type": "input_audio_buffer.commit"}')
+    kept = sum(size for _, size in conn._items)
+    assert kept == conn._items_bytes <= max_replay_bytes, f"{kept} bytes kept for a budget of {max_replay_bytes}"
+    assert 0 < len(conn._items) < utterances, "the oldest utterances were not forgotten"
+
+    for _ in range(int(utterance_seconds * 10) * 4):
+        await conn.send(encode_append(chunk))
+    assert conn._input_bytes <= max_replay_bytes // 4, "the uncommitted audio kept for replay is not bounded"
+    assert not conn._held, "audio sent while disconnected was held outside the replay budget"
+    return kept, conn._input_bytes
+
+async def run_benchmark(trials, script, seed=0, standby=False, handshake_delay=0.0):
+    """
+    Drop the connection once per trial. Returns the recovery measurements in seconds, the ms of audio played during
+    each outage, the ms played beyond the regenerated response, and the recoveries.
+    """
+    rng = random.Random(seed)
+    results = {"drop_to_session_replayed": [], "drop_to_response_replayed": [], "drop_to_first_audio": []}
+    played_during_outage = []
+    played_over = []
+    devices = []
+
+    def open_device(**kwargs):
+        devices.append(SimulatedOutputDevice(**kwargs))
+        return devices[-1]
+
+    playback_thread = audio_playback.start_playback_thread(stream_factory=open_device)
+    modalities = ["text", "audio"]
+
+    async with MockRealtimeServer(script=script, handshake_delay=handshake_delay) as server:
+        conn = TimedResilientConnection(server.url, standby=standby,
+                                        interrupt_playback=audio_playback.interrupt_playback)
+        if not await conn.connect(retry_count=1):
+            raise RuntimeError("Could not connect to the mock server.")
+        state = {"response_started": False, "exit_requested": False, "failure_count": 0}
+        message_queue = asyncio.Queue()
+        await send_session_update(conn, modalities, "alloy", "benchmark")
+        receive_task = asyncio.create_task(client_main.receive_messages(conn, True, message_queue, modalities, state))
+
+        try:
+            await wait_for(lambda: devices)
+            device = devices[0]
+            for trial in range(trials):
+                device.first_audible_at = None
+                device.audible_frames = 0
+                conn.dropped_at = conn.first_audio_after_drop = None
+                conn.recoveries_at_drop = len(conn.recoveries)
+
+                # let the assistant talk for a while, then pull the plug
+                await send_text_message(conn, modalities, f"Tell me something long, take {trial}.", "benchmark", "alloy")
+                talk_for = rng.uniform(0.2, 0.6)
+                await wait_for(lambda: device.first_audible_at is not None
+                               and time.perf_counter() - device.first_audible_at >= talk_for)
+                frames_before = device.audible_frames
+                # only the connection in use: the last event received came over it
+                active = server.received[-1]["_connection"]
+                dropped_at = conn.dropped_at = server.drop_connections(active)
+
+                # audio the device played between the drop and the first audio of the resumed response
+                await wait_for(lambda: conn.first_audio_after_drop is not None)
+                frames_at_resume = device.audible_frames
+                played_during_outage.append((frames_at_resume - frames_before) * 1000 / SAMPLE_RATE)
+
+                # the resumed response closes the turn
+                while await message_queue.get() != client_main.SIGNAL_PROMPT:
+                    pass
+
+                # what the new connection received after the drop, in order
+                connection = next(event["_connection"] for event in server.received
+                                  if event["_received_at"] >= dropped_at)
+                replay = [event for event in server.received
+                          if event["_connection"] == connection and event["_received_at"] >= dropped_at]
+                assert replay[0]["type"] == "session.update", f"replay started with {replay[0]['type']}"
+                items = [event for event in replay if event["type"] == "conversation.item.create"]
+                expected_items = 2 * trial + 1
+                assert len(items) == expected_items, f"{len(items)} items replayed, expected {expected_items}"
+                response_create = next(event for event in replay if event["type"] == "response.create")
+
+                results["drop_to_session_replayed"].append(replay[0]["_received_at"] - dropped_at)
+                results["drop_to_response_replayed"].append(response_create["_received_at"] - dropped_at)
+                results["drop_to_first_audio"].append(conn.first_audio_after_drop - dropped_at)
+                await asyncio.to_thread(audio_playback.wait_for_playback_finish)
+
+                # after the resume only the regenerated response is heard, in full
+                resumed_ms = (device.audible_frames - frames_at_resume) * 1000 / SAMPLE_RATE
+                played_over.append(resumed_ms - script.audio_chunks * script.chunk_ms)
+        finally:
+            receive_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await receive_task
+            await conn.close()
+            audio_playback.stop_playback_thread(playback_thread)
+
+    return results, played_during_outage, played_over, conn.recoveries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark reconnection against the mock realtime server.")
+    parser.add_argument("--trials", type=int, default=10, help="Number of dropped connections.")
+    parser.add_argument("--audio-chunks", type=int, default=20, help="Audio deltas per response.")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Audio duration per delta in milliseconds.")
+    parser.add_argument("--delta-interval", type=float, default=0.05, help="Server delay between deltas.")
+    parser.add_argument("--standby", action="store_true", help="Fail over to a pre-warmed standby connection.")
+    parser.add_argument("--handshake-delay", type=float, default=0.0,
+                        help="Seconds the mock server holds every opening handshake, like a remote endpoint.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+    script = ResponseScript(audio_chunks=args.audio_chunks, chunk_ms=args.chunk_ms, delta_interval=args.delta_interval)
+    with contextlib.redirect_stdout(io.StringIO()):
+        measurements, played, played_over, recoveries = asyncio.run(run_benchmark(args.trials, script, standby=args.standby,
+                                                                     handshake_delay=args.handshake_delay))
+
+    print_summary(f"Recovery over {args.trials} dropped connections", measurements)
+    attempts = [recovery["attempts"] for recovery in recoveries]
+    print(f"\nReconnect attempts: {min(attempts)} to {max(attempts)}; items replayed up to "
+          f"{max(recovery['items_replayed'] for recovery in recoveries)}")
+    print(f"Audio played between the drop and the resumed response: {min(played):.0f} to {max(played):.0f} ms")
+    print(f"Audio played after the resume beyond the regenerated response: {min(played_over):+.0f} to "
+          f"{max(played_over):+.0f} ms")
+
+    budget = 2 ** 20
+    kept, kept_input = asyncio.run(check_replay_budget(budget))
+    print(f"Replay kept {kept / 2 ** 20:.2f} MB of committed audio for a {budget / 2 ** 20:.0f} MB budget, and "
+          f"{kept_input / 2 ** 20:.2f} MB of uncommitted audio for {budget / 4 / 2 ** 20:.2f} MB")
+
+    assert len(recoveries) == args.trials, "a dropped connection was not recovered"
+    if args.standby:
+        print(f"Failovers to the standby connection: {sum(recovery['standby'] for recovery in recoveries)}")
+    assert min(played) > 0, "playback stopped when the connection dropped"
+    # a device period or two of rounding, where the rest of the cut off response would be several hundred ms
+    assert max(played_over) < 100, "the rest of the cut off response played over the regenerated one"
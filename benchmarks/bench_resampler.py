@@ -0,0 +1,106 @@
+"""
+Benchmark the streaming polyphase resampler against the pydub path it replaces (AudioSegment.set_frame_rate, which
+resamples each chunk on its own with audioop.ratecv).
+For every capture rate it reports the cost per microphone chunk, the quality of a 1 kHz tone, how much of a tone
+above the output Nyquist frequency aliases back into the output, and how far chunk-by-chunk output strays from the
+clip resampled at once. The run fails if the resampler adds boundary artifacts or misses its quality targets.
+
+Run from the repository root:
+    python -m benchmarks.bench_resampler --chunk-ms 43
+"""
+import argparse
+import numpy as np
+from pydub import AudioSegment
+from client.audio.resampler import Resampler, resample
+from benchmarks.common import time_per_call
+
+TARGET_RATE = 24000
+CAPTURE_RATES = (8000, 16000, 44100, 48000)
+AMPLITUDE = 10000
+
+def tone(frequency, rate, seconds=1.0):
+    """A PCM16 sine tone."""
+    return (AMPLITUDE * np.sin(2 * np.pi * frequency * np.arange(int(rate * seconds)) / rate)).astype(np.int16)
+
+def pydub_resample(pcm_audio, from_rate, to_rate):
+    """The previous path: a PCM16 AudioSegment converted with set_frame_rate."""
+    return AudioSegment(data=pcm_audio, sample_width=2, frame_rate=from_rate, channels=1).set_frame_rate(to_rate).raw_data
+
+def chunks(pcm_audio, rate, chunk_ms):
+    size = rate * chunk_ms // 1000 * 2
+    return [pcm_audio[i:i + size] for i in range(0, len(pcm_audio), size)]
+
+def stream_resampler(pcm_audio, from_rate, chunk_ms):
+    resampler = Resampler(from_rate, TARGET_RATE)
+    return b"".join(resampler.process(chunk) for chunk in chunks(pcm_audio, from_rate, chunk_ms)) + resampler.flush()
+
+def stream_pydub(pcm_audio, from_rate, chunk_ms):
+    return b"".join(pydub_resample(chunk, from_rate, TARGET_RATE) for chunk in chunks(pcm_audio, from_rate, chunk_ms))
+
+def snr_db(pcm_audio, frequency, rate, trim=0.05):
+    """Signal-to-noise ratio of a resampled tone against the ideal one, skipping the edges."""
+    output = np.frombuffer(pcm_audio, dtype=np.int16).astype(np.float64)
+    ideal = AMPLITUDE * np.sin(2 * np.pi * frequency * np.arange(len(output)) / rate)
+    edge = int(rate * trim)
+    error = output[edge:-edge] - ideal[edge:-edge]
+    return 10 * np.log10(np.sum(ideal[edge:-edge] ** 2) / max(np.sum(error ** 2), 1e-9))
+
+def level_db(pcm_audio, trim=0.05, rate=TARGET_RATE):
+    """RMS level relative to the test tone, skipping the edges."""
+    output = np.frombuffer(pcm_audio, dtype=np.int16).astype(np.float64)
+    edge = int(rate * trim)
+    rms = np.sqrt(np.mean(output[edge:-edge] ** 2))
+    return 20 * np.log10(max(rms, 1e-3) / (AMPLITUDE / np.sqrt(2)))
+
+def max_difference(a, b):
+    """Largest sample difference between two PCM16 clips over their common length."""
+    a, b = np.frombuffer(a, dtype=np.int16), np.frombuffer(b, dtype=np.int16)
+    length = min(len(a), len(b))
+    return int(np.abs(a[:length].astype(np.int32) - b[:length]).max())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the streaming resampler against pydub.")
+    parser.add_argument("--chunk-ms", type=int, default=43, help="Microphone chunk duration in milliseconds.")
+    args = parser.parse_args()
+
+    print(f"Resampling to {TARGET_RATE} Hz in {args.chunk_ms} ms chunks")
+    print(f"{'from':>7} {'path':<11}{'per chunk':>12}{'realtime':>11}{'SNR whole':>12}{'SNR chunked':>13}{'alias':>10}"
+          f"{'vs whole':>10}")
+    for rate in CAPTURE_RATES:
+        speech = tone(1000, rate)
+        chunk = speech[:rate * args.chunk_ms // 1000].tobytes()
+        resampler = Resampler(rate, TARGET_RATE)
+
+        # a tone above the output Nyquist frequency must be filtered out, not folded back, where the input has one
+        above = 15000 if rate > 2 * 15000 else None
+        paths = [
+            ("polyphase", lambda: resampler.process(chunk), lambda audio: resample(audio, rate, TARGET_RATE),
+             lambda audio: stream_resampler(audio, rate, args.chunk_ms)),
+            ("pydub", lambda: pydub_resample(chunk, rate, TARGET_RATE),
+             lambda audio: pydub_resample(audio, rate, TARGET_RATE),
+             lambda audio: stream_pydub(audio, rate, args.chunk_ms)),
+        ]
+        results = {}
+        for name, per_chunk, whole, streamed in paths:
+            seconds = time_per_call(per_chunk, number=200)
+            whole_tone = whole(speech.tobytes())
+            streamed_tone = streamed(speech.tobytes())
+            alias = level_db(streamed(tone(above, rate).tobytes())) if above else None
+            results[name] = {
+                "snr": snr_db(streamed_tone, 1000, TARGET_RATE),
+                "alias": alias,
+                "boundary": max_difference(streamed_tone, whole_tone),
+            }
+            print(f"{rate:>7} {name:<11}{seconds * 1e6:>9.1f} us{args.chunk_ms / 1000 / seconds:>10.0f}x"
+                  f"{snr_db(whole_tone, 1000, TARGET_RATE):>9.1f} dB{results[name]['snr']:>10.1f} dB"
+                  + (f"{alias:>7.1f} dB" if above else f"{'-':>10}")
+                  + f"{results[name]['boundary']:>10}")
+
+        # chunked output must be the same as the whole clip resampled at once, up to rounding
+        assert results["polyphase"]["boundary"] <= 1, f"{rate} Hz: chunk boundaries change the output"
+        assert results["polyphase"]["snr"] > 60, f"{rate} Hz: 1 kHz tone SNR {results['polyphase']['snr']:.1f} dB"
+        if above:
+            assert results["polyphase"]["alias"] < -60, f"{rate} Hz: aliasing at {results['polyphase']['alias']:.1f} dB"
+
+    print("\nSNR is of a 1 kHz tone resampled whole and chunk by chunk; alias is the level of a 15 kHz tone folded "
+          "into the 24 kHz output; vs whole is the largest sample difference between chunked and whole-clip output.")
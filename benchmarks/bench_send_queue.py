@@ -0,0 +1,195 @@
+"""
+Benchmark the SendQueue: how long a response.cancel takes to reach the server while an audio upload fills a slow
+uplink. Three paths are compared: ws.send straight to a websocket with the default 64 KiB write limit, as before;
+the same with the client's smaller WRITE_LIMIT; and the SendQueue's writer over that smaller limit.
+The link is simulated: it delivers bytes at the given bandwidth and, like a websockets connection, send() writes the
+frame into the socket buffer at once and waits while the buffer is above the write limit. The cancel is sent at a
+random point, and the upload ends with a commit and a response.create.
+First one task uploads 200 ms appends as fast as the link takes them, awaiting each send. Then the audio is sent the
+way audio handed over from a device callback is (run_coroutine_threadsafe): every chunk from a task of its own, as it
+is produced, faster than the link carries it. Awaiting each send, the smaller write limit alone brings the cancel
+forward and the queue only matches it. Sent from callbacks, plain ws.send writes every chunk into the socket buffer
+at once, however full, and the cancel waits behind all of it; the queue keeps the buffer at the write limit and
+sends the cancel ahead of its own bounded backlog.
+The run fails if the queue reorders the upload or makes it slower, if the smaller write limit does not bring the
+cancel forward when one task uploads, or if the queue does not beat ws.send with that limit when sending from
+callbacks.
+
+Run from the repository root:
+    python -m benchmarks.bench_send_queue --kbps 1000 --trials 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from client.audio.audio_message_sender import commit_input_audio, send_input_audio_append
+from client.connection_handler import WRITE_LIMIT
+from client.event_decoder import peek_event_type
+from client.response_handler import trigger_response
+from client.send_queue import SendQueue, CONTROL, CONVERSATION
+from benchmarks.common import print_summary
+
+CHUNK_BYTES = 9600          # 200 ms of 24kHz PCM16, as send_audio_file reads it
+DEFAULT_WRITE_LIMIT = 2 ** 16  # websockets' default, which the client connected with before
+TICK = 0.002
+
+class SimulatedLink:
+    """A websocket on a slow uplink: frames are delivered in order at bytes_per_second."""
+    def __init__(self, bytes_per_second, write_limit):
+        self.bytes_per_second = bytes_per_second
+        self.write_limit = write_limit
+        self.closed = False
+        self.delivered = []       # (time, frame) in delivery order
+        self._frames = deque()    # [frame, bytes left] in the socket buffer
+        self._buffered = 0
+        self._drained = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._deliver())
+
+    async def send(self, message):
+        # written at once, then wait while the buffer is above the limit, until it is down to a quarter of it
+        self._frames.append([message, len(message)])
+        self._buffered += len(message)
+        self._wakeup.set()
+        if self._buffered > self.write_limit:
+            while self._buffered > self.write_limit // 4:
+                self._drained.clear()
+                await self._drained.wait()
+
+    async def _deliver(self):
+        last = time.perf_counter()
+        while True:
+            if not self._frames:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                last = time.perf_counter()
+            await asyncio.sleep(TICK)
+            now = time.perf_counter()
+            budget = (now - last) * self.bytes_per_second
+            last = now
+            while self._frames and budget > 0:
+                frame = self._frames[0]
+                taken = min(frame[1], budget)
+                frame[1] -= taken
+                budget -= taken
+                self._buffered -= taken
+                if frame[1] <= 0:
+                    self._frames.popleft()
+                    self.delivered.append((now, frame[0]))
+            self._drained.set()
+
+    async def close(self):
+        self.closed = True
+        self._task.cancel()
+
+async def upload(ws, chunks, interval=None):
+    """
+    Stream the audio as fast as the connection takes it, then commit it and ask for the response.
+    With an interval, a chunk is produced every interval seconds and sent from a task of its own instead.
+    """
+    pcm_audio = bytes(CHUNK_BYTES)
+    if interval is None:
+        for _ in range(chunks):
+            await send_input_audio_append(ws, pcm_audio)
+    else:
+        sends = []
+        for _ in range(chunks):
+            sends.append(asyncio.create_task(send_input_audio_append(ws, pcm_audio)))
+            await asyncio.sleep(interval)
+        await asyncio.gather(*sends)
+    await commit_input_audio(ws)
+    await trigger_response(ws, ["text", "audio"], None, "alloy")
+
+# name -> (write limit, sent through a SendQueue)
+PATHS = {
+    "before: ws.send, 64 KiB": (DEFAULT_WRITE_LIMIT, False),
+    f"ws.send, {WRITE_LIMIT // 1024} KiB": (WRITE_LIMIT, False),
+    f"SendQueue, {WRITE_LIMIT // 1024} KiB": (WRITE_LIMIT, True),
+}
+
+async def trial(write_limit, queued, bytes_per_second, chunks, cancel_after, interval=None):
+    """Run one upload with a cancel sent cancel_after seconds into it. Returns the measurements."""
+    link = SimulatedLink(bytes_per_second, write_limit)
+    ws = SendQueue(link) if queued else link
+    started = time.perf_counter()
+    upload_task = asyncio.create_task(upload(ws, chunks, interval))
+
+    await asyncio.sleep(cancel_after)
+    cancel = json.dumps({"type": "response.cancel"})
+    cancel_sent = time.perf_counter()
+    await ws.send(cancel)
+    await upload_task
+    while len(link.delivered) < chunks + 3:
+        await asyncio.sleep(TICK)
+    await ws.close()
+
+    delivered_at = {frame: at for at, frame in link.delivered}
+    order = [peek_event_type(frame) for _, frame in link.delivered if frame != cancel]
+    return {
+        "cancel_latency": delivered_at[cancel] - cancel_sent,
+        "upload_time": link.delivered[-1][0] - started,
+        "in_order": order == ["input_audio_buffer.append"] * chunks + ["input_audio_buffer.commit", "response.create"],
+        "stats": ws.stats() if queued else None,
+    }
+
+async def run_benchmark(args, overload=None):
+    """
+    Run every path. With overload, the chunks are sent from callback tasks, produced overload times faster than the
+    link carries them.
+    """
+    rng = random.Random(args.seed)
+    bytes_per_second = args.kbps * 1000 / 8
+    upload_seconds = args.chunks * CHUNK_BYTES * 4 / 3 / bytes_per_second
+    interval = None if overload is None else upload_seconds / overload / args.chunks
+    results = {name: [] for name in PATHS}
+    for _ in range(args.trials):
+        cancel_after = rng.uniform(0.2, 0.8) * (upload_seconds if overload is None else args.chunks * interval)
+        for name, (write_limit, queued) in PATHS.items():
+            results[name].append(await trial(write_limit, queued, bytes_per_second, args.chunks, cancel_after,
+                                             interval))
+    return results
+
+def report(title, results):
+    """Print the cancel latency and upload time of each path."""
+    print_summary(f"{title}: response.cancel sent during the upload, until delivered",
+                  {name: [result["cancel_latency"] for result in path] for name, path in results.items()})
+    print_summary(f"{title}: upload, until response.create is delivered",
+                  {name: [result["upload_time"] for result in path] for name, path in results.items()})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark response.cancel latency behind an audio upload.")
+    parser.add_argument("--kbps", type=float, default=1000, help="Uplink bandwidth in kilobits per second.")
+    parser.add_argument("--chunks", type=int, default=20, help="200 ms audio chunks uploaded per trial.")
+    parser.add_argument("--trials", type=int, default=10, help="Uploads per path.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the cancel times.")
+    parser.add_argument("--overload", type=float, default=1.5,
+                        help="How much faster than the link carries it the callbacks produce audio.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+    callbacks = asyncio.run(run_benchmark(args, args.overload))
+    small_limit, queue_path = f"ws.send, {WRITE_LIMIT // 1024} KiB", f"SendQueue, {WRITE_LIMIT // 1024} KiB"
+    before, queued = results["before: ws.send, 64 KiB"], results[queue_path]
+    print(f"{args.chunks} x 200 ms audio appends over a {args.kbps:.0f} kbit/s uplink, {args.trials} trials")
+    report("One task awaiting each send", results)
+    report(f"Sent from callbacks, {args.overload:g}x faster than the link", callbacks)
+    stats = callbacks[queue_path][-1]["stats"]
+    print(f"\nQueued for the socket in the last trial: {stats['sent'][CONVERSATION]} conversation frames, "
+          f"p95 {stats['delays'][CONVERSATION]['p95'] * 1000:.0f} ms; {stats['sent'][CONTROL]} control frame, "
+          f"max {stats['delays'][CONTROL]['max'] * 1000:.1f} ms; at most {stats['max_buffered'] / 1024:.0f} KiB queued")
+
+    def total_latency(path):
+        return sum(result["cancel_latency"] for result in path)
+
+    assert all(result["in_order"] for run in (results, callbacks) for path in run.values() for result in path), \
+        "the upload was reordered"
+    assert total_latency(results[small_limit]) < total_latency(before), \
+        "the smaller write limit did not get the cancel through sooner"
+    assert total_latency(callbacks[queue_path]) < total_latency(callbacks[small_limit]), \
+        "the queue did not get the cancel through sooner than ws.send when sending from callbacks"
+    for run in (results, callbacks):
+        assert max(result["upload_time"] for result in run[queue_path]) < \
+            1.1 * max(result["upload_time"] for result in run["before: ws.send, 64 KiB"]), \
+            "the queue slowed the upload down"
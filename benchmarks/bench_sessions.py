@@ -0,0 +1,109 @@
+"""
+Benchmark many concurrent realtime sessions on one event loop against the mock server.
+Every session runs its own conversation with a callback sink, one session is killed half way through, and the run
+fails if any other session loses a response or receives audio that is not its own.
+
+Run from the repository root:
+    python -m benchmarks.bench_sessions --sessions 200 --turns 3
+"""
+import argparse
+import asyncio
+import time
+from client.audio.audio_sinks import CallbackSink
+from client.realtime_session import SessionConfig, SessionManager
+from mock_realtime_server import MockRealtimeServer, ResponseScript, SAMPLE_RATE, SAMPLE_WIDTH
+from benchmarks.common import print_summary
+
+async def run_conversation(session, turns, received, first_audio):
+    """Run the turns of one session, recording the time to the first audio of each response."""
+    for turn in range(turns):
+        sent_at = time.perf_counter()
+        result = await session.send_text(f"{session.id} turn {turn}")
+        if result["status"] != "completed":
+            raise RuntimeError(f"{session.id}: response {result['id']} ended {result['status']}")
+        first_audio.append(received[session.id].pop("first_audio_at") - sent_at)
+
+async def run_benchmark(sessions, turns, script, connect_concurrency):
+    """Open the sessions, run their conversations concurrently and return the measurements."""
+    received = {}
+    first_audio = []
+    config = SessionConfig(modalities=["text", "audio"], system_message="benchmark")
+
+    def sink_for(session_id):
+        counters = {"bytes": 0, "items": set()}
+        received[session_id] = counters
+
+        def on_audio(pcm_audio, item_id):
+            counters["bytes"] += len(pcm_audio)
+            counters["items"].add(item_id)
+            counters.setdefault("first_audio_at", time.perf_counter())
+        return CallbackSink(on_audio)
+
+    async with MockRealtimeServer(script=script) as server:
+        config.url = server.url
+        async with SessionManager(max_sessions=sessions, connect_concurrency=connect_concurrency) as manager:
+            started = time.perf_counter()
+            opened = await asyncio.gather(*(manager.open(config, sink_for(f"caller_{i}"), f"caller_{i}")
+                                            for i in range(sessions)))
+            connect_time = time.perf_counter() - started
+
+            # one session drops its connection half way through its conversation
+            victim = opened[0]
+
+            async def kill_victim():
+                while victim.responses_done < max(1, turns // 2):
+                    await asyncio.sleep(0.005)
+                await victim.ws.close()
+
+            started = time.perf_counter()
+            results = await asyncio.gather(kill_victim(),
+                                           *(run_conversation(session, turns, received, first_audio)
+                                             for session in opened),
+                                           return_exceptions=True)
+            wall_time = time.perf_counter() - started
+
+    failures = [result for session, result in zip(opened, results[1:]) if isinstance(result, Exception)]
+    healthy = opened[1:]
+    return {
+        "connect_time": connect_time,
+        "wall_time": wall_time,
+        "first_audio": first_audio,
+        "failures": failures,
+        "victim_failed": isinstance(results[1], Exception),
+        "healthy": healthy,
+        "received": received,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent sessions on one event loop.")
+    parser.add_argument("--sessions", type=int, default=200, help="Number of concurrent sessions.")
+    parser.add_argument("--turns", type=int, default=3, help="Responses requested by each session.")
+    parser.add_argument("--connect-concurrency", type=int, default=50, help="Connections opened at once.")
+    parser.add_argument("--audio-chunks", type=int, default=10, help="Audio deltas per response.")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Audio carried by each delta, in milliseconds.")
+    parser.add_argument("--delta-interval-ms", type=float, default=20.0, help="Server pause between deltas.")
+    args = parser.parse_args()
+
+    script = ResponseScript(audio_chunks=args.audio_chunks, chunk_ms=args.chunk_ms,
+                            delta_interval=args.delta_interval_ms / 1000)
+    results = asyncio.run(run_benchmark(args.sessions, args.turns, script, args.connect_concurrency))
+
+    print_summary(f"{args.sessions} sessions x {args.turns} turns on one event loop",
+                  {"time_to_first_audio": results["first_audio"]})
+    responses = (args.sessions - 1) * args.turns
+    print(f"\nconnect {args.sessions} sessions: {results['connect_time'] * 1000:.0f} ms")
+    print(f"conversations: {results['wall_time'] * 1000:.0f} ms, "
+          f"{responses / results['wall_time']:.0f} responses/s across the healthy sessions")
+
+    # isolation: the killed session failed alone, and every other one got exactly its own audio
+    expected_bytes = args.turns * args.audio_chunks * (SAMPLE_RATE * args.chunk_ms // 1000) * SAMPLE_WIDTH
+    assert results["victim_failed"], "the killed session should have failed"
+    assert len(results["failures"]) == 1, f"healthy sessions failed: {results['failures'][1:]}"
+    for session in results["healthy"]:
+        counters = results["received"][session.id]
+        assert counters["bytes"] == expected_bytes, f"{session.id}: {counters['bytes']} != {expected_bytes} bytes"
+        assert len(counters["items"]) == args.turns, f"{session.id}: audio of {len(counters['items'])} items"
+    print(f"isolation: ok, the killed session failed alone, {len(results['healthy'])} sessions got exactly their audio")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark the cold start of the terminal client: from launch until the connection is open, the session configured
+and the output and input devices ready.
+The steps are run one after another, as the client used to, and overlapped by main.start_up, against a mock server
+with a handshake delay and simulated devices that take time to open. The run fails if overlapping is not faster.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --trials 10
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import time
+import main as client_main
+import client.audio.audio_playback as audio_playback
+from client.connection_handler import connect_to_server, close_connection
+from client.audio.jitter_buffer import JitterBuffer
+from client.session import send_session_update
+from mock_realtime_server import MockRealtimeServer
+from benchmarks.common import SimulatedOutputDevice, print_summary
+
+MODALITIES = ["text", "audio"]
+
+def slow_device_factory(open_delay):
+    """Stream factory for a simulated output device that takes open_delay seconds to open."""
+    def open_device(**kwargs):
+        time.sleep(open_delay)
+        return SimulatedOutputDevice(**kwargs)
+    return open_device
+
+def slow_microphone(open_delay):
+    """Stand-in for prepare_microphone that takes open_delay seconds."""
+    def prepare(audio_format):
+        time.sleep(open_delay)
+        return True
+    return prepare
+
+async def sequential_start(url, stream_factory, prepare_input):
+    """Output device, connection, session update and microphone one after another. Returns seconds to ready."""
+    started = time.perf_counter()
+    playback_thread = audio_playback.start_playback_thread(stream_factory, jitter_buffer=JitterBuffer())
+    await asyncio.to_thread(audio_playback.wait_for_playback_ready, client_main.DEVICE_OPEN_TIMEOUT)
+    ws = await connect_to_server(retry_count=1, url=url)
+    await send_session_update(ws, MODALITIES, "alloy", "benchmark", "server_vad")
+    await asyncio.to_thread(prepare_input, "pcm16")
+    ready = time.perf_counter() - started
+
+    await close_connection(ws)
+    audio_playback.stop_playback_thread(playback_thread)
+    return ready
+
+async def overlapped_start(url, stream_factory, prepare_input):
+    """The client's own startup. Returns seconds to ready."""
+    ws, playback_thread, timings = await client_main.start_up(
+        MODALITIES, "mic", "benchmark", "alloy", False, "pcm16", JitterBuffer(), reconnect_attempts=0, url=url,
+        stream_factory=stream_factory, prepare_input=prepare_input)
+    if ws is None:
+        raise RuntimeError("Could not connect to the mock server.")
+
+    await ws.close()
+    audio_playback.stop_playback_thread(playback_thread)
+    return timings["ready"]
+
+async def run_benchmark(trials, handshake_delay, device_delay, microphone_delay):
+    """Cold-start both ways for the given number of trials and return the times to ready in seconds."""
+    results = {"sequential": [], "overlapped": []}
+    stream_factory = slow_device_factory(device_delay)
+    prepare_input = slow_microphone(microphone_delay)
+
+    async with MockRealtimeServer(handshake_delay=handshake_delay) as server:
+        for _ in range(trials):
+            results["sequential"].append(await sequential_start(server.url, stream_factory, prepare_input))
+            results["overlapped"].append(await overlapped_start(server.url, stream_factory, prepare_input))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the client's cold start against the mock realtime server.")
+    parser.add_argument("--trials", type=int, default=10, help="Cold starts of each kind.")
+    parser.add_argument("--handshake-delay", type=float, default=0.15, help="Seconds the server holds the handshake.")
+    parser.add_argument("--device-delay", type=float, default=0.1, help="Seconds the output device takes to open.")
+    parser.add_argument("--microphone-delay", type=float, default=0.08, help="Seconds the microphone takes to open.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        measurements = asyncio.run(run_benchmark(args.trials, args.handshake_delay, args.device_delay,
+                                                 args.microphone_delay))
+
+    print_summary(f"Time to ready over {args.trials} cold starts", measurements)
+    sequential = sorted(measurements["sequential"])[args.trials // 2]
+    overlapped = sorted(measurements["overlapped"])[args.trials // 2]
+    print(f"\nOverlapping saves {(sequential - overlapped) * 1000:.0f} ms at the median "
+          f"(handshake {args.handshake_delay * 1000:.0f} ms, output device {args.device_delay * 1000:.0f} ms, "
+          f"microphone {args.microphone_delay * 1000:.0f} ms)")
+    assert overlapped < sequential, "overlapped startup is not faster than the sequential one"
@@ -0,0 +1,51 @@
+"""
+Benchmark the per-chunk cost of voice activity detection and the number of concurrent streams one core can carry.
+
+Run from the repository root:
+    python -m benchmarks.bench_vad --chunk-ms 20
+"""
+import argparse
+import numpy as np
+from client.audio.audio_processing import is_silent
+from client.audio.vad import StreamingVAD
+from benchmarks.common import time_per_call
+
+RATE = 24000
+
+def legacy_is_silent(pcm_audio, threshold=100):
+    """The previous is_silent: several full passes and an int16 square that overflows."""
+    audio_data = np.frombuffer(pcm_audio, dtype=np.int16)
+    if len(audio_data) == 0:
+        return True
+    if np.all(audio_data == 0) or np.any(np.isnan(audio_data)) or np.max(np.abs(audio_data)) > 32767:
+        return True
+    with np.errstate(invalid='ignore'):
+        rms = np.sqrt(np.mean(np.square(audio_data)))
+    return rms < threshold
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark voice activity detection per chunk.")
+    parser.add_argument("--chunk-ms", type=float, default=20.0, help="Chunk duration in milliseconds.")
+    parser.add_argument("--streams", type=int, default=100, help="Independent detector instances to cycle through.")
+    args = parser.parse_args()
+
+    samples = int(RATE * args.chunk_ms / 1000)
+    chunk_seconds = samples / RATE
+    rng = np.random.default_rng(0)
+    speech = (np.sin(np.arange(samples) * 2 * np.pi * 220 / RATE) * 6000 + rng.normal(0, 200, samples))
+    pcm = speech.astype('<i2').tobytes()
+
+    # one detector per simulated stream, so state is not shared
+    detectors = [StreamingVAD(RATE) for _ in range(args.streams)]
+    cursor = iter(range(10 ** 12))
+
+    def streaming_vad():
+        detectors[next(cursor) % len(detectors)].process(pcm)
+
+    print(f"Chunk of {samples} samples ({args.chunk_ms:.0f} ms at {RATE} Hz)")
+    print(f"{'detector':<24}{'per chunk':>14}{'streams per core':>20}")
+    for label, func in (("legacy is_silent", lambda: legacy_is_silent(pcm)),
+                        ("is_silent", lambda: is_silent(pcm)),
+                        ("StreamingVAD", streaming_vad)):
+        per_chunk = time_per_call(func, number=20000)
+        print(f"{label:<24}{per_chunk * 1e6:>11.2f} us{chunk_seconds / per_chunk:>20.0f}")
@@ -0,0 +1,141 @@
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from client.resource_usage import current_rss
+from client.turn_metrics import LatencyHistogram, format_ms, percentile
+
+def summarize(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    """Summarize a series of measurements."""
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+def print_summary(title: str, rows: Dict[str, List[float]]) -> None:
+    """Print a table of p50/p95/p99/max for each named series of durations in seconds."""
+    print(f"\n{title}")
+    print(f"{'metric':<32}{'n':>6}{'p50':>14}{'p95':>14}{'p99':>14}{'max':>14}")
+    for name, values in rows.items():
+        stats = summarize(values)
+        print(f"{name:<32}{stats['count']:>6}{format_ms(stats['p50']):>14}{format_ms(stats['p95']):>14}"
+              f"{format_ms(stats['p99']):>14}{format_ms(stats['max']):>14}")
+
+def print_histograms(title: str, rows: Dict[str, LatencyHistogram]) -> None:
+    """Print a table like print_summary for each named LatencyHistogram; percentiles are bucket upper bounds."""
+    print(f"\n{title}")
+    print(f"{'metric':<32}{'n':>6}{'p50':>14}{'p95':>14}{'p99':>14}{'max':>14}")
+    for name, histogram in rows.items():
+        print(f"{name:<32}{histogram.count:>6}{format_ms(histogram.percentile(50)):>14}"
+              f"{format_ms(histogram.percentile(95)):>14}{format_ms(histogram.percentile(99)):>14}"
+              f"{format_ms(histogram.max if histogram.count else None):>14}")
+
+def time_per_call(func, *args, repeat: int = 5, number: int = 1000) -> float:
+    """Return the best-of-repeat average seconds per call of func(*args)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(*args)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+class SimulatedOutputDevice:
+    """
+    A stand-in for a callback-mode output stream such as sounddevice.RawOutputStream.
+    A thread calls the callback once per block at the device's pace (speed times real time) and records when the
+    first and the last non-silent blocks are pulled.
+    """
+    def __init__(self, samplerate, channels, blocksize, callback, speed=1.0, sample_width=2):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.callback = callback
+        self.speed = speed
+        self.frame_size = channels * sample_width
+        self.first_audible_at = None
+        self.last_audible_at = None
+        self.audible_frames = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        out = bytearray(self.blocksize * self.frame_size)
+        period = self.blocksize / (self.samplerate * self.speed)
+        next_time = time.perf_counter()
+        while not self._stopped.is_set():
+            self.callback(out, self.blocksize, None, None)
+            if out.count(0) != len(out):
+                self.audible_frames += self.blocksize
+                self.last_audible_at = time.perf_counter()
+                if self.first_audible_at is None:
+                    self.first_audible_at = self.last_audible_at
+            next_time += period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def close(self):
+        pass
+
+class SimulatedMicrophone:
+    """
+    A stand-in for a callback-mode input stream such as sounddevice.InputStream, used as a context manager.
+    A thread calls the callback with one block of int16 audio per period: quiet noise, or a loud wavering tone while
+    talk() has the user speaking. The times the user started and stopped talking are kept in talks.
+    """
+    def __init__(self, samplerate, channels, blocksize, callback):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.callback = callback
+        self.talks = []                 # (perf_counter start, end) of every talk()
+        self._talking_until = 0.0
+        self._rng = np.random.default_rng(0)
+        self._phase = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def talk(self, seconds):
+        """Have the user speak for the given number of seconds, from now on."""
+        now = time.perf_counter()
+        self._talking_until = now + seconds
+        self.talks.append((now, self._talking_until))
+
+    def _block(self):
+        block = self._rng.normal(0, 10, self.blocksize)
+        if time.perf_counter() < self._talking_until:
+            t = (self._phase + np.arange(self.blocksize)) / self.samplerate
+            block += 4000 * np.sin(2 * np.pi * (200 + 30 * np.sin(2 * np.pi * 4 * t)) * t)
+        self._phase += self.blocksize
+        return np.repeat(block.astype(np.int16)[:, None], self.channels, axis=1)
+
+    def _run(self):
+        period = self.blocksize / self.samplerate
+        next_time = time.perf_counter()
+        while not self._stopped.is_set():
+            self.callback(self._block(), self.blocksize, None, None)
+            next_time += period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
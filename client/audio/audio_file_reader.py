@@ -0,0 +1,148 @@
+# audio_file_reader.py
+import asyncio
+import logging
+import mmap
+import shutil
+import struct
+import numpy as np
+from client.audio.resampler import Resampler, downmix
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Audio decoded per chunk, in seconds
+CHUNK_DURATION = 0.2
+
+# WAV sample formats read without decoding
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def parse_wav_header(data):
+    """
+    Find the format and the sample data of a RIFF/WAVE file in a bytes-like object.
+    Returns (channels, sample_rate, sample_width, is_float, data_offset, data_size), or None when it is not a WAV
+    file with integer or float samples.
+    """
+    if len(data) < 12 or data[0:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = bytes(data[offset:offset + 4])
+        chunk_size = struct.unpack_from("<I", data, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            format_tag, channels, sample_rate = struct.unpack_from("<HHI", data, body)
+            bits = struct.unpack_from("<H", data, body + 14)[0]
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                # the actual format is the first two bytes of the sub-format GUID
+                format_tag = struct.unpack_from("<H", data, body + 24)[0]
+            fmt = (format_tag, channels, sample_rate, bits)
+        elif chunk_id == b"data" and fmt is not None:
+            format_tag, channels, sample_rate, bits = fmt
+            if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT) or bits not in (8, 16, 24, 32):
+                return None
+            # streamed writers leave the size unset, the data then runs to the end of the file
+            size = min(chunk_size, len(data) - body)
+            return channels, sample_rate, bits // 8, format_tag == WAVE_FORMAT_IEEE_FLOAT, body, size
+        offset = body + chunk_size + (chunk_size & 1)  # chunks are padded to an even size
+    return None
+
+def to_pcm16(raw, sample_width, is_float=False):
+    """Convert little-endian WAV samples to PCM16 bytes."""
+    if is_float:
+        samples = np.frombuffer(raw, dtype="<f4")
+        return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+    if sample_width == 2:
+        return bytes(raw)
+    if sample_width == 1:
+        # 8-bit WAV is unsigned
+        return ((np.frombuffer(raw, dtype=np.uint8).astype(np.int16) - 128) << 8).tobytes()
+    if sample_width == 3:
+        # keep the two most significant bytes of each sample
+        return np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)[:, 1:].copy().tobytes()
+    return (np.frombuffer(raw, dtype="<i4") >> 16).astype(np.int16).tobytes()
+
+async def read_audio_chunks(path, sample_rate, chunk_duration=CHUNK_DURATION):
+    """
+    Decode an audio file incrementally, yielding mono PCM16 chunks of about chunk_duration seconds at sample_rate.
+    WAV files are memory-mapped and converted a chunk at a time; other formats are decoded by an ffmpeg process
+    whose output is read a chunk at a time. Memory stays bounded by a few chunks whatever the length of the file.
+    """
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file
+            return
+        try:
+            header = parse_wav_header(mapped)
+            if header is not None:
+                for chunk in _wav_chunks(mapped, header, sample_rate, chunk_duration):
+                    yield chunk
+                    # let the event loop run between chunks
+                    await asyncio.sleep(0)
+                return
+        finally:
+            mapped.close()
+
+    async for chunk in _ffmpeg_chunks(path, sample_rate, chunk_duration):
+        yield chunk
+
+def _wav_chunks(mapped, header, sample_rate, chunk_duration):
+    """Yield the chunks of a memory-mapped WAV file."""
+    channels, file_rate, sample_width, is_float, offset, size = header
+    frame_size = channels * sample_width
+    step = max(1, int(file_rate * chunk_duration)) * frame_size
+    end = offset + size - size % frame_size
+    resampler = Resampler(file_rate, sample_rate)
+    logger.debug(f"Streaming WAV audio: {channels} channels at {file_rate} Hz, {sample_width * 8}-bit"
+                 f"{' float' if is_float else ''}, {size / frame_size / file_rate:.1f} s.")
+
+    released = offset - offset % mmap.PAGESIZE
+    for start in range(offset, end, step):
+        raw = memoryview(mapped)[start:min(start + step, end)]
+        try:
+            chunk = resampler.process(downmix(to_pcm16(raw, sample_width, is_float), channels))
+        finally:
+            raw.release()
+
+        # drop the pages already read from the resident set, the kernel can read them again if needed
+        done = min(start + step, end)
+        done -= done % mmap.PAGESIZE
+        if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_DONTNEED") and done > released:
+            mapped.madvise(mmap.MADV_DONTNEED, released, done - released)
+            released = done
+        yield chunk
+    tail = resampler.flush()
+    if tail:
+        yield tail
+
+async def _ffmpeg_chunks(path, sample_rate, chunk_duration):
+    """Yield the chunks of any file ffmpeg can decode, converted by ffmpeg to mono PCM16 at sample_rate."""
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError(f"{path} is not a PCM WAV file, and ffmpeg is needed to decode it.")
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-v", "error", "-nostdin", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-",
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    step = max(1, int(sample_rate * chunk_duration)) * 2
+    try:
+        while True:
+            try:
+                chunk = await process.stdout.readexactly(step)
+            except asyncio.IncompleteReadError as e:
+                # the end of the audio
+                chunk = e.partial
+            if not chunk:
+                break
+            yield chunk
+            if len(chunk) < step:
+                break
+        if await process.wait() != 0:
+            error = (await process.stderr.read()).decode(errors="replace").strip()
+            raise RuntimeError(f"ffmpeg could not decode {path}: {error}")
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
@@ -0,0 +1,30 @@
+# audio_formats.py
+from client.audio.g711_codec import ulaw_encode, alaw_encode
+
+# Audio formats supported by the Realtime API
+PCM16 = "pcm16"
+G711_ULAW = "g711_ulaw"
+G711_ALAW = "g711_alaw"
+AUDIO_FORMATS = (PCM16, G711_ULAW, G711_ALAW)
+
+# Sample rate of each format; G.711 is 8-bit telephony audio at 8kHz, a sixth of the PCM16 bandwidth
+SAMPLE_RATES = {
+    PCM16: 24000,
+    G711_ULAW: 8000,
+    G711_ALAW: 8000,
+}
+
+# Encoders from PCM16 to the wire format
+_ENCODERS = {
+    G711_ULAW: ulaw_encode,
+    G711_ALAW: alaw_encode,
+}
+
+def sample_rate_for(audio_format):
+    """Return the sample rate of an audio format."""
+    return SAMPLE_RATES.get(audio_format, SAMPLE_RATES[PCM16])
+
+def encode_audio(pcm_audio, audio_format=PCM16):
+    """Encode PCM16 audio for the wire. PCM16 is passed through unchanged."""
+    encoder = _ENCODERS.get(audio_format)
+    return pcm_audio if encoder is None else encoder(pcm_audio)
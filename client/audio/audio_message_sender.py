@@ -1,69 +1,129 @@
 import asyncio
 import json
 import logging
-import base64
-import sounddevice as sd
-from pydub import AudioSegment
+import math
+import time
+from collections import deque
 from client.response_handler import trigger_response
-from client.audio.audio_processing import audio_to_item_create_event, is_silent
+from client.audio.audio_file_reader import read_audio_chunks
+from client.audio.vad import StreamingVAD, SPEECH_START, SPEECH_END
+from client.audio.capture_buffer import AudioCaptureBuffer, MAX_UTTERANCE_DURATION
+from client.audio.frame_queue import FrameQueue
+from client.audio.audio_formats import PCM16, sample_rate_for
+from client.audio.audio_payloads import encode_append, encode_audio_item, encode_frame
+from client.audio.resampler import Resampler
+from client import turn_metrics
 
 logger = logging.getLogger(__name__)
 
+# How much faster than real time file audio is uploaded, 0 for as fast as the connection takes it
+UPLOAD_SPEED = 10.0
+
 # Function to send microphone audio to the server in real-time
-async def send_microphone_audio(ws, modalities, system_message, voice, response_done_event):
+async def send_microphone_audio(ws, modalities, system_message, voice, response_done_event, stream_audio=False,
+                                max_utterance_duration=MAX_UTTERANCE_DURATION, audio_format=PCM16, on_speech_start=None,
+                                continuous=False, server_vad=False, stream_factory=None):
     """
     Capture and send microphone audio in real-time to the server.
     Trigger the assistant response after sending the last audio chunk.
+    With stream_audio, frames are appended to the server's input audio buffer as they are captured
+    and the buffer is committed on end of speech, instead of uploading the whole utterance afterwards.
+    Otherwise up to max_utterance_duration seconds of speech are buffered and sent once it ends.
+    Audio is captured at the sample rate of audio_format, or at the device's own rate and resampled to it when the
+    device does not support it, and encoded to audio_format when sent.
+    on_speech_start is awaited as soon as speech is detected, e.g. to interrupt the assistant.
+    With continuous, the microphone stays open after an utterance is sent and keeps sending the next ones, until the
+    task is cancelled. With server_vad, every captured frame is appended and the server's own VAD detects the turns,
+    commits them and responds, so the local VAD is not used.
+    stream_factory opens a stand-in input stream (e.g. for benchmarks without a device), it is called with the
+    samplerate, channels, blocksize and callback keyword arguments of sounddevice.InputStream.
     """
     try:
-        RATE = 24000  # 24kHz sampling rate
+        RATE = sample_rate_for(audio_format)  # 24kHz for PCM16, 8kHz for G.711
+        # RATE, unless the device cannot capture at it; a stand-in stream captures at RATE
+        CAPTURE_RATE = capture_rate_for(RATE) if stream_factory is None else RATE
+        open_stream = stream_factory or default_input_stream_factory
         CHANNELS = 1  # Mono audio
-        CHUNK_SIZE = 1024  # Frames per chunk
+        CHUNK_SIZE = 1024 * RATE // 24000  # Frames per chunk (~43 ms)
         MAX_SILENCE_DURATION = 1.0  # Maximum silence duration in seconds
-        SILENCE_THRESHOLD = 100  # RMS threshold for silence
+        SILENCE_THRESHOLD = 100  # Minimum RMS threshold for speech
+        PREROLL_DURATION = 0.3  # Audio kept ahead of detected speech, so onsets are not clipped
+        MAX_QUEUE_DELAY = 2.0  # Captured audio the event loop may fall behind by before frames are dropped
 
-        audio_data_accumulated = b""  # Accumulated audio data
-        silence_duration = 0.0  # Duration of consecutive silence
-        speaking = False  # Whether the user is speaking
+        audio_data_accumulated = AudioCaptureBuffer(max_utterance_duration, RATE, 2, CHANNELS)  # Accumulated audio data
         audio_sent = False  # Flag to ensure audio is only sent once after silence
+        preroll = deque(maxlen=math.ceil(PREROLL_DURATION * RATE / CHUNK_SIZE))  # Recent frames before speech
+        vad = StreamingVAD(RATE, min_threshold=SILENCE_THRESHOLD, hangover=MAX_SILENCE_DURATION)
 
         logger.debug("Recording from microphone. Speak into the microphone.")
 
-        # Get the current event loop at the start and pass it to the callback
-        loop = asyncio.get_running_loop()
+        # Resampler from the capture rate, it keeps its state across blocks so their boundaries do not click
+        resampler = Resampler(CAPTURE_RATE, RATE, CHANNELS)
+        if not resampler.passthrough:
+            logger.info(f"Capturing at {CAPTURE_RATE} Hz and resampling to {RATE} Hz.")
+
+        # Queue carrying captured frames from the callback thread to the event loop
+        frame_queue = FrameQueue(asyncio.get_running_loop(), maxsize=math.ceil(MAX_QUEUE_DELAY * RATE / CHUNK_SIZE))
+
+        # Deliver a chunk of the utterance, either streamed straight away or buffered
+        async def deliver(pcm_audio):
+            if stream_audio:
+                await send_input_audio_append(ws, pcm_audio, audio_format)
+            else:
+                audio_data_accumulated.append(pcm_audio)
+                logger.debug(f"Accumulating audio. Buffer size: {len(audio_data_accumulated)} bytes.")
 
         # Define an async function for processing and sending audio chunks
         async def process_audio_chunk(pcm_audio):
-            nonlocal audio_data_accumulated, silence_duration, speaking, audio_sent
-
-            if is_silent(pcm_audio, threshold=SILENCE_THRESHOLD):
-                silence_duration += len(pcm_audio) / (RATE * 2)  # Adjust for the size of PCM16
-
-                # If user was speaking and silence exceeds threshold, send accumulated audio
-                if speaking and silence_duration >= MAX_SILENCE_DURATION and not audio_sent:
-                    logger.debug("End of speech detected. Sending accumulated audio.")
-                    if audio_data_accumulated:
-                        logger.debug(f"Sending {len(audio_data_accumulated)} bytes of audio.")
-                        await send_audio_chunk(ws, audio_data_accumulated, RATE, CHANNELS)
-                        audio_data_accumulated = b""  # Reset buffer after sending
-                        silence_duration = 0.0  # Reset silence duration
-                        speaking = False  # Reset speaking status
-                        audio_sent = True  # Set flag to avoid sending repeatedly
-
-                        # Trigger response after sending audio
-                        await trigger_response(ws, modalities, system_message, voice)
-
-                        # Signal that the response is done
-                        response_done_event.set()
+            nonlocal audio_sent
+
+            if server_vad:
+                # the server hears everything and decides where the turns are
+                await send_input_audio_append(ws, pcm_audio, audio_format)
+                return
+
+            event = vad.process(pcm_audio)
+
+            if event == SPEECH_START:
+                if on_speech_start is not None:
+                    await on_speech_start()
+
+                # deliver the pre-roll ahead of the first speech frame, so onsets are not clipped
+                frames = list(preroll)
+                preroll.clear()
+                for frame in frames:
+                    await deliver(frame)
+                await deliver(pcm_audio)
+
+            elif vad.speaking:
+                # speech, or a pause still inside the hangover
+                await deliver(pcm_audio)
+
+            elif event == SPEECH_END:
+                logger.debug("End of speech detected. Sending the utterance.")
+                turn_metrics.begin_turn()
+                turn_metrics.mark(turn_metrics.SPEECH_END)
+                audio_sent = True  # Set flag to avoid sending repeatedly
+                await deliver(pcm_audio)
+
+                if stream_audio:
+                    # the audio is already on the server
+                    await commit_input_audio(ws)
+                else:
+                    logger.debug(f"Sending {len(audio_data_accumulated)} bytes of audio.")
+                    await send_audio_chunk(ws, audio_data_accumulated.view(), RATE, CHANNELS, audio_format)
+                    audio_data_accumulated.clear()  # Reset buffer after sending
+                turn_metrics.mark(turn_metrics.AUDIO_SENT)
+
+                # Trigger response after sending audio
+                await trigger_response(ws, modalities, system_message, voice, audio_format)
+
+                # Signal that the response is done
+                response_done_event.set()
+
             else:
-                # Reset flags when new speech is detected
-                silence_duration = 0.0  # Reset silence duration if audio is detected
-                audio_data_accumulated += pcm_audio
-                speaking = True
-                if audio_sent:
-                    # New speech detected after sending audio
-                    audio_sent = False
-                logger.debug(f"Accumulating audio. Buffer size: {len(audio_data_accumulated)} bytes.")
+                # keep a short pre-roll until speech starts
+                preroll.append(pcm_audio)
 
         # Audio callback for real-time processing
         def audio_callback(indata, frames, time, status):
@@ -71,74 +131,177 @@ async def send_microphone_audio(ws, modalities, system_message, voice, response_
                 if status:
                     logger.error(f"Error: {status}")
 
-                # Convert the audio to PCM16 format
-                pcm_audio = (indata * 32767).astype('<i2').tobytes()
-
-                # Use the main event loop to process the audio chunk asynchronously
-                asyncio.run_coroutine_threadsafe(process_audio_chunk(pcm_audio), loop)
+                # Hand the PCM16 frame to the event loop at the session rate, without creating a coroutine per block
+                frame_queue.put(resampler.process(indata.tobytes()))
 
             except Exception as e:
                 logger.error(f"Error in audio_callback: {e}", exc_info=True)
 
         # Start the audio input stream
-        with sd.InputStream(samplerate=RATE, channels=CHANNELS, dtype='float32',
-                            callback=audio_callback, blocksize=CHUNK_SIZE):
+        with open_stream(samplerate=CAPTURE_RATE, channels=CHANNELS, callback=audio_callback,
+                         blocksize=CHUNK_SIZE * CAPTURE_RATE // RATE):
             logger.debug("Audio stream started.")
-            while not response_done_event.is_set():
-                await asyncio.sleep(0.1)  # Keep the stream running
+
+            # Drain the captured frames in batches until the utterance has been sent, or for good when continuous
+            while continuous or not audio_sent:
+                for pcm_audio in await frame_queue.get_batch():
+                    await process_audio_chunk(pcm_audio)
+                    if audio_sent and not continuous:
+                        break
+
+        # Report how the callback-to-loop bridge behaved
+        stats = frame_queue.stats()
+        logger.debug(f"Capture queue: {stats['delivered']} frames in {stats['batches']} batches, "
+                     f"{stats['dropped']} dropped, max delay {stats['max_delay'] * 1000:.1f} ms.")
+        if stats["dropped"]:
+            logger.warning(f"Dropped {stats['dropped']} microphone frames, the event loop fell behind.")
 
     except Exception as e:
         logger.error(f"Error while sending microphone audio: {e}", exc_info=True)
 
 
+# Function to open the microphone
+def default_input_stream_factory(**kwargs):
+    """Open a PCM16 callback-mode input stream on the default device."""
+    # imported here, so the senders can be used without PortAudio (e.g. by server-side sessions)
+    import sounddevice as sd
+    return sd.InputStream(dtype='int16', **kwargs)
+
+
+# Function to get the microphone ready ahead of the first prompt
+def prepare_microphone(audio_format=PCM16):
+    """
+    Load PortAudio and check that the default input device supports the capture settings, so the first prompt does
+    not pay for it and a missing microphone is reported at startup. Returns False if the microphone cannot be used.
+    """
+    try:
+        import sounddevice as sd
+        sd.check_input_settings(samplerate=capture_rate_for(sample_rate_for(audio_format)), channels=1, dtype='int16')
+        logger.debug("Microphone ready.")
+        return True
+    except Exception as e:
+        logger.error(f"Microphone not available: {e}")
+        return False
+
+
+# Function to pick the rate the microphone captures at
+def capture_rate_for(sample_rate):
+    """
+    Return sample_rate if the default input device captures at it, otherwise the device's default rate, which the
+    captured audio is then resampled from. Many devices only capture at 44.1 or 48kHz.
+    """
+    import sounddevice as sd
+    try:
+        sd.check_input_settings(samplerate=sample_rate, channels=1, dtype='int16')
+        return sample_rate
+    except Exception:
+        return int(sd.query_devices(kind='input')['default_samplerate'])
+
+
+# Function to append a captured frame to the server's input audio buffer
+async def send_input_audio_append(ws, pcm_audio, audio_format=PCM16):
+    """Append PCM16 audio to the input audio buffer via input_audio_buffer.append, encoded to audio_format."""
+    try:
+        await ws.send(await encode_frame(encode_append, pcm_audio, audio_format))
+        logger.debug(f"Appended {len(pcm_audio)} bytes to the input audio buffer.")
+
+    except Exception as e:
+        logger.error(f"Error appending input audio: {e}", exc_info=True)
+
+
+# Function to commit the input audio buffer as a user message
+async def commit_input_audio(ws):
+    """Commit the input audio buffer, turning the appended audio into a user conversation item."""
+    try:
+        await ws.send(json.dumps({"type": "input_audio_buffer.commit"}))
+        logger.debug("Committed the input audio buffer.")
+
+    except Exception as e:
+        logger.error(f"Error committing input audio: {e}", exc_info=True)
+
+
 # Function to send the accumulated audio chunk
-async def send_audio_chunk(ws, audio_data, rate, channels):
-    """Send the accumulated audio chunk via WebSocket."""
+async def send_audio_chunk(ws, audio_data, rate, channels, audio_format=PCM16):
+    """
+    Send the accumulated audio chunk via WebSocket.
+    audio_data is PCM16 at rate with the given channels; it is mixed down to mono and resampled to the rate of
+    audio_format only when needed, audio captured in the session's format is just encoded.
+    Utterances above OFFLOAD_THRESHOLD bytes are encoded on a worker thread.
+    """
     try:
-        # Convert audio data to PCM16 and encode in base64
-        audio_segment = AudioSegment(
-            data=audio_data,
-            sample_width=2,
-            frame_rate=rate,
-            channels=channels
-        )
-        pcm_audio_resampled = audio_segment.set_frame_rate(rate).set_channels(1).set_sample_width(2).raw_data
-        encoded_chunk = base64.b64encode(pcm_audio_resampled).decode()
-
-        event = {
-            "type": "conversation.item.create",
-            "item": {
-                "type": "message",
-                "role": "user",
-                "content": [{
-                    "type": "input_audio",
-                    "audio": encoded_chunk
-                }]
-            }
-        }
-
-        # Send the audio chunk asynchronously
-        await ws.send(json.dumps(event))
+        await ws.send(await encode_frame(encode_audio_item, audio_data, rate, channels, audio_format))
         logger.debug(f"Audio chunk of size {len(audio_data)} bytes sent successfully.")
 
     except Exception as e:
         logger.error(f"Error sending audio chunk: {e}", exc_info=True)
 
 
-# Function to send audio from a file as a conversation item
-async def send_audio_file(ws, file_path):
-    """Send audio from a file to the WebSocket."""
+# Function to stream audio from a file and ask for a response
+async def send_audio_file(ws, file_path, modalities, system_message, voice, audio_format=PCM16,
+                          max_speed=UPLOAD_SPEED):
+    """
+    Stream an audio file to the server as a user message and trigger the assistant response.
+    The file is decoded a chunk at a time and appended to the input audio buffer, which is committed at the end, so
+    memory use and frame size do not grow with the length of the file. Uploads run at most max_speed times faster
+    than real time (0 for no limit), and ws.send() waits while the socket's write buffer is full.
+    A ResilientConnection only keeps the last part of a long upload for its replay, so when the connection is
+    resumed during the upload the buffer is cleared and the file is sent again from the start.
+    Returns the number of PCM16 bytes sent, 0 when the upload failed.
+    """
     try:
-        # Read the file as bytes
-        with open(file_path, 'rb') as f:
-            audio_bytes = f.read()
+        turn_metrics.begin_turn()
+        started = time.perf_counter()
+        while True:
+            resumes = len(getattr(ws, "recoveries", ()))
+            sent = await stream_audio_file(ws, file_path, audio_format, max_speed, resumes)
+            # the whole file has to reach the connection before it can tell whether the upload survived
+            if hasattr(ws, "flush"):
+                await ws.flush()
+            if getattr(ws, "reconnecting", False):
+                await ws.wait_connected()
+            if len(getattr(ws, "recoveries", ())) == resumes:
+                break
+            logger.info(f"Connection resumed during the upload, sending {file_path} again from the start.")
+            await ws.send(json.dumps({"type": "input_audio_buffer.clear"}))
 
-        # Convert audio bytes into a WebSocket event
-        event = audio_to_item_create_event(audio_bytes)
+        if not sent:
+            logger.error(f"No audio found in {file_path}.")
+            return 0
 
-        if event:
-            # Send the event over WebSocket
-            await ws.send(event)
-            logger.debug(f"Sent audio file: {file_path}")
+        # turn the appended audio into a user message and ask for the response
+        await commit_input_audio(ws)
+        turn_metrics.mark(turn_metrics.AUDIO_SENT)
+        logger.debug(f"Sent {sent / (sample_rate_for(audio_format) * 2):.1f} s of audio from {file_path} "
+                     f"in {time.perf_counter() - started:.1f} s.")
+        await trigger_response(ws, modalities, system_message, voice, audio_format)
     except Exception as e:
         logger.error(f"Error while sending audio file: {e}", exc_info=True)
+        return 0
+    return sent
+
+async def stream_audio_file(ws, file_path, audio_format, max_speed, resumes):
+    """
+    Append the audio of a file to the input audio buffer, at most max_speed times faster than real time.
+    Stops early once the connection has been resumed more than resumes times. Returns the number of PCM16 bytes sent.
+    """
+    bytes_per_second = sample_rate_for(audio_format) * 2
+    started = time.perf_counter()
+    sent = 0
+    async for pcm_audio in read_audio_chunks(file_path, sample_rate_for(audio_format)):
+        # a resuming connection holds what is sent meanwhile, do not pile the rest of the file on top of it
+        if getattr(ws, "reconnecting", False):
+            await ws.wait_connected()
+        if ws.closed:
+            raise ConnectionError("Connection closed during the upload.")
+        if len(getattr(ws, "recoveries", ())) != resumes:
+            break
+
+        await send_input_audio_append(ws, pcm_audio, audio_format)
+        sent += len(pcm_audio)
+
+        # stay within max_speed times real time
+        if max_speed:
+            ahead = started + sent / bytes_per_second / max_speed - time.perf_counter()
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+    return sent
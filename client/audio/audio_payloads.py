@@ -0,0 +1,64 @@
+# audio_payloads.py
+import asyncio
+import base64
+import json
+from client.audio.audio_formats import PCM16, encode_audio, sample_rate_for
+from client.audio.resampler import downmix, resample
+
+# Audio payloads of at least this many PCM16 bytes (about 1.4 s at 24kHz) are encoded on a worker thread, smaller
+# ones cost less to encode than the thread hop
+OFFLOAD_THRESHOLD = 2 ** 16
+
+# base64 is encoded in slices of this many bytes, a multiple of 3 so the slices concatenate into valid base64; a
+# worker thread releases the GIL between slices, so the event loop is not held up for a whole payload at once
+ENCODE_SLICE = 3 * 2 ** 14
+
+# JSON envelopes around the base64 audio, split from json.dumps output so the frames read exactly as before.
+# base64 has no characters JSON escapes, so the audio is put in as is instead of being scanned by json.dumps.
+_AUDIO = "AUDIO"
+_APPEND_HEAD, _APPEND_TAIL = json.dumps({"type": "input_audio_buffer.append", "audio": _AUDIO}).split(f'"{_AUDIO}"')
+_ITEM_HEAD, _ITEM_TAIL = json.dumps({
+    "type": "conversation.item.create",
+    "item": {
+        "type": "message",
+        "role": "user",
+        "content": [{
+            "type": "input_audio",
+            "audio": _AUDIO
+        }]
+    }
+}).split(f'"{_AUDIO}"')
+
+def base64_text(data):
+    """base64 of data as str, encoded a slice at a time."""
+    if len(data) <= ENCODE_SLICE:
+        return base64.b64encode(data).decode("ascii")
+    view = memoryview(data)
+    return "".join(base64.b64encode(view[start:start + ENCODE_SLICE]).decode("ascii")
+                   for start in range(0, len(view), ENCODE_SLICE))
+
+def append_frame(audio):
+    """input_audio_buffer.append frame carrying base64 audio."""
+    return f'{_APPEND_HEAD}"{audio}"{_APPEND_TAIL}'
+
+def audio_item_frame(audio):
+    """conversation.item.create frame of a user message carrying base64 audio."""
+    return f'{_ITEM_HEAD}"{audio}"{_ITEM_TAIL}'
+
+def encode_append(pcm_audio, audio_format=PCM16):
+    """input_audio_buffer.append frame of PCM16 audio, encoded to audio_format."""
+    return append_frame(base64_text(encode_audio(pcm_audio, audio_format)))
+
+def encode_audio_item(audio_data, rate, channels, audio_format=PCM16):
+    """
+    conversation.item.create frame of PCM16 audio at rate with the given channels, mixed down to mono, resampled to
+    the rate of audio_format and encoded to it.
+    """
+    pcm_audio = resample(downmix(audio_data, channels), rate, sample_rate_for(audio_format))
+    return audio_item_frame(base64_text(encode_audio(pcm_audio, audio_format)))
+
+async def encode_frame(encoder, audio_data, *args):
+    """Run encoder(audio_data, *args), on a worker thread when audio_data is at least OFFLOAD_THRESHOLD bytes."""
+    if len(audio_data) < OFFLOAD_THRESHOLD:
+        return encoder(audio_data, *args)
+    return await asyncio.to_thread(encoder, audio_data, *args)
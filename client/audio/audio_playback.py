@@ -1,9 +1,12 @@
 # audio_playback.py
 import threading
 import queue
-import time
-import pyaudio
 import logging
+import time
+from client.audio.jitter_buffer import JitterBuffer
+from client.audio.playback_engine import PlaybackEngine, output_rate_for
+from client.audio.resampler import Resampler
+from client.turn_metrics import FIRST_AUDIO_PLAYED, PLAYBACK_DRAINED, get_recorder
 
 # Initialize logging
 logger = logging.getLogger(__name__)
@@ -11,6 +14,9 @@ logger = logging.getLogger(__name__)
 # Define a unique sentinel object for the FLUSH command
 FLUSH_COMMAND = object()
 
+# Sentinel marking the end of a response's audio without waiting for it to be played
+END_OF_STREAM_COMMAND = object()
+
 # Audio queue for thread-safe communication
 audio_queue = queue.Queue()
 
@@ -20,143 +26,150 @@ stop_event = threading.Event()
 # Event to signal that playback of the current response is complete
 playback_complete_event = threading.Event()
 
-# Buffering configuration
-BUFFER_THRESHOLD = 5000 
-MAX_WAIT_TIME = 0.5
+# Event set once the playback thread has opened the output device, or failed to
+playback_ready_event = threading.Event()
+
+# Engine of the running playback thread, for fill level and underrun statistics
+playback_engine = None
 
-# PyAudio parameters
+# Output parameters
 SAMPLE_RATE = 24000
 CHANNELS = 1
-FORMAT = pyaudio.paInt16
 
-def audio_playback():
+def audio_playback(stream_factory=None, sample_rate=SAMPLE_RATE, jitter_buffer=None, recorder=None):
     """
     Dedicated thread function for audio playback.
+    Chunks from the audio queue are handed to a callback-driven PlaybackEngine, which the device pulls from at its
+    own pace; the thread blocks on the queue instead of polling it, and FLUSH_COMMAND waits until the audio is heard.
+    An optional stream_factory opens a stand-in output stream (e.g. for benchmarks without a device), it is called
+    with the samplerate, channels, blocksize and callback keyword arguments of sounddevice.RawOutputStream.
+    sample_rate is the rate of the decoded PCM16 audio (8kHz when the session uses G.711). When the output device
+    cannot play it, the device is opened at its own rate and the audio is resampled to it.
+    jitter_buffer sizes the playout depth from the measured delta arrival jitter; a default one is used if omitted.
+    The arrival of each chunk is the time it was enqueued, so the wait in the queue does not count as jitter.
+    recorder is the TurnRecorder that gets the first-audio-played and playback-drained marks of each turn.
     """
+    global playback_engine
+
     # Initialize
     logger.debug("Playback thread started.")
-    buffer = bytearray()
-    last_play_time = time.time()
-    stream = None  
+    device_rate = sample_rate if stream_factory is not None else output_rate_for(sample_rate, CHANNELS)
+    resampler = Resampler(sample_rate, device_rate, CHANNELS)
+    if not resampler.passthrough:
+        logger.info(f"Playing at {device_rate} Hz, resampling from {sample_rate} Hz.")
+    stream_item = None  # item the resampler is carrying state for
+    stream_arrival = None  # arrival time of the last chunk, which the resampler's tail belongs to
+    engine = PlaybackEngine(device_rate, CHANNELS, stream_factory=stream_factory,
+                            jitter_buffer=jitter_buffer if jitter_buffer is not None else JitterBuffer())
+    if recorder is not None:
+        engine.on_playback_start = lambda: recorder.mark(FIRST_AUDIO_PLAYED, open_turn=False)
 
     try:
-        # initialize pyaudio
-        p = pyaudio.PyAudio()
-        logger.debug("PyAudio initialized.")
-
-        # open the stream
-        stream = p.open(format=FORMAT, channels=CHANNELS, rate=SAMPLE_RATE, output=True)
-        logger.debug("PyAudio stream opened.")
+        # open the stream, the device starts pulling audio straight away
+        engine.start()
+        playback_engine = engine
+        playback_ready_event.set()
     except Exception as e:
         # failed to open the stream
-        logger.error(f"Failed to initialize PyAudio: {e}", exc_info=True)
-        
-        # playback complete
+        logger.error(f"Failed to open the output stream: {e}", exc_info=True)
+
+        # playback complete
+        playback_ready_event.set()
         playback_complete_event.set()
         return
 
     try:
         # loop while we don't have a stop event
         while not stop_event.is_set():
-            try:
-                # Wait for an audio chunk with a timeout
-                audio_chunk = audio_queue.get(timeout=0.1)
-                logger.debug("Got an item from the queue.")
-            except queue.Empty:
-                # check if we have anything in the buffer
-                if buffer:
-                    # play whatever is in the buffer
-                    logger.debug(f"Playing remaining {len(buffer)} bytes of audio (queue empty).")
-                    stream.write(bytes(buffer))
-
-                    # clear the buffer
-                    buffer.clear()
-                    last_play_time = time.time()
-                continue
-
-            # check if we have a chunk
-            if audio_chunk is None:
-                # shutdown
-                logger.debug("Received shutdown signal.")
-
-                # Mark the queue task as done
-                audio_queue.task_done()
-                break
-
-            # check we if we have the flush command
-            if audio_chunk is FLUSH_COMMAND:
-                # check if anything in the buffer
-                if buffer:
-                    # flush the buffer, and play remaining audio
-                    logger.debug(f"Flushing buffer on FLUSH_COMMAND with {len(buffer)} bytes.")
-                    stream.write(bytes(buffer))
-                    buffer.clear()
-                    last_play_time = time.time()
-
-                # playback complete
-                logger.debug("Buffer is empty upon receiving FLUSH_COMMAND.")
-                playback_complete_event.set()
+            # Wait for an audio chunk, stop_playback_thread sends None to wake us up
+            audio_chunk = audio_queue.get()
 
+            try:
+                # check if we have a chunk
+                if audio_chunk is None:
+                    # shutdown
+                    logger.debug("Received shutdown signal.")
+                    break
+
+                # check we if we have the flush command
+                if audio_chunk is FLUSH_COMMAND:
+                    # wait until everything written so far has been played
+                    logger.debug(f"Draining {engine.fill_level:.2f} s of audio on FLUSH_COMMAND.")
+                    if engine.drain() and recorder is not None:
+                        recorder.mark(PLAYBACK_DRAINED, open_turn=False)
+
+                    # playback complete
+                    stats = engine.stats()
+                    logger.debug(f"Playback drained, {stats['underruns']} underruns so far, "
+                                 f"target depth {stats['start_level_seconds'] * 1000:.0f} ms.")
+                    playback_complete_event.set()
+                    continue
+
+                # check if the response's audio is complete, play out the tail without waiting for it
+                if audio_chunk is END_OF_STREAM_COMMAND:
+                    tail = resampler.flush()
+                    if tail:
+                        engine.write(tail, stream_item, arrived_at=stream_arrival)
+                    engine.end_stream()
+                    continue
+
+                # Resample to the device rate, a new item does not continue the previous one's filter state
+                audio_chunk, item_id, stream_arrival = audio_chunk
+                if not resampler.passthrough:
+                    if item_id != stream_item:
+                        resampler.reset()
+                        stream_item = item_id
+                    audio_chunk = resampler.process(audio_chunk)
+
+                # Hand the chunk to the engine, this only blocks while its buffer is full
+                engine.write(audio_chunk, item_id, arrived_at=stream_arrival)
+                logger.debug(f"Buffered audio chunk, {engine.fill_level:.2f} s queued on the device.")
+            finally:
                 # Mark the queue task as done
                 audio_queue.task_done()
-                continue
-
-            # Process and play the audio chunk
-            buffer.extend(audio_chunk)
-            current_time = time.time()
-
-            # check if we have an audio to kick off playback
-            if len(buffer) >= BUFFER_THRESHOLD or (current_time - last_play_time) >= MAX_WAIT_TIME:
-                logger.debug(f"Playing {len(buffer)} bytes of audio.")
-                stream.write(bytes(buffer))
-                buffer.clear()
-                last_play_time = current_time
-
-            # processed
-            logger.debug(f"Processed audio chunk, {audio_queue.unfinished_tasks - 1} remaining chunks.")
-
-            # Mark the queue task as done
-            audio_queue.task_done()
 
         # Play any remaining audio when exiting
-        if buffer:
-            logger.debug(f"Playing remaining {len(buffer)} bytes of audio before exiting.")
-            stream.write(bytes(buffer))
+        engine.drain()
 
     except Exception as e:
-        # log the error
+        # log the error
         logger.error(f"Exception in playback thread: {e}", exc_info=True)
     finally:
-        if stream is not None:
-            try:
-                # check if the stream is stopped
-                if not stream.is_stopped():
-                    # stop the stream
-                    stream.stop_stream()
-
-                # close the stream
-                stream.close()
-            except Exception as e:
-                # log the error
-                logger.warning(f"Error closing stream: {e}")
-            p.terminate()
-        else:
-            # debug
-            logger.debug("Stream was not initialized.")
+        stats = engine.stats()
+        if stats["underruns"]:
+            logger.info(f"Playback had {stats['underruns']} underruns.")
+        if "jitter" in stats:
+            jitter = stats["jitter"]
+            logger.debug(f"Jitter buffer: target {jitter['target_depth'] * 1000:.0f} ms, "
+                         f"p95 jitter {jitter['jitter_p95'] * 1000:.0f} ms, "
+                         f"{jitter['concealed_seconds'] * 1000:.0f} ms concealed.")
+        engine.close()
+        playback_engine = None
         logger.debug("Playback thread terminated.")
         playback_complete_event.set()
 
-def start_playback_thread():
+def start_playback_thread(stream_factory=None, sample_rate=SAMPLE_RATE, jitter_buffer=None, recorder=None):
     """
     Starts the dedicated playback thread.
+    Threads do not inherit context variables, so the turn recorder of the caller is handed to the thread.
     """
     # Clear any previous playback completion event
     playback_complete_event.clear()
+    playback_ready_event.clear()
     stop_event.clear()
-    playback_thread = threading.Thread(target=audio_playback, daemon=True)
+    recorder = recorder or get_recorder()
+    playback_thread = threading.Thread(target=audio_playback, args=(stream_factory, sample_rate, jitter_buffer, recorder),
+                                       daemon=True)
     playback_thread.start()
     return playback_thread
 
+def wait_for_playback_ready(timeout=None):
+    """
+    Waits until the playback thread has opened the output device.
+    Returns True if playback is running, False if the device failed to open or did not open in time.
+    """
+    return playback_ready_event.wait(timeout) and playback_engine is not None
+
 def stop_playback_thread(playback_thread):
     """
     Signals the playback thread to stop and waits for it to finish.
@@ -166,25 +179,62 @@ def stop_playback_thread(playback_thread):
     playback_thread.join()
     logger.debug("Playback thread successfully stopped.")
 
-def enqueue_audio_chunk(audio_chunk):
+def enqueue_audio_chunk(audio_chunk, item_id=None, arrived_at=None):
     """
     Enqueues an audio chunk for playback.
+    Chunks are bytes-like PCM16 audio, copied once into the playback engine's ring buffer.
+    item_id names the conversation item the audio belongs to, so a barge-in can truncate it at the audio played.
+    arrived_at is the time.monotonic() the chunk was received, which the jitter buffer measures; now by default.
     """
-    audio_queue.put(audio_chunk)
-    if audio_chunk is FLUSH_COMMAND:
-        logger.debug("Enqueued FLUSH_COMMAND")
+    if audio_chunk is FLUSH_COMMAND or audio_chunk is END_OF_STREAM_COMMAND:
+        audio_queue.put(audio_chunk)
+        logger.debug("Enqueued FLUSH_COMMAND" if audio_chunk is FLUSH_COMMAND else "Enqueued END_OF_STREAM_COMMAND")
     elif audio_chunk is None:
+        audio_queue.put(audio_chunk)
         logger.debug("Enqueued shutdown signal")
     else:
+        audio_queue.put((audio_chunk, item_id, time.monotonic() if arrived_at is None else arrived_at))
         logger.debug(f"Enqueued audio chunk, {audio_queue.unfinished_tasks} pending chunks.")
 
+def interrupt_playback():
+    """
+    Cuts playback for a barge-in: drops the queued and buffered audio and returns (item_id, audio_end_ms) of the
+    item that was playing, or (None, 0) when nothing was.
+    """
+    engine = playback_engine
+    if engine is None:
+        return None, 0
+
+    # drop the audio still queued for the playback thread, keeping the control commands
+    commands = []
+    while True:
+        try:
+            queued = audio_queue.get_nowait()
+        except queue.Empty:
+            break
+        if not isinstance(queued, tuple):
+            commands.append(queued)
+        audio_queue.task_done()
+    for command in commands:
+        audio_queue.put(command)
+
+    return engine.interrupt()
+
+def is_playback_active():
+    """
+    Returns True while assistant audio is playing or waiting to be played.
+    """
+    engine = playback_engine
+    return audio_queue.unfinished_tasks > 0 or (engine is not None and engine.is_playing)
+
 def wait_for_playback_finish():
     """
     Waits for all audio chunks to be played back.
     """
     logger.debug("Waiting for playback to finish.")
 
-    # Wait until all items in the queue have been processed
+    # Ask the playback thread to drain the engine, then wait until it has processed everything
+    enqueue_audio_chunk(FLUSH_COMMAND)
     audio_queue.join()
 
     # Wait for the playback completion event
@@ -193,3 +243,10 @@ def wait_for_playback_finish():
 
     # Clear the event for the next use
     playback_complete_event.clear()
+
+def get_playback_stats():
+    """
+    Returns the fill level and underrun statistics of the running playback engine, or None if it is not running.
+    """
+    engine = playback_engine
+    return engine.stats() if engine is not None else None
@@ -1,46 +1,37 @@
-import base64
 import io
-import json
 import logging
 import numpy as np
 from pydub import AudioSegment
+from client.audio.audio_formats import PCM16, encode_audio, sample_rate_for
+from client.audio.audio_payloads import audio_item_frame, base64_text
+from client.audio.resampler import resample
 
 # Initialize logging
 logger = logging.getLogger(__name__)
 
 # Function to convert audio bytes to conversation.item.create event format
-def audio_to_item_create_event(audio_bytes: bytes) -> str:
+def audio_to_item_create_event(audio_bytes: bytes, audio_format: str = PCM16) -> str:
     """
     Convert audio bytes to conversation.item.create event format.
-    This converts raw audio bytes to base64 encoded PCM16 data at 24kHz, mono.
+    This converts raw audio bytes to base64 encoded mono audio in audio_format (PCM16 at 24kHz by default).
     """
     try:
-        # Load the audio from the byte stream and resample it to 24kHz mono PCM16
-        audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
-        pcm_audio = audio.set_frame_rate(24000).set_channels(1).set_sample_width(2).raw_data
-        pcm_base64 = base64.b64encode(pcm_audio).decode()
+        # Load the audio from the byte stream as mono PCM16 and resample it to the format's rate
+        audio = AudioSegment.from_file(io.BytesIO(audio_bytes)).set_channels(1).set_sample_width(2)
+        pcm_audio = resample(audio.raw_data, audio.frame_rate, sample_rate_for(audio_format))
 
-        # Construct the WebSocket event
-        event = {
-            "type": "conversation.item.create",
-            "item": {
-                "type": "message",
-                "role": "user",
-                "content": [{
-                    "type": "input_audio",
-                    "audio": pcm_base64,
-                }]
-            }
-        }
-
-        return json.dumps(event)
+        # the envelope is built around the base64 audio, json.dumps does not scan it
+        return audio_item_frame(base64_text(encode_audio(pcm_audio, audio_format)))
     except Exception as e:
         logger.error(f"Error creating audio event: {e}")
         return None
 
 # Function to check if an audio chunk is mostly silent based on its RMS
 def is_silent(pcm_audio, threshold=100):
-    """Check if the audio data is mostly silence based on RMS."""
+    """
+    Check if the audio data is mostly silence based on RMS.
+    This is a stateless check, use client.audio.vad.StreamingVAD to follow speech across chunks.
+    """
     try:
         # Get audio data from buffer
         audio_data = np.frombuffer(pcm_audio, dtype=np.int16)
@@ -49,13 +40,9 @@ def is_silent(pcm_audio, threshold=100):
         if len(audio_data) == 0:
             return True
 
-        # Check for invalid values or out-of-range audio samples
-        if np.all(audio_data == 0) or np.any(np.isnan(audio_data)) or np.max(np.abs(audio_data)) > 32767:
-            return True
-
-        # Calculate RMS (Root Mean Square)
-        with np.errstate(invalid='ignore'):
-            rms = np.sqrt(np.mean(np.square(audio_data)))
+        # Calculate RMS (Root Mean Square) in one pass, widened so squaring cannot overflow
+        wide = audio_data.astype(np.float64)
+        rms = np.sqrt(np.dot(wide, wide) / len(wide))
 
         return rms < threshold  # Return True if RMS is below threshold (indicating silence)
     except (ValueError, OverflowError) as e:
@@ -0,0 +1,85 @@
+# audio_sinks.py
+import logging
+from collections import OrderedDict
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Items whose forwarded duration is remembered
+TRACKED_ITEMS = 32
+
+class AudioSink:
+    """
+    Destination of one session's decoded assistant audio.
+    The base sink discards the audio; subclasses play it or forward it.
+    """
+    def write(self, pcm_audio, item_id=None):
+        """Take a chunk of PCM16 audio belonging to item_id."""
+
+    def end_stream(self):
+        """The current response has no more audio."""
+
+    def interrupt(self):
+        """Drop pending audio for a barge-in and return (item_id, audio_end_ms) of the item cut, or (None, 0)."""
+        return None, 0
+
+    def is_playing(self):
+        """True while audio is being played or waiting to be."""
+        return False
+
+    def close(self):
+        """Release the sink's resources."""
+
+class CallbackSink(AudioSink):
+    """
+    Hands every chunk to on_audio(pcm_audio, item_id) on the event loop, e.g. to forward it to a telephony media stream.
+    The audio is considered played once forwarded, which is what interrupt() reports.
+    """
+    def __init__(self, on_audio, sample_rate=24000, sample_width=2):
+        self.on_audio = on_audio
+        self.bytes_per_second = sample_rate * sample_width
+        self._forwarded = OrderedDict()  # item_id -> bytes forwarded
+        self._current = None
+
+    def write(self, pcm_audio, item_id=None):
+        if item_id is not None:
+            self._current = item_id
+            self._forwarded[item_id] = self._forwarded.get(item_id, 0) + len(pcm_audio)
+            while len(self._forwarded) > TRACKED_ITEMS:
+                self._forwarded.popitem(last=False)
+        self.on_audio(pcm_audio, item_id)
+
+    def interrupt(self):
+        item_id = self._current
+        if item_id is None:
+            return None, 0
+        return item_id, self._forwarded.get(item_id, 0) * 1000 // self.bytes_per_second
+
+class EngineSink(AudioSink):
+    """
+    Plays through a PlaybackEngine owned by the session, written to directly from the event loop.
+    The engine's ring buffer holds many seconds of audio; if it is ever full the overflow is dropped rather than
+    blocking the loop that every other session shares.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.dropped = 0  # bytes dropped because the ring buffer was full
+
+    def write(self, pcm_audio, item_id=None):
+        written = self.engine.write(pcm_audio, item_id, timeout=0)
+        if written is not None and written < len(pcm_audio):
+            if not self.dropped:
+                logger.warning("Playback buffer full, dropping audio.")
+            self.dropped += len(pcm_audio) - written
+
+    def end_stream(self):
+        self.engine.end_stream()
+
+    def interrupt(self):
+        return self.engine.interrupt()
+
+    def is_playing(self):
+        return self.engine.is_playing
+
+    def close(self):
+        self.engine.close()
@@ -0,0 +1,84 @@
+# capture_buffer.py
+import logging
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Default maximum utterance length in seconds
+MAX_UTTERANCE_DURATION = 60.0
+
+class AudioCaptureBuffer:
+    """
+    Fixed-capacity ring buffer for captured PCM audio.
+    Storage is preallocated, so appending a chunk is a single copy instead of re-copying the whole utterance,
+    and view() hands out the buffered audio without copying it.
+    Once the utterance exceeds the maximum duration the oldest audio is overwritten.
+    """
+    def __init__(self, max_duration=MAX_UTTERANCE_DURATION, rate=24000, sample_width=2, channels=1):
+        self.frame_size = sample_width * channels
+        self.capacity = int(max_duration * rate) * self.frame_size
+        self._buffer = bytearray(self.capacity)
+        self._spare = None  # second storage the wrapped audio is copied into by view(), allocated on first use
+        self._start = 0
+        self._size = 0
+        self.dropped = 0  # bytes overwritten because the utterance exceeded the maximum duration
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def append(self, data):
+        """Copy a chunk of audio into the buffer, overwriting the oldest audio when full."""
+        chunk = memoryview(data).cast("B")
+        length = len(chunk)
+        capacity = self.capacity
+
+        # a chunk larger than the buffer only keeps its tail
+        if length >= capacity:
+            self.dropped += self._size + length - capacity
+            self._buffer[:] = chunk[length - capacity:]
+            self._start = 0
+            self._size = capacity
+            return
+
+        # make room by dropping the oldest audio
+        overflow = self._size + length - capacity
+        if overflow > 0:
+            if not self.dropped:
+                logger.warning(f"Utterance exceeded {capacity // self.frame_size} frames, dropping the oldest audio.")
+            self._start = (self._start + overflow) % capacity
+            self._size -= overflow
+            self.dropped += overflow
+
+        # copy in, wrapping around the end of the storage if needed
+        end = (self._start + self._size) % capacity
+        first = min(length, capacity - end)
+        self._buffer[end:end + first] = chunk[:first]
+        if first < length:
+            self._buffer[:length - first] = chunk[first:]
+        self._size += length
+
+    def view(self):
+        """
+        Return a zero-copy memoryview of the buffered audio, oldest first.
+        The view is only valid until the next append or clear.
+        """
+        if self._start + self._size > self.capacity:
+            # the audio wraps around: copy both parts into the spare storage, oldest first, and swap the two
+            if self._spare is None:
+                self._spare = bytearray(self.capacity)
+            source, spare = memoryview(self._buffer), memoryview(self._spare)
+            first = self.capacity - self._start
+            spare[:first] = source[self._start:]
+            spare[first:self._size] = source[:self._size - first]
+            self._buffer, self._spare = self._spare, self._buffer
+            self._start = 0
+        return memoryview(self._buffer)[self._start:self._start + self._size]
+
+    def clear(self):
+        """Discard the buffered audio, keeping the storage for the next utterance."""
+        self._start = 0
+        self._size = 0
+        self.dropped = 0
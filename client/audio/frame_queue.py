@@ -0,0 +1,96 @@
+# frame_queue.py
+import asyncio
+import logging
+import time
+from collections import deque
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+class FrameQueue:
+    """
+    Single-producer, single-consumer queue carrying audio frames from a PortAudio callback thread to the event loop.
+
+    The producer never blocks and never allocates a Future: it appends to a deque (atomic under the GIL) and only
+    wakes the loop when the consumer is parked waiting. The consumer drains every queued frame in one batch, so a
+    busy loop catches up in a single wakeup instead of running one coroutine per block.
+    The queue is bounded; when the loop falls further behind than maxsize frames the oldest frames are dropped.
+    """
+    def __init__(self, loop, maxsize=64):
+        self._loop = loop
+        self._frames = deque()
+        self._event = asyncio.Event()
+        self._waiting = False
+        self._closed = False
+        self.maxsize = maxsize
+
+        # statistics
+        self.dropped = 0        # frames discarded because the queue was full
+        self.delivered = 0      # frames handed to the consumer
+        self.batches = 0        # consumer wakeups that returned frames
+        self.max_delay = 0.0    # worst callback-to-loop delay in seconds
+        self.total_delay = 0.0  # sum of callback-to-loop delays, for the mean
+
+    def put(self, frame):
+        """Queue a frame; called from the producer thread."""
+        if len(self._frames) >= self.maxsize:
+            try:
+                self._frames.popleft()
+                self.dropped += 1
+            except IndexError:
+                # the consumer drained it in the meantime
+                pass
+        self._frames.append((time.monotonic(), frame))
+
+        # wake the loop only if the consumer is parked
+        if self._waiting:
+            self._waiting = False
+            self._loop.call_soon_threadsafe(self._event.set)
+
+    def close(self):
+        """Signal the consumer that no more frames will arrive; safe to call from any thread."""
+        self._closed = True
+        self._loop.call_soon_threadsafe(self._event.set)
+
+    async def get_batch(self):
+        """Wait for frames and return every queued frame, oldest first. Returns [] once closed and drained."""
+        while not self._frames:
+            if self._closed:
+                return []
+
+            # publish that we are waiting, then re-check so a frame queued meanwhile is not missed
+            self._event.clear()
+            self._waiting = True
+            if self._frames or self._closed:
+                self._waiting = False
+                continue
+            await self._event.wait()
+
+        # drain everything queued so far
+        now = time.monotonic()
+        batch = []
+        while True:
+            try:
+                queued_at, frame = self._frames.popleft()
+            except IndexError:
+                break
+            delay = now - queued_at
+            self.total_delay += delay
+            if delay > self.max_delay:
+                self.max_delay = delay
+            batch.append(frame)
+
+        self.delivered += len(batch)
+        self.batches += 1
+        return batch
+
+    def stats(self):
+        """Return the queue statistics."""
+        return {
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "frames_per_batch": self.delivered / self.batches if self.batches else 0.0,
+            "max_delay": self.max_delay,
+            "mean_delay": self.total_delay / self.delivered if self.delivered else 0.0,
+        }
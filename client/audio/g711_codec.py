@@ -0,0 +1,65 @@
+# g711_codec.py
+import numpy as np
+
+# G.711 constants (ITU-T G.711, as in the reference Sun implementation)
+_ULAW_BIAS = 0x84
+_ULAW_CLIP = 8159
+_ULAW_SEGMENT_ENDS = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+_ALAW_SEGMENT_ENDS = np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF])
+
+def _build_ulaw_decode_table():
+    """PCM16 value of each of the 256 u-law codes."""
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    magnitude = (((codes & 0x0F) << 3) + _ULAW_BIAS) << ((codes & 0x70) >> 4)
+    return np.where(codes & 0x80, _ULAW_BIAS - magnitude, magnitude - _ULAW_BIAS).astype(np.int16)
+
+def _build_alaw_decode_table():
+    """PCM16 value of each of the 256 A-law codes."""
+    codes = np.arange(256, dtype=np.int32) ^ 0x55
+    segment = (codes & 0x70) >> 4
+    magnitude = (codes & 0x0F) << 4
+    magnitude = np.where(segment == 0, magnitude + 8, (magnitude + 0x108) << np.maximum(segment - 1, 0))
+    return np.where(codes & 0x80, magnitude, -magnitude).astype(np.int16)
+
+def _build_ulaw_encode_table():
+    """u-law code of every PCM16 value, indexed by the value reinterpreted as uint16."""
+    pcm = np.arange(65536, dtype=np.int32).astype(np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(pcm), _ULAW_CLIP) + (_ULAW_BIAS >> 2)
+    segment = np.searchsorted(_ULAW_SEGMENT_ENDS, magnitude)
+    codes = (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F)
+    return (np.where(segment >= 8, 0x7F, codes) ^ mask).astype(np.uint8)
+
+def _build_alaw_encode_table():
+    """A-law code of every PCM16 value, indexed by the value reinterpreted as uint16."""
+    pcm = np.arange(65536, dtype=np.int32).astype(np.uint16).view(np.int16).astype(np.int32) >> 3
+    mask = np.where(pcm >= 0, 0xD5, 0x55)
+    magnitude = np.where(pcm >= 0, pcm, -pcm - 1)
+    segment = np.searchsorted(_ALAW_SEGMENT_ENDS, magnitude)
+    shift = np.where(segment < 2, 1, segment)
+    codes = (segment << 4) | ((magnitude >> shift) & 0x0F)
+    return (np.where(segment >= 8, 0x7F, codes) ^ mask).astype(np.uint8)
+
+# Lookup tables, built once at import
+ULAW_DECODE_TABLE = _build_ulaw_decode_table()
+ALAW_DECODE_TABLE = _build_alaw_decode_table()
+ULAW_ENCODE_TABLE = _build_ulaw_encode_table()
+ALAW_ENCODE_TABLE = _build_alaw_encode_table()
+
+def ulaw_decode(data):
+    """Decode u-law bytes to a PCM16 array with a single table lookup."""
+    return ULAW_DECODE_TABLE.take(np.frombuffer(data, dtype=np.uint8))
+
+def alaw_decode(data):
+    """Decode A-law bytes to a PCM16 array with a single table lookup."""
+    return ALAW_DECODE_TABLE.take(np.frombuffer(data, dtype=np.uint8))
+
+def ulaw_encode(pcm_audio):
+    """Encode PCM16 bytes (or an int16 array) to u-law bytes with a single table lookup."""
+    samples = np.frombuffer(pcm_audio, dtype=np.uint16) if not isinstance(pcm_audio, np.ndarray) else pcm_audio.view(np.uint16)
+    return ULAW_ENCODE_TABLE.take(samples).tobytes()
+
+def alaw_encode(pcm_audio):
+    """Encode PCM16 bytes (or an int16 array) to A-law bytes with a single table lookup."""
+    samples = np.frombuffer(pcm_audio, dtype=np.uint16) if not isinstance(pcm_audio, np.ndarray) else pcm_audio.view(np.uint16)
+    return ALAW_ENCODE_TABLE.take(samples).tobytes()
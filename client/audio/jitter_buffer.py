@@ -0,0 +1,150 @@
+# jitter_buffer.py
+import bisect
+import logging
+import time
+from collections import deque
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# How gaps are filled when the buffer runs dry
+CONCEAL_SILENCE = "silence"  # cut straight to silence
+CONCEAL_FADE = "fade"        # fade the last samples out before the gap and back in after it, so gaps do not click
+
+# Defaults
+UNDERRUN_PROBABILITY = 0.01  # target share of deltas that arrive too late to be played on time
+MIN_DEPTH = 0.02             # seconds
+MAX_DEPTH = 0.5              # seconds
+INITIAL_DEPTH = 0.1          # seconds, used until enough arrivals have been measured
+MIN_SAMPLES = 20             # arrivals measured before the learned depth replaces the initial one
+WINDOW = 500                 # arrivals the depth is learned from, across responses
+
+class JitterBuffer:
+    """
+    Adaptive playout depth for the assistant audio stream.
+
+    Every delta carries a known duration of audio, so the stream has its own clock: delta i should arrive at the
+    audio position it starts at. Its lateness is how far its arrival trails that position, measured against the
+    earliest delta of the response. Playing out with a depth D, a delta is played on time iff its lateness is at
+    most D, so the target depth is the (1 - underrun_probability) quantile of the recent lateness, clamped to
+    [min_depth, max_depth]. A small probability buys fewer glitches with more startup latency, and vice versa.
+    The playback engine starts and rebuffers at target_depth and conceals gaps according to concealment.
+    Arrivals are timed when the delta is received, not when the playback thread writes it: time spent in the
+    playback queue is not network jitter. clock must be the one those arrival times are taken with.
+    The window is kept sorted, so each arrival costs a bisection rather than a sort. The current stream's lateness is
+    kept apart, as measured from its start: when its earliest delta drops, all of it moves by the same amount, which
+    keeps it in order, and it is measured against the new earliest from then on. A finished stream's lateness joins
+    the rest, against the earliest delta of the whole stream.
+    """
+    def __init__(self, underrun_probability=UNDERRUN_PROBABILITY, min_depth=MIN_DEPTH, max_depth=MAX_DEPTH,
+                 initial_depth=INITIAL_DEPTH, window=WINDOW, concealment=CONCEAL_FADE, clock=time.monotonic):
+        self.underrun_probability = underrun_probability
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.initial_depth = initial_depth
+        self.concealment = concealment
+        self.clock = clock
+        self.window = window
+        self._lateness = deque()    # [stream, lateness] per arrival, oldest first; stream is None once it ended
+        self._past = []             # sorted lateness of the ended streams in the window, against their earliest
+        self._current = []          # sorted lateness of the current stream in the window, from its start
+        self._target = min(max(initial_depth, min_depth), max_depth)
+
+        # clock of the current stream
+        self._stream_start = None   # arrival time of the first delta
+        self._position = 0.0        # seconds of audio received so far
+        self._earliest = 0.0        # smallest lateness seen in this stream
+
+        # statistics
+        self.arrivals = 0
+        self.streams = 0
+        self.underruns = 0
+        self.concealed = 0.0  # seconds of audio replaced by silence or concealment
+
+    @property
+    def target_depth(self):
+        """Seconds of audio to buffer before starting or resuming playback."""
+        return self._target
+
+    def on_arrival(self, duration, now=None):
+        """Record the arrival of a delta carrying duration seconds of audio."""
+        now = self.clock() if now is None else now
+        self.arrivals += 1
+        if self._stream_start is None:
+            self._stream_start = now
+            self._position = 0.0
+            self._earliest = 0.0
+            self.streams += 1
+
+        # lateness relative to the stream clock, measured against the earliest delta when read
+        lateness = (now - self._stream_start) - self._position
+        if lateness < self._earliest:
+            self._earliest = lateness
+        self._lateness.append([self.streams, lateness])
+        bisect.insort(self._current, lateness)
+        if len(self._lateness) > self.window:
+            stream, oldest = self._lateness.popleft()
+            values = self._current if stream is not None else self._past
+            del values[bisect.bisect_left(values, oldest)]
+        self._position += duration
+
+        if len(self._lateness) >= MIN_SAMPLES:
+            self._target = min(max(self.quantile(1.0 - self.underrun_probability), self.min_depth), self.max_depth)
+
+    def end_stream(self):
+        """Mark the end of a response, the next delta starts a new stream clock."""
+        self._stream_start = None
+        # the stream's lateness joins the ended streams, against its earliest delta
+        for entry in reversed(self._lateness):
+            if entry[0] is None:
+                break
+            entry[0] = None
+            entry[1] -= self._earliest
+            bisect.insort(self._past, entry[1])
+        self._current = []
+
+    def on_underrun(self):
+        """Record that the buffer ran dry in the middle of a stream."""
+        self.underruns += 1
+
+    def on_concealed(self, gap):
+        """Record gap seconds of silence or concealment played while the buffer was dry."""
+        self.concealed += gap
+
+    def quantile(self, q):
+        """Return the q quantile of the recent lateness in seconds."""
+        if not self._lateness:
+            return 0.0
+        return self._kth(min(len(self._lateness) - 1, int(q * len(self._lateness))))
+
+    def _kth(self, k):
+        """The k-th smallest lateness, from 0, across the ended streams and the current one."""
+        past, current, earliest = self._past, self._current, self._earliest
+        # the k + 1 smallest are the taken smallest ended ones and the k + 1 - taken smallest current ones
+        low, high = max(0, k + 1 - len(current)), min(k + 1, len(past))
+        while low < high:
+            taken = (low + high) // 2
+            if past[taken] < current[k - taken] - earliest:
+                low = taken + 1
+            else:
+                high = taken
+        candidates = []
+        if low:
+            candidates.append(past[low - 1])
+        if low <= k:
+            candidates.append(current[k - low] - earliest)
+        return max(candidates)
+
+    def stats(self):
+        """Return the jitter buffer statistics."""
+        return {
+            "target_depth": self._target,
+            "jitter_p50": self.quantile(0.5),
+            "jitter_p95": self.quantile(0.95),
+            "jitter_p99": self.quantile(0.99),
+            "arrivals": self.arrivals,
+            "streams": self.streams,
+            "underruns": self.underruns,
+            "underrun_rate": self.underruns / self.arrivals if self.arrivals else 0.0,
+            "concealed_seconds": self.concealed,
+        }
@@ -0,0 +1,327 @@
+# playback_engine.py
+import logging
+import threading
+import time
+from collections import deque, OrderedDict
+import numpy as np
+from client.audio.jitter_buffer import CONCEAL_FADE
+from client.audio.ring_buffer import AudioRingBuffer
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Default engine parameters
+BLOCK_DURATION = 0.02     # audio pulled by each device callback, in seconds
+START_DURATION = 0.06     # audio buffered before playback starts or resumes after an underrun, in seconds
+BUFFER_DURATION = 10.0    # ring buffer capacity, in seconds
+FADE_DURATION = 0.005     # fade applied around a gap when concealing it, in seconds
+TRACKED_ITEMS = 32        # items whose played duration is remembered
+
+def default_stream_factory(**kwargs):
+    """Open a PCM16 callback-mode output stream on the default device."""
+    # imported here, so engines with their own stream factory do not need PortAudio
+    import sounddevice as sd
+    return sd.RawOutputStream(dtype="int16", **kwargs)
+
+def output_rate_for(sample_rate, channels=1):
+    """
+    Return sample_rate if the default output device plays it, otherwise the device's default rate, which the audio
+    is then resampled to. Devices that only play 44.1 or 48kHz would otherwise fail to open, e.g. for 8kHz G.711.
+    """
+    try:
+        import sounddevice as sd
+        try:
+            sd.check_output_settings(samplerate=sample_rate, channels=channels, dtype="int16")
+            return sample_rate
+        except Exception:
+            return int(sd.query_devices(kind="output")["default_samplerate"])
+    except Exception:
+        # no usable device information, opening the stream reports the problem
+        return sample_rate
+
+class PlaybackEngine:
+    """
+    Callback-driven audio output.
+
+    The device pulls audio from a ring buffer in its callback, so playback is clocked by the device rather than by a
+    polling thread, and audio starts as soon as START_DURATION is buffered. When the buffer runs dry before the end of
+    the stream is marked the callback plays silence, counts an underrun and rebuffers.
+    With a JitterBuffer the start and rebuffer level follow its adaptive target depth instead, every write is
+    reported to it as an arrival, at the arrived_at time the caller received the audio when given, and gaps are
+    concealed according to its concealment mode.
+    write() is called from a single producer thread and blocks while the ring buffer is full.
+    Writes can be tagged with the conversation item they belong to; the engine then counts exactly how much of each
+    item has been handed to the device, which interrupt() reports when it cuts playback for a barge-in. The time from
+    interrupt() to the device playing silence is kept in flush_latencies, taken with clock.
+    """
+    def __init__(self, sample_rate=24000, channels=1, sample_width=2, block_duration=BLOCK_DURATION,
+                 start_duration=START_DURATION, buffer_duration=BUFFER_DURATION, stream_factory=None,
+                 jitter_buffer=None, clock=time.perf_counter):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_size = sample_width * channels
+        self.bytes_per_second = sample_rate * self.frame_size
+        self.blocksize = max(1, int(sample_rate * block_duration))
+        self.start_bytes = int(sample_rate * start_duration) * self.frame_size
+        self.ring = AudioRingBuffer(int(sample_rate * buffer_duration) * self.frame_size)
+        self.stream_factory = stream_factory or default_stream_factory
+        self.jitter_buffer = jitter_buffer
+        self.clock = clock
+        self._fade = np.linspace(0.0, 1.0, max(1, int(sample_rate * FADE_DURATION) * channels), dtype=np.float32)
+        self._rebuffering = False         # waiting for the start level again after an underrun
+        self._stream = None
+        self._silence = bytes(self.blocksize * self.frame_size)
+        self._playing = False             # the callback is pulling audio rather than waiting for the start level
+        self._end_of_stream = False       # no more audio is coming, play out what is buffered without rebuffering
+        self._drained = threading.Event()
+        self.on_playback_start = None     # called from the device callback when a stream's first audio is played
+
+        # item bookkeeping, guarded by _lock together with the ring reads and clears
+        self._lock = threading.Lock()
+        self._segments = deque()           # [item_id, bytes not yet played] in ring order
+        self._played = OrderedDict()       # item_id -> bytes handed to the device
+        self._interrupted = OrderedDict()  # items cut by interrupt(), later writes for them are dropped
+        self._interrupted_at = None        # clock() time of the last interrupt, until the next callback
+
+        # statistics
+        self.underruns = 0          # times the buffer ran dry in the middle of a stream
+        self.device_underflows = 0  # output underflows reported by the device itself
+        self.frames_played = 0      # audio frames handed to the device
+        self.callbacks = 0
+        self.flush_latencies = deque(maxlen=100)  # seconds from interrupt() to the device playing silence
+
+    def start(self):
+        """Open the output stream and start the device pulling audio."""
+        self._stream = self.stream_factory(samplerate=self.sample_rate, channels=self.channels,
+                                           blocksize=self.blocksize, callback=self._callback)
+        self._stream.start()
+        logger.debug(f"Playback engine started, {self.blocksize} frames per callback.")
+
+    @property
+    def start_level(self):
+        """Bytes to buffer before starting or resuming playback."""
+        if self.jitter_buffer is None:
+            return self.start_bytes
+        return int(self.jitter_buffer.target_depth * self.sample_rate) * self.frame_size
+
+    def _conceal(self, out, start, end, fade_in):
+        """Fade the samples in out[start:end] in or out, so the edge of a gap does not click."""
+        if self.jitter_buffer is None or self.jitter_buffer.concealment != CONCEAL_FADE or end <= start:
+            return
+        samples = np.frombuffer(out, dtype=np.int16, count=(end - start) // 2, offset=start)
+        count = min(len(samples), len(self._fade))
+        if fade_in:
+            samples[:count] = samples[:count] * self._fade[:count]
+        else:
+            samples[-count:] = samples[-count:] * self._fade[:count][::-1]
+
+    def _callback(self, outdata, frames, time_info, status):
+        """Device callback: fill outdata from the ring buffer and silence."""
+        self.callbacks += 1
+        if status and status.output_underflow:
+            self.device_underflows += 1
+
+        out = memoryview(outdata).cast("B")
+        length = len(out)
+        if len(self._silence) < length:
+            self._silence = bytes(length)
+
+        # the state is read and changed under the lock, so an interrupt() cannot land between the reads: its cut is
+        # not taken for the buffer running dry
+        resumed = False
+        started = False
+        count = None
+        ran_dry = False
+        with self._lock:
+            if not self._playing:
+                # wait for the start level, or for whatever is left at the end of the stream
+                buffered = len(self.ring)
+                if buffered >= self.start_level or (self._end_of_stream and buffered):
+                    self._playing = True
+                    resumed = self._rebuffering
+                    started = not resumed
+                    self._rebuffering = False
+            if self._playing:
+                count = self.ring.read_into(out)
+                if self._segments:
+                    self._account(count)
+                if count < length:
+                    self._playing = False
+                    if not self._end_of_stream:
+                        # ran dry in the middle of the stream: rebuffer
+                        ran_dry = True
+                        self.underruns += 1
+                        self._rebuffering = True
+            rebuffering = self._rebuffering
+            if self._interrupted_at is not None:
+                # first device period after an interrupt, the stale audio is gone from here on
+                self.flush_latencies.append(self.clock() - self._interrupted_at)
+                self._interrupted_at = None
+
+        if count is None:
+            out[:] = self._silence[:length]
+            if self._end_of_stream:
+                self._drained.set()
+            elif rebuffering and self.jitter_buffer is not None:
+                self.jitter_buffer.on_concealed(length / self.bytes_per_second)
+            return
+
+        self.frames_played += count // self.frame_size
+        if started and count and self.on_playback_start is not None:
+            self.on_playback_start()
+        if resumed:
+            # fade back in after a gap
+            self._conceal(out, 0, count, fade_in=True)
+        if count < length:
+            out[count:] = self._silence[:length - count]
+            if not ran_dry:
+                self._drained.set()
+            else:
+                # fade out what we have
+                self._conceal(out, 0, count, fade_in=False)
+                if self.jitter_buffer is not None:
+                    self.jitter_buffer.on_underrun()
+                    self.jitter_buffer.on_concealed((length - count) / self.bytes_per_second)
+
+    def _account(self, count):
+        """Credit count bytes just handed to the device to the items they belong to, oldest first."""
+        segments = self._segments
+        played = self._played
+        while count and segments:
+            segment = segments[0]
+            item_id = segment[0]
+            used = min(count, segment[1])
+            if item_id is not None:
+                played[item_id] = played.get(item_id, 0) + used
+            segment[1] -= used
+            count -= used
+            if not segment[1]:
+                segments.popleft()
+
+    def write(self, data, item_id=None, timeout=None, arrived_at=None):
+        """
+        Queue PCM audio for playback, waiting up to timeout seconds (forever by default) while the ring buffer is full.
+        Audio of an item that has been interrupted is dropped.
+        arrived_at is when the audio came off the network, on the jitter buffer's clock; without it the write counts
+        as the arrival.
+        Returns the number of bytes queued.
+        """
+        with self._lock:
+            if item_id is not None:
+                if item_id in self._interrupted:
+                    return 0
+                if item_id not in self._played:
+                    self._played[item_id] = 0
+                    while len(self._played) > TRACKED_ITEMS:
+                        self._played.popitem(last=False)
+            epoch = self.ring.epoch
+            self._segments.append([item_id, len(data)])
+        self._end_of_stream = False
+        self._drained.clear()
+        if self.jitter_buffer is not None:
+            self.jitter_buffer.on_arrival(len(data) / self.bytes_per_second, arrived_at)
+        return self.ring.write(data, timeout=timeout, epoch=epoch)
+
+    def played_ms(self, item_id):
+        """Milliseconds of an item's audio handed to the device so far."""
+        return self._played.get(item_id, 0) * 1000 // self.bytes_per_second
+
+    def interrupt(self):
+        """
+        Cut playback now for a barge-in: drop the buffered audio, refuse the rest of the item being played, and
+        return (item_id, audio_end_ms) of that item, or (None, 0) when nothing tagged was playing.
+        The device plays silence from its next period on.
+        """
+        with self._lock:
+            item_id = next((segment[0] for segment in self._segments if segment[0] is not None), None)
+            if item_id is None and self._played:
+                # the buffer had already drained, the last item played is the one being heard
+                item_id = next(reversed(self._played))
+            dropped = self.ring.clear()
+            self._segments.clear()
+            self._playing = False
+            self._rebuffering = False
+            self._interrupted_at = self.clock()
+            if item_id is not None:
+                self._interrupted[item_id] = True
+                while len(self._interrupted) > TRACKED_ITEMS:
+                    self._interrupted.popitem(last=False)
+            audio_end_ms = self.played_ms(item_id) if item_id is not None else 0
+        if self._end_of_stream:
+            self._drained.set()
+        logger.debug(f"Playback interrupted, dropped {dropped} bytes, item {item_id} cut at {audio_end_ms} ms.")
+        return item_id, audio_end_ms
+
+    @property
+    def is_playing(self):
+        """True while the device is playing, or audio is buffered to be played."""
+        return self._playing or len(self.ring) > 0
+
+    def end_stream(self):
+        """Mark the end of the stream without waiting: what is buffered is played out without rebuffering."""
+        self._end_of_stream = True
+        self._rebuffering = False
+        if self.jitter_buffer is not None:
+            self.jitter_buffer.end_stream()
+        if not len(self.ring) and not self._playing:
+            self._drained.set()
+
+    def drain(self, timeout=None):
+        """
+        Mark the end of the stream and wait until the buffered audio has been played.
+        Returns False if the device did not play it out within the timeout.
+        """
+        if timeout is None:
+            # the buffered audio, plus headroom for the device latency
+            timeout = len(self.ring) / self.bytes_per_second + 1.0
+        self.end_stream()
+        drained = self._drained.wait(timeout)
+        if not drained:
+            logger.warning(f"Playback did not drain within {timeout:.1f} s, {len(self.ring)} bytes left.")
+        return drained
+
+    def clear(self):
+        """Drop the buffered audio immediately. Returns the number of bytes dropped."""
+        with self._lock:
+            dropped = self.ring.clear()
+            self._segments.clear()
+            self._playing = False
+            self._rebuffering = False
+        if self._end_of_stream:
+            self._drained.set()
+        return dropped
+
+    def close(self):
+        """Stop and close the output stream."""
+        self.ring.close()
+        self._end_of_stream = True
+        self._drained.set()
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+                self._stream.close()
+            except Exception as e:
+                logger.warning(f"Error closing stream: {e}")
+            self._stream = None
+
+    @property
+    def fill_level(self):
+        """Seconds of audio buffered and not yet handed to the device."""
+        return len(self.ring) / self.bytes_per_second
+
+    def stats(self):
+        """Return the engine statistics, including the jitter buffer's when there is one."""
+        stats = {
+            "fill_bytes": len(self.ring),
+            "fill_seconds": self.fill_level,
+            "start_level_seconds": self.start_level / self.bytes_per_second,
+            "underruns": self.underruns,
+            "device_underflows": self.device_underflows,
+            "frames_played": self.frames_played,
+            "callbacks": self.callbacks,
+            "interrupts": len(self.flush_latencies),
+            "max_flush_latency": max(self.flush_latencies, default=0.0),
+        }
+        if self.jitter_buffer is not None:
+            stats["jitter"] = self.jitter_buffer.stats()
+        return stats
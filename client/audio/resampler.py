@@ -0,0 +1,125 @@
+# resampler.py
+import functools
+import math
+import numpy as np
+
+# Filter design
+ZERO_CROSSINGS = 16      # sinc zero crossings on each side of the centre tap, at the lower of the two rates
+ROLLOFF = 0.92           # passband edge as a share of the lower Nyquist frequency
+KAISER_BETA = 8.6        # window shape, about 80 dB of stopband attenuation
+BLOCK_FRAMES = 4096      # input frames filtered at once, bounds the working memory of long inputs
+
+@functools.lru_cache(maxsize=32)
+def polyphase_filter(up, down):
+    """
+    Return the windowed-sinc low-pass filter for resampling by up/down, split into its up phases: an array of
+    shape (up, taps) where row r holds the taps applied to the input samples for output phase r, oldest first.
+    """
+    # taps per phase; downsampling needs a longer filter for the same transition band
+    taps = 2 * math.ceil(ZERO_CROSSINGS * max(1.0, down / up))
+    length = up * taps
+
+    # low-pass at the lower Nyquist frequency, relative to the upsampled rate
+    cutoff = ROLLOFF / max(up, down)
+    t = np.arange(length) - (length - 1) // 2  # centred on a whole sample, the lookahead of Resampler
+    prototype = cutoff * np.sinc(cutoff * t) * np.kaiser(length, KAISER_BETA)
+
+    # unity gain for every phase, interpolated samples keep the level of the input
+    prototype *= up / prototype.sum()
+    return prototype.reshape(taps, up).T[:, ::-1].astype(np.float32).copy()
+
+class Resampler:
+    """
+    Streaming polyphase resampler for PCM16 audio.
+
+    process() takes chunks of any size and returns the resampled audio available so far. The last input samples
+    are kept between calls, so a stream resampled chunk by chunk is identical to the same audio resampled at once,
+    with no clicks at the chunk boundaries. Output is aligned with the input: the filter looks ahead half its length,
+    and flush() returns the rest once the input has ended, for a total of ceil(frames * to_rate / from_rate) frames.
+    Samples are filtered as float32 in vectorized blocks. Equal rates pass the audio through untouched.
+    """
+    def __init__(self, from_rate, to_rate, channels=1):
+        divisor = math.gcd(int(from_rate), int(to_rate))
+        self.from_rate = from_rate
+        self.to_rate = to_rate
+        self.channels = channels
+        self.up = int(to_rate) // divisor
+        self.down = int(from_rate) // divisor
+        self.passthrough = self.up == self.down
+        self._filter = polyphase_filter(self.up, self.down)
+        self.taps = self._filter.shape[1]
+        self._lookahead = (self.up * self.taps - 1) // 2  # filter centre, in upsampled samples
+        self.reset()
+
+    def reset(self):
+        """Forget the stream so far, e.g. before resampling an unrelated one."""
+        self._history = np.zeros((self.taps - 1, self.channels), dtype=np.float32)
+        self._position = self._lookahead  # next output, in upsampled samples from the start of the next chunk
+        self._frames_in = 0
+        self._frames_out = 0
+
+    def process(self, pcm_audio):
+        """Resample a chunk of interleaved PCM16 audio and return the PCM16 output available so far."""
+        if self.passthrough:
+            return bytes(pcm_audio)
+        samples = np.frombuffer(pcm_audio, dtype=np.int16).reshape(-1, self.channels)
+        self._frames_in += len(samples)
+        return b"".join(self._filter_block(samples[start:start + BLOCK_FRAMES])
+                        for start in range(0, len(samples), BLOCK_FRAMES))
+
+    def flush(self):
+        """Return the output still owed for the audio processed so far, and reset for a new stream."""
+        if self.passthrough:
+            return b""
+        owed = -(-self._frames_in * self.up // self.down) - self._frames_out
+        tail = b""
+        if owed > 0:
+            # the lookahead still needs the samples after the end, which are silence
+            silence = np.zeros((self._lookahead // self.up + 2, self.channels), dtype=np.int16)
+            tail = self._filter_block(silence)[:owed * self.channels * 2]
+        self.reset()
+        return tail
+
+    def _filter_block(self, samples):
+        """Filter a block of input frames and return the output frames whose last input sample it holds."""
+        up, down = self.up, self.down
+        buffer = np.concatenate((self._history, samples.astype(np.float32)))
+
+        # each output is the dot product of its phase's taps and the input samples leading up to it; the phases
+        # repeat every up outputs, so each phase is one matrix product over strided views of the input
+        positions = np.arange(self._position, len(samples) * up, down)
+        oldest = positions // up
+        windows = self._windows(buffer)
+        output = np.empty((len(positions), self.channels), dtype=np.float32)
+        for first in range(min(up, len(positions))):
+            # outputs first, first + up, ... start down input samples apart
+            count = len(range(first, len(positions), up))
+            start = oldest[first]
+            output[first::up] = windows[start:start + (count - 1) * down + 1:down] @ self._filter[positions[first] % up]
+
+        # carry the state over to the next block
+        self._position = (positions[-1] + down if len(positions) else self._position) - len(samples) * up
+        self._history = buffer[len(buffer) - (self.taps - 1):]
+        self._frames_out += len(positions)
+        return np.clip(np.rint(output), -32768, 32767).astype(np.int16).tobytes()
+
+    def _windows(self, buffer):
+        """View the taps-long windows of a (frames, channels) buffer as (windows, channels, taps), without copying."""
+        # built directly rather than with sliding_window_view, whose bookkeeping grows with every call
+        frame_stride, channel_stride = buffer.strides
+        return np.ndarray((len(buffer) - self.taps + 1, self.channels, self.taps), buffer.dtype, buffer, 0,
+                          (frame_stride, channel_stride, frame_stride))
+
+def resample(pcm_audio, from_rate, to_rate, channels=1):
+    """Resample a complete PCM16 clip."""
+    if from_rate == to_rate:
+        return pcm_audio
+    resampler = Resampler(from_rate, to_rate, channels)
+    return resampler.process(pcm_audio) + resampler.flush()
+
+def downmix(pcm_audio, channels):
+    """Average interleaved PCM16 channels into mono."""
+    if channels == 1:
+        return pcm_audio
+    samples = np.frombuffer(pcm_audio, dtype=np.int16).reshape(-1, channels)
+    return samples.mean(axis=1).round().astype(np.int16).tobytes()
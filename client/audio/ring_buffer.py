@@ -0,0 +1,89 @@
+# ring_buffer.py
+import threading
+
+class AudioRingBuffer:
+    """
+    Fixed-capacity byte ring buffer shared between a producer thread and an audio callback.
+    Storage is preallocated; write() copies into it and blocks while it is full, read_into() copies straight
+    into the device buffer handed to the callback, so no bytes objects are created on the audio path.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._size = 0
+        self._closed = False
+        self.epoch = 0  # incremented by clear(), so writes started before a clear can be abandoned
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def free(self):
+        return self.capacity - self._size
+
+    def write(self, data, timeout=None, epoch=None):
+        """
+        Copy data into the buffer, waiting for the reader to make room when it is full.
+        Given an epoch, the write stops as soon as the buffer has been cleared since that epoch was read.
+        Returns the number of bytes written, which is short if the wait timed out or the buffer was cleared or closed.
+        """
+        chunk = memoryview(data).cast("B")
+        length = len(chunk)
+        written = 0
+        with self._space:
+            while written < length:
+                if epoch is not None and epoch != self.epoch:
+                    break
+                free = self.capacity - self._size
+                if free == 0:
+                    if self._closed or not self._space.wait(timeout):
+                        break
+                    continue
+                if self._closed:
+                    break
+
+                # copy in, wrapping around the end of the storage if needed
+                count = min(free, length - written)
+                end = (self._start + self._size) % self.capacity
+                first = min(count, self.capacity - end)
+                self._view[end:end + first] = chunk[written:written + first]
+                if first < count:
+                    self._view[:count - first] = chunk[written + first:written + count]
+                self._size += count
+                written += count
+        return written
+
+    def read_into(self, out):
+        """Copy up to len(out) bytes into the writable buffer out, oldest first. Returns the number of bytes copied."""
+        with self._lock:
+            count = min(len(out), self._size)
+            if count == 0:
+                return 0
+            first = min(count, self.capacity - self._start)
+            out[:first] = self._view[self._start:self._start + first]
+            if first < count:
+                out[first:count] = self._view[:count - first]
+            self._start = (self._start + count) % self.capacity
+            self._size -= count
+            self._space.notify()
+        return count
+
+    def clear(self):
+        """Discard the buffered audio and return the number of bytes dropped."""
+        with self._lock:
+            dropped = self._size
+            self._start = 0
+            self._size = 0
+            self.epoch += 1
+            self._space.notify_all()
+        return dropped
+
+    def close(self):
+        """Wake any blocked writer and refuse further writes."""
+        with self._lock:
+            self._closed = True
+            self._space.notify_all()
@@ -0,0 +1,94 @@
+# vad.py
+import logging
+import math
+import numpy as np
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Events reported by StreamingVAD.process
+SPEECH_START = "speech_start"
+SPEECH_END = "speech_end"
+
+class StreamingVAD:
+    """
+    Stateful, energy-based voice activity detector for streaming PCM16 audio.
+
+    Each chunk costs one vectorized energy pass in float64, so it is cheap enough to run in the audio callback.
+    The speech threshold follows an adaptive noise floor, speech has to persist for start_duration before
+    SPEECH_START fires (hysteresis on the way in), and it has to stay below the lower stop threshold for
+    hangover seconds before SPEECH_END fires (hysteresis on the way out).
+    """
+    def __init__(self, rate=24000, min_threshold=100.0, start_ratio=3.0, stop_ratio=2.0,
+                 start_duration=0.05, hangover=1.0, floor_rise=0.02, floor_fall=0.5, initial_noise_floor=None):
+        self.rate = rate
+        self.min_threshold = min_threshold  # absolute RMS below which audio is always silence
+        self.start_ratio = start_ratio      # speech starts above noise_floor * start_ratio
+        self.stop_ratio = stop_ratio        # speech continues above noise_floor * stop_ratio
+        self.start_duration = start_duration
+        self.hangover = hangover
+        self.floor_rise = floor_rise        # smoothing when the noise floor rises (slow)
+        self.floor_fall = floor_fall        # smoothing when the noise floor falls (fast)
+        self.noise_floor = initial_noise_floor if initial_noise_floor is not None else min_threshold / start_ratio
+        self.speaking = False
+        self.last_rms = 0.0
+        self._above = 0.0  # seconds of consecutive audio above the start threshold
+        self._below = 0.0  # seconds of consecutive audio below the stop threshold
+
+    def reset(self):
+        """Return to the silent state, keeping the learned noise floor."""
+        self.speaking = False
+        self._above = 0.0
+        self._below = 0.0
+
+    @property
+    def start_threshold(self):
+        return max(self.min_threshold, self.noise_floor * self.start_ratio)
+
+    @property
+    def stop_threshold(self):
+        return self.start_threshold * self.stop_ratio / self.start_ratio
+
+    def process(self, pcm_audio):
+        """
+        Feed a chunk of PCM16 audio (bytes or an int16 array).
+        Returns SPEECH_START or SPEECH_END when the state changes on this chunk, otherwise None.
+        """
+        samples = np.frombuffer(pcm_audio, dtype='<i2') if not isinstance(pcm_audio, np.ndarray) else pcm_audio
+        count = samples.size
+        if count == 0:
+            return None
+
+        # one pass in a wide dtype, so squaring cannot overflow
+        wide = samples.astype(np.float64)
+        rms = math.sqrt(float(np.dot(wide, wide)) / count)
+        duration = count / self.rate
+        self.last_rms = rms
+
+        if not self.speaking:
+            if rms >= self.start_threshold:
+                self._above += duration
+                if self._above >= self.start_duration:
+                    self.speaking = True
+                    self._above = 0.0
+                    self._below = 0.0
+                    logger.debug(f"Speech started (rms {rms:.1f}, noise floor {self.noise_floor:.1f}).")
+                    return SPEECH_START
+            else:
+                self._above = 0.0
+
+                # track the noise floor while nobody is speaking
+                weight = self.floor_fall if rms < self.noise_floor else self.floor_rise
+                self.noise_floor += weight * (rms - self.noise_floor)
+            return None
+
+        if rms < self.stop_threshold:
+            self._below += duration
+            if self._below >= self.hangover:
+                self.speaking = False
+                self._below = 0.0
+                logger.debug(f"Speech ended (noise floor {self.noise_floor:.1f}).")
+                return SPEECH_END
+        else:
+            self._below = 0.0
+        return None
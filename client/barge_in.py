@@ -0,0 +1,102 @@
+# barge_in.py
+import json
+import logging
+import time
+from collections import deque
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Where an interruption was detected
+SOURCE_SERVER_VAD = "server_vad"
+SOURCE_LOCAL_VAD = "local_vad"
+
+# Interrupted items remembered, so late deltas of them are dropped
+TRACKED_ITEMS = 32
+
+class BargeIn:
+    """
+    Interrupts the assistant when the user starts talking over it.
+
+    It follows the server events to know which response is in flight and which item carries its audio. On
+    interrupt() it cuts local playback first (the audio stops within one device period), then cancels the response
+    if the server is still generating it, and truncates the assistant item at the milliseconds actually played, so
+    the conversation history matches what the user heard.
+    interrupt_playback() -> (item_id, audio_end_ms) and is_playing() are provided by the playback sink.
+    """
+    def __init__(self, ws, interrupt_playback, is_playing, clock=time.perf_counter):
+        self.ws = ws
+        self.interrupt_playback = interrupt_playback
+        self.is_playing = is_playing
+        self.clock = clock
+        self.response_id = None   # response being generated by the server
+        self.item_id = None       # assistant item carrying the audio of that response
+        self._interrupted = deque(maxlen=TRACKED_ITEMS)
+
+        # statistics
+        self.interruptions = []   # one dict per interruption, with its latencies in seconds
+
+    @property
+    def active(self):
+        """True while there is assistant audio to interrupt."""
+        return self.response_id is not None or self.is_playing()
+
+    def observe(self, event):
+        """Follow the response lifecycle from a server event."""
+        event_type = event.get("type")
+        if event_type == "response.created":
+            self.response_id = event.get("response", {}).get("id")
+        elif event_type == "response.output_item.added":
+            self.item_id = event.get("item", {}).get("id")
+        elif event_type == "response.done":
+            if event.get("response", {}).get("id") in (None, self.response_id):
+                self.response_id = None
+
+    def is_interrupted(self, item_id):
+        """True if audio of this item must not be played any more."""
+        return item_id is not None and item_id in self._interrupted
+
+    async def interrupt(self, source, detected_at=None):
+        """
+        Interrupt the assistant. detected_at is the clock() time the user's speech was detected, defaulting to now.
+        Returns the interruption record, or None when there was nothing to interrupt.
+        """
+        if not self.active:
+            return None
+        detected_at = self.clock() if detected_at is None else detected_at
+
+        # cut playback first, this is what the user hears
+        item_id, audio_end_ms = self.interrupt_playback()
+        flushed_at = self.clock()
+        item_id = item_id or self.item_id
+        for interrupted in {item_id, self.item_id} - {None}:
+            if interrupted not in self._interrupted:
+                self._interrupted.append(interrupted)
+
+        # stop the server generating audio nobody will hear
+        cancelled = self.response_id is not None
+        if cancelled:
+            await self.ws.send(json.dumps({"type": "response.cancel"}))
+
+        # make the conversation history match what was actually played
+        if item_id is not None:
+            await self.ws.send(json.dumps({
+                "type": "conversation.item.truncate",
+                "item_id": item_id,
+                "content_index": 0,
+                "audio_end_ms": audio_end_ms,
+            }))
+        sent_at = self.clock()
+
+        record = {
+            "source": source,
+            "item_id": item_id,
+            "audio_end_ms": audio_end_ms,
+            "cancelled": cancelled,
+            "flush_latency": flushed_at - detected_at,
+            "send_latency": sent_at - detected_at,
+        }
+        self.interruptions.append(record)
+        logger.info(f"Barge-in ({source}): cut item {item_id} at {audio_end_ms} ms, "
+                    f"playback flushed in {record['flush_latency'] * 1000:.1f} ms.")
+        return record
@@ -1,8 +1,8 @@
 # connection_handler.py
 import asyncio
 import os
+import random
 import ssl
-import sys
 import websockets
 import logging
 from dotenv import load_dotenv
@@ -16,34 +16,91 @@ logger = logging.getLogger(__name__)
 # WebSocket URL
 URL = "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-10-01"
 
-# Retrieve OpenAI API Key from environment
-API_KEY = os.getenv("OPENAI_API_KEY")
+# Retry backoff: the delay doubles with every attempt up to the cap, and is jittered so that many clients dropped
+# at the same time do not reconnect in lockstep
+BACKOFF_BASE = 0.5   # seconds
+BACKOFF_MAX = 30.0   # seconds
 
-# get the api key
-if not API_KEY:
-    print("Error: OPENAI_API_KEY environment variable not set.")
-    sys.exit(1)
+# Bytes the socket's write buffer takes before send() waits for it to drain; kept small so a backlog of audio waits
+# in the SendQueue, where a response.cancel can still overtake it, instead of in the buffer
+WRITE_LIMIT = 2 ** 14
 
-# set the headers
-HEADERS = {
-    "Authorization": f"Bearer {API_KEY}",
-    "OpenAI-Beta": "realtime=v1"
-}
+# permessage-deflate is not negotiated: base64 audio only shrinks by about a quarter, and deflating it runs inside
+# send() on the event loop, which benchmarks.bench_audio_encoding shows stalls it for longer than the rest of the send.
+# Set to "deflate" to trade that CPU for upload bandwidth.
+COMPRESSION = None
+
+# Handshake statuses that retrying cannot fix
+FATAL_STATUS_CODES = (401, 403)
 
 # SSL context to disable certificate verification
 ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
 ssl_context.check_hostname = False
 ssl_context.verify_mode = ssl.CERT_NONE
-    
-async def connect_to_server(retry_count=3, retry_delay=5):
-    """Connect to the WebSocket server and return the connection object."""
-    ws = None
+
+def get_server_url():
+    """Return the realtime endpoint, honouring the OPENAI_REALTIME_URL override (e.g. a local mock server)."""
+    return os.getenv("OPENAI_REALTIME_URL", URL)
+
+def get_headers(api_key=None):
+    """Build the connection headers, reading OPENAI_API_KEY when no key is given."""
+    # get the api key
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+
+    # set the headers
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "OpenAI-Beta": "realtime=v1"
+    }
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Delay before retry number attempt (from 0): half of base * 2**attempt, capped, plus up to as much jitter."""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def resolve_headers(url, headers=None):
+    """Return the headers to connect with, or None when the real api is used without a key."""
+    if headers is not None:
+        return headers
+
+    # the real api requires a key but a local endpoint does not
+    headers = get_headers()
+    if headers is None and url != URL:
+        headers = {}
+    return headers
+
+async def open_connection(url, headers):
+    """Open a single websocket connection, raising on failure."""
+    # only secure endpoints need the ssl context
+    ssl_arg = ssl_context if url.startswith("wss://") else None
+    return await websockets.connect(url, extra_headers=headers, ssl=ssl_arg, write_limit=WRITE_LIMIT,
+                                    compression=COMPRESSION)
+
+def is_fatal(error):
+    """True for connection errors that retrying cannot fix, such as a rejected api key."""
+    status_code = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status_code in FATAL_STATUS_CODES
+
+async def connect_to_server(retry_count=3, retry_delay=BACKOFF_BASE, url=None, headers=None, max_delay=BACKOFF_MAX):
+    """
+    Connect to the WebSocket server and return the connection object, or None.
+    Failed attempts are retried with jittered exponential backoff starting at retry_delay seconds.
+    """
+    url = url or get_server_url()
+    headers = resolve_headers(url, headers)
+    if headers is None:
+        print("Error: OPENAI_API_KEY environment variable not set.")
+        return None
 
     # make multiple retry attemps
+    attempts = 0
     for attempt in range(retry_count):
+        attempts += 1
         try:
             # await the connection
-            ws = await websockets.connect(URL, extra_headers=HEADERS, ssl=ssl_context)
+            ws = await open_connection(url, headers)
 
             logger.debug("Connected to server.")
             return ws
@@ -51,11 +108,14 @@ async def connect_to_server(retry_count=3, retry_delay=5):
             logger.error(f"Connection closed during attempt {attempt + 1}: {e}")
         except Exception as e:
             logger.error(f"Error during connection attempt {attempt + 1}: {e}")
+            if is_fatal(e):
+                break
 
         # Wait before retrying
-        await asyncio.sleep(retry_delay)
+        if attempt + 1 < retry_count:
+            await asyncio.sleep(backoff_delay(attempt, retry_delay, max_delay))
 
-    print(f"Failed to connect after {retry_count} attempts.")
+    print(f"Failed to connect after {attempts} attempts.")
     return None
 
 
@@ -64,4 +124,4 @@ async def close_connection(ws):
     """Close the WebSocket connection."""
     if ws is not None and not ws.closed:
         await ws.close()
-        print("WebSocket connection closed.")
\ No newline at end of file
+        print("WebSocket connection closed.")
@@ -0,0 +1,115 @@
+# event_decoder.py
+import json
+import logging
+import re
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Use a faster JSON backend when one is installed
+try:
+    import orjson
+    json_loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    json_loads = json.loads
+    JSON_BACKEND = "json"
+
+# Event type of the frames that carry assistant audio
+AUDIO_DELTA_TYPE = "response.audio.delta"
+
+# The top-level type is looked for in the head of the frame only
+TYPE_SCAN_LIMIT = 256
+
+# Patterns used by the fast paths
+_TYPE_PATTERN = re.compile(r'"type"\s*:\s*"([^"\\]*)"')
+_DELTA_PATTERN = re.compile(r'"delta"\s*:\s*"')
+
+def peek_event_type(message):
+    """Return the event type found in the head of a text frame without parsing it, or None."""
+    match = _TYPE_PATTERN.search(message, 0, TYPE_SCAN_LIMIT)
+    return match.group(1) if match else None
+
+def decode_audio_delta(message):
+    """
+    Fast path for response.audio.delta frames.
+    The base64 delta is sliced out of the frame instead of being scanned by the JSON parser,
+    and only the small remainder of the frame (the ids) is parsed.
+    Returns None when the frame does not have the expected shape, so the caller can fall back.
+    """
+    match = _DELTA_PATTERN.search(message)
+    if match is None:
+        return None
+
+    # base64 never contains quotes, so the next quote closes the string
+    start = match.end()
+    end = message.find('"', start)
+    if end < 0:
+        return None
+    delta = message[start:end]
+    if "\\" in delta:
+        # escaped characters need the real parser
+        return None
+
+    # stitch the frame back together without the delta member
+    head = message[:match.start()].rstrip()
+    tail = message[end + 1:].lstrip()
+    if head.endswith(","):
+        head = head[:-1]
+    elif tail.startswith(","):
+        tail = tail[1:]
+    try:
+        event = json_loads(head + tail)
+    except ValueError:
+        return None
+
+    event["delta"] = delta
+    return event
+
+# Fast paths applied by default, keyed by event type
+DEFAULT_FAST_PATHS = {
+    AUDIO_DELTA_TYPE: decode_audio_delta,
+}
+
+class EventDecoder:
+    """
+    Turns websocket frames into event dicts.
+    Frames whose type has a registered fast path skip the full JSON parse, everything else uses the JSON backend.
+    Types with an event class, e.g. the lazy events of client.events, are handed to it undecoded instead.
+    """
+    def __init__(self, loads=None, fast_paths=None, event_classes=None):
+        self.loads = loads or json_loads
+        self.fast_paths = dict(DEFAULT_FAST_PATHS if fast_paths is None else fast_paths)
+        self.event_classes = dict(event_classes or {})
+        self.fast_path_hits = 0
+        self.lazy_events = 0
+        self.full_decodes = 0
+
+    def register_fast_path(self, event_type, decoder):
+        """Register a decoder(message) -> dict or None for an event type."""
+        self.fast_paths[event_type] = decoder
+
+    def decode(self, message):
+        """Decode a frame into an event dict, or an event object for the types with an event class."""
+        if (self.fast_paths or self.event_classes) and isinstance(message, str):
+            event_type = peek_event_type(message)
+            event_class = self.event_classes.get(event_type)
+            if event_class is not None:
+                self.lazy_events += 1
+                return event_class(message)
+            fast_path = self.fast_paths.get(event_type)
+            if fast_path is not None:
+                event = fast_path(message)
+                if event is not None:
+                    self.fast_path_hits += 1
+                    return event
+
+        self.full_decodes += 1
+        return self.loads(message)
+
+# Shared decoder used by the client
+default_decoder = EventDecoder()
+
+def decode_event(message):
+    """Decode a server frame with the shared decoder."""
+    return default_decoder.decode(message)
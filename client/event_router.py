@@ -0,0 +1,82 @@
+# event_router.py
+import inspect
+import logging
+from collections import Counter
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Returned by a handler to skip the handlers registered after it for this event
+STOP = object()
+
+class EventRouter:
+    """
+    Dispatches server events to the handlers registered for their type, with one dict lookup per event.
+
+    Handlers take the event and run in the order they were registered; they may be plain functions or return an
+    awaitable, which the caller of dispatch() awaits. Types declared with ignore() are dropped quietly. Any other
+    type without a handler is counted in unknown, and logged the first time it is seen, instead of vanishing.
+    """
+    def __init__(self):
+        self._routes = {}         # event type -> tuple of handlers
+        self.unknown = Counter()  # event type -> events received without a handler
+
+    def on(self, event_type, handler=None):
+        """Register a handler for an event type, once; without a handler, return a decorator that registers one."""
+        if handler is None:
+            def register(func):
+                self.on(event_type, func)
+                return func
+            return register
+        handlers = self._routes.get(event_type, ())
+        if handler not in handlers:
+            self._routes[event_type] = handlers + (handler,)
+        return handler
+
+    def ignore(self, *event_types):
+        """Declare event types that need no handling."""
+        for event_type in event_types:
+            self._routes.setdefault(event_type, ())
+
+    def handles(self, event_type):
+        return event_type in self._routes
+
+    def dispatch(self, event):
+        """
+        Run the handlers of an event. Returns None once they are done, or an awaitable that runs the rest of them
+        when a handler returned one, so events handled synchronously cost no coroutine:
+            pending = router.dispatch(event)
+            if pending is not None:
+                await pending
+        """
+        handlers = self._routes.get(event.get("type"))
+        if handlers is None:
+            self._unknown(event.get("type"))
+            return None
+        for handler in handlers:
+            result = handler(event)
+            if result is None:
+                continue
+            if inspect.isawaitable(result):
+                return self._resume(result, handlers[handlers.index(handler) + 1:], event)
+            if result is STOP:
+                break
+        return None
+
+    async def _resume(self, awaitable, handlers, event):
+        """Await a handler's result, then run the handlers after it."""
+        if await awaitable is STOP:
+            return
+        for handler in handlers:
+            result = handler(event)
+            if result is None:
+                continue
+            if inspect.isawaitable(result):
+                result = await result
+            if result is STOP:
+                break
+
+    def _unknown(self, event_type):
+        if not self.unknown[event_type]:
+            logger.info(f"No handler for server event {event_type}.")
+        self.unknown[event_type] += 1
@@ -0,0 +1,112 @@
+# events.py
+import re
+from collections.abc import Mapping
+from client.event_decoder import EventDecoder, json_loads, decode_audio_delta, _DELTA_PATTERN
+
+# Fields of an audio delta read straight from the frame
+_ITEM_ID_PATTERN = re.compile(r'"item_id"\s*:\s*"([^"\\]*)"')
+
+class ServerEvent(Mapping):
+    """
+    A server event kept as its raw frame and decoded on first access, for the high-volume event types.
+    It reads like the event dict (get, [], in, iteration), so handlers take either; the type is known without
+    decoding, and subclasses read their hot fields without parsing the whole frame.
+    """
+    __slots__ = ("_message", "_fields")
+    type = None
+
+    def __init__(self, message):
+        self._message = message
+        self._fields = None
+
+    @property
+    def fields(self):
+        """The event dict, parsed on first access; the frame is let go then, the dict holds everything."""
+        if self._fields is None:
+            self._fields = self._parse()
+            self._message = None
+        return self._fields
+
+    def _parse(self):
+        return json_loads(self._message)
+
+    def get(self, key, default=None):
+        if key == "type":
+            return self.type
+        fields = self._fields
+        if fields is None:
+            fields = self.fields
+        return fields.get(key, default)
+
+    def __getitem__(self, key):
+        if key == "type":
+            return self.type
+        return self.fields[key]
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.fields!r})"
+
+class AudioDelta(ServerEvent):
+    """
+    response.audio.delta. The base64 audio and the item id are sliced out of the frame on access, so the frame is
+    never parsed as a whole, and the other fields only parse what is left once the audio is cut out.
+    """
+    __slots__ = ()
+    type = "response.audio.delta"
+
+    @property
+    def delta(self):
+        if self._fields is None:
+            # base64 never contains quotes, so the next quote closes the string; find() scans far faster than a regex
+            match = _DELTA_PATTERN.search(self._message)
+            if match is not None:
+                end = self._message.find('"', match.end())
+                delta = self._message[match.end():end]
+                if end >= 0 and "\\" not in delta:
+                    return delta
+        return self.fields.get("delta", "")
+
+    @property
+    def item_id(self):
+        if self._fields is None:
+            # looked for before the base64 audio, then after it, never through it
+            message = self._message
+            delta_at = message.find('"delta"')
+            if delta_at < 0:
+                match = _ITEM_ID_PATTERN.search(message)
+            else:
+                match = _ITEM_ID_PATTERN.search(message, 0, delta_at)
+                if match is None:
+                    # past the quotes opening and closing the audio
+                    end = message.find('"', message.find('"', delta_at + 7) + 1)
+                    match = _ITEM_ID_PATTERN.search(message, end + 1) if end >= 0 else None
+            if match is not None:
+                return match.group(1)
+        return self.fields.get("item_id")
+
+    def get(self, key, default=None):
+        if key == "delta":
+            return self.delta
+        if key == "item_id":
+            return self.item_id
+        return super().get(key, default)
+
+    def _parse(self):
+        return decode_audio_delta(self._message) or json_loads(self._message)
+
+# Event classes, keyed by type. Only audio deltas gain from staying lazy: their handlers never need the whole frame
+# parsed. Smaller events have their fields read anyway, and a lazy event is then dearer than the dict it builds.
+EVENT_CLASSES = {event_class.type: event_class for event_class in (AudioDelta,)}
+
+# Shared decoder used by the client: audio deltas become lazy events, the others dicts
+default_decoder = EventDecoder(event_classes=EVENT_CLASSES)
+
+def decode_event(message):
+    """Decode a server frame with the shared decoder."""
+    return default_decoder.decode(message)
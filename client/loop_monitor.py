@@ -0,0 +1,143 @@
+# loop_monitor.py
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+from client.turn_metrics import LatencyHistogram, TurnMetrics, LOOP_LAG
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Monitor defaults
+LAG_INTERVAL = 0.01      # seconds between scheduling delay samples
+STALL_THRESHOLD = 0.1    # scheduling delay, in seconds, reported as a stall
+MAX_STALLS = 50          # stalls kept, the oldest are forgotten first
+STACK_LIMIT = 15         # innermost frames kept of a stall's stack
+
+class LoopMonitor:
+    """
+    Opt-in event-loop lag monitor: finds out when something blocks the event loop, for how long and what it was.
+
+    A task sleeps interval seconds at a time and records how late it wakes up, the scheduling delay every other
+    task and callback sees too, in a LatencyHistogram; given a TurnMetrics, that is its loop_lag histogram, reported
+    next to the turn intervals. A watchdog thread checks the task's progress, and once the loop has not come back for
+    stall_threshold seconds it captures the loop thread's stack and the task or callback running, while it is still
+    blocking. Each stall is logged and kept in stalls with its duration, culprit and stack.
+    The watchdog needs the GIL to look: a stall inside one long C call that holds it is still measured, without the
+    stack.
+    """
+    def __init__(self, interval=LAG_INTERVAL, stall_threshold=STALL_THRESHOLD, capture_stacks=True,
+                 metrics: Optional[TurnMetrics] = None, max_stalls=MAX_STALLS, clock=time.perf_counter):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.capture_stacks = capture_stacks
+        self.clock = clock
+        self.lag = metrics.histogram(LOOP_LAG) if metrics is not None else LatencyHistogram()
+        self.stalls = deque(maxlen=max_stalls)  # one dict per stall: duration, culprit, where and stack
+        self._loop = None
+        self._loop_thread = None
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+        self._due = None       # time the sampling task is due to wake up
+        self._capture = None   # what the watchdog found blocking the loop past _due
+
+    def start(self):
+        """Start monitoring the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._task = self._loop.create_task(self._sample(), name="loop-monitor")
+        if self.capture_stacks:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def _sample(self):
+        while True:
+            self._due = self.clock() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, self.clock() - self._due)
+            self.lag.add(lag)
+            if lag >= self.stall_threshold:
+                self._stalled(lag)
+
+    def _stalled(self, lag):
+        """Record a stall that just ended, with what the watchdog saw blocking the loop."""
+        capture, self._capture = self._capture, None
+        if capture is None or capture["due"] != self._due:
+            capture = {"culprit": None, "where": None, "stack": []}
+        stall = {"at": time.time(), "duration": lag, "culprit": capture["culprit"], "where": capture["where"],
+                 "stack": capture["stack"]}
+        self.stalls.append(stall)
+        logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms"
+                       + (f" by {stall['culprit']} at {stall['where']}." if stall["culprit"] else "."))
+        if stall["stack"] and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Stack of the loop thread while blocked:\n" + "".join(stall["stack"]))
+
+    def _watch(self):
+        """Watchdog thread: capture what blocks the loop once it is stall_threshold late."""
+        while not self._stopped.wait(self.interval):
+            due = self._due
+            if due is None or (self._capture is not None and self._capture["due"] == due):
+                continue
+            if self.clock() - due >= self.stall_threshold:
+                capture = self._blocking()
+                if capture is not None:
+                    capture["due"] = due
+                    self._capture = capture
+
+    def _blocking(self):
+        """Stack of the loop thread, and the task or callback it is running."""
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame, limit=STACK_LIMIT)
+        where = f"{stack[-1].name} ({stack[-1].filename}:{stack[-1].lineno})" if stack else None
+
+        # a task is running, or else a plain callback: the frame the event loop called into
+        task = asyncio.current_task(self._loop)
+        if task is not None:
+            coro = task.get_coro()
+            culprit = f"task {task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+        else:
+            culprit = "callback"
+            caller = frame
+            while caller.f_back is not None:
+                if caller.f_back.f_code.co_name == "_run" and caller.f_back.f_code.co_filename.endswith("events.py"):
+                    culprit = f"callback {caller.f_code.co_name}"
+                    break
+                caller = caller.f_back
+        return {"culprit": culprit, "where": where, "stack": stack.format()}
+
+    def stats(self):
+        """Return the lag percentiles and the number of stalls, in seconds."""
+        return {
+            "samples": self.lag.count,
+            "p50": self.lag.percentile(50),
+            "p99": self.lag.percentile(99),
+            "max": self.lag.max,
+            "stalls": len(self.stalls),
+        }
@@ -0,0 +1,389 @@
+# realtime_session.py
+import asyncio
+import itertools
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+import websockets
+from client.audio.audio_decoder import decode_audio
+from client.audio.audio_formats import PCM16
+from client.audio.audio_message_sender import (send_input_audio_append, commit_input_audio, send_audio_chunk,
+                                               send_audio_file, UPLOAD_SPEED)
+from client.audio.audio_sinks import AudioSink
+from client.barge_in import BargeIn, SOURCE_SERVER_VAD
+from client.connection_handler import connect_to_server
+from client.resilient_connection import ResilientConnection
+from client.send_queue import SendQueue, SEND_BUFFER
+from client.events import decode_event
+from client.event_router import EventRouter
+from client.message_handler import IGNORED_EVENT_TYPES, route_transcripts
+from client.response_handler import trigger_response
+from client.session import send_session_update
+from client.text_message_sender import send_text_message
+from client.transcript_assembler import TranscriptAssembler
+from client.turn_metrics import (TurnMetrics, TurnRecorder, use_recorder, RESPONSE_CREATED, FIRST_TEXT_DELTA,
+                                 FIRST_AUDIO_DELTA, RESPONSE_DONE)
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Session ids handed out when the caller does not choose one
+_session_ids = itertools.count(1)
+
+@dataclass
+class SessionConfig:
+    """Settings of one realtime conversation."""
+    modalities: List[str] = field(default_factory=lambda: ["text", "audio"])
+    voice: str = "alloy"
+    system_message: Optional[str] = None
+    audio_format: str = PCM16
+    turn_detection: Optional[str] = None  # "server_vad" lets the server commit streamed input audio itself
+    barge_in: bool = False                # interrupt the assistant when the server hears the user speak
+    url: Optional[str] = None             # defaults to the configured realtime endpoint
+    headers: Optional[dict] = None        # defaults to the headers built from OPENAI_API_KEY
+    connect_retries: int = 1
+    connect_retry_delay: float = 1.0
+    reconnect_attempts: int = 0           # reconnect and resume the conversation when the connection drops
+    response_timeout: float = 60.0        # seconds to wait for response.done
+    input_transcription: Optional[str] = None  # model that transcribes the user's audio, e.g. "whisper-1"
+    send_buffer: int = SEND_BUFFER        # bytes of outgoing audio and items queued before sends wait
+
+class RealtimeSession:
+    """
+    One realtime conversation, isolated from every other one in the process.
+
+    The session owns its websocket, its receive task, the responses it is waiting for, its audio sink and its state,
+    so many sessions can share one event loop. Decoded assistant audio goes to the sink, e.g. a CallbackSink feeding
+    a phone call or an EngineSink playing locally. on_event(session, event) sees every server event.
+    Turn timelines go to the session's own TurnRecorder, whose TurnMetrics can be shared between sessions.
+    """
+    def __init__(self, config: Optional[SessionConfig] = None, sink: Optional[AudioSink] = None,
+                 session_id: Optional[str] = None, on_event: Optional[Callable] = None,
+                 on_close: Optional[Callable] = None, metrics: Optional[TurnMetrics] = None):
+        self.id = session_id or f"session_{next(_session_ids)}"
+        self.config = config or SessionConfig()
+        self.sink = sink or AudioSink()
+        self.on_event = on_event
+        self.on_close = on_close
+        self.recorder = TurnRecorder(metrics)
+        self.ws = None
+        self.barge_in = None
+        self.closed = False
+        self.error = None  # exception that ended the session, if any
+
+        # conversation state
+        self.response_id = None        # response being generated
+        self._waiters = deque()        # futures of the responses requested by this session, oldest first
+        self._transcripts = TranscriptAssembler()
+        self._receive_task = None
+        self.router = self._route_events()
+
+        # statistics
+        self.events_received = 0
+        self.audio_bytes = 0
+        self.responses_done = 0
+        self.errors = 0
+
+    def __repr__(self):
+        return f"RealtimeSession({self.id!r})"
+
+    async def start(self):
+        """Connect, configure the session and start receiving. Raises ConnectionError if the connection fails."""
+        config = self.config
+        if config.reconnect_attempts:
+            self.ws = ResilientConnection(config.url, config.headers, max_attempts=config.reconnect_attempts,
+                                          backoff_base=config.connect_retry_delay,
+                                          interrupt_playback=self.sink.interrupt)
+            if not await self.ws.connect(config.connect_retries):
+                self.ws = None
+        else:
+            self.ws = await connect_to_server(config.connect_retries, config.connect_retry_delay, config.url,
+                                              config.headers)
+        if self.ws is None:
+            raise ConnectionError(f"{self.id}: could not connect to the realtime server")
+        self.ws = SendQueue(self.ws, config.send_buffer)
+
+        if config.barge_in:
+            self.barge_in = BargeIn(self.ws, self.sink.interrupt, self.sink.is_playing)
+            # follow the response lifecycle, and interrupt when the server hears the user start speaking
+            for event_type in ("response.created", "response.output_item.added", "response.done"):
+                self.router.on(event_type, self.barge_in.observe)
+            self.router.on("input_audio_buffer.speech_started",
+                           lambda event: self.barge_in.interrupt(SOURCE_SERVER_VAD))
+        await send_session_update(self.ws, config.modalities, config.voice, config.system_message,
+                                  config.turn_detection, config.audio_format, config.input_transcription)
+        with use_recorder(self.recorder):
+            self._receive_task = asyncio.create_task(self._receive(), name=f"{self.id}-receive")
+        logger.debug(f"{self.id}: started.")
+
+    def _expect_response(self):
+        """Register interest in the next response.done and return its future."""
+        if self.closed:
+            raise ConnectionError(f"{self.id}: session closed")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        return waiter
+
+    def _drop_waiter(self, waiter):
+        """Stop waiting for a response that will not be requested after all."""
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+        if waiter.done() and not waiter.cancelled():
+            waiter.exception()  # retrieved, so asyncio does not log it
+        waiter.cancel()
+
+    async def _wait_response(self, waiter):
+        try:
+            return await asyncio.wait_for(waiter, self.config.response_timeout)
+        except asyncio.TimeoutError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    async def send_text(self, text):
+        """Send a user text message and wait for the response. Returns a dict with its id, status and transcript."""
+        config = self.config
+        waiter = self._expect_response()
+        with use_recorder(self.recorder):
+            await send_text_message(self.ws, config.modalities, text, config.system_message, config.voice,
+                                    config.audio_format)
+        return await self._wait_response(waiter)
+
+    async def append_audio(self, pcm_audio):
+        """Stream PCM16 user audio into the input audio buffer."""
+        await send_input_audio_append(self.ws, pcm_audio, self.config.audio_format)
+
+    async def send_audio(self, pcm_audio):
+        """Send a complete PCM16 user utterance and wait for the response."""
+        config = self.config
+        with use_recorder(self.recorder):
+            self.recorder.begin_turn()
+            await self.append_audio(pcm_audio)
+            await commit_input_audio(self.ws)
+            waiter = self._expect_response()
+            await trigger_response(self.ws, config.modalities, config.system_message, config.voice, config.audio_format)
+        return await self._wait_response(waiter)
+
+    async def send_audio_message(self, audio_data, rate, channels=1):
+        """Send a recorded PCM16 utterance as one user message item and wait for the response."""
+        config = self.config
+        with use_recorder(self.recorder):
+            self.recorder.begin_turn()
+            await send_audio_chunk(self.ws, audio_data, rate, channels, config.audio_format)
+            waiter = self._expect_response()
+            await trigger_response(self.ws, config.modalities, config.system_message, config.voice, config.audio_format)
+        return await self._wait_response(waiter)
+
+    async def send_audio_file(self, path, max_speed=UPLOAD_SPEED):
+        """
+        Stream an audio file as a user utterance and wait for the response, see audio_message_sender.send_audio_file.
+        The result also holds input_bytes, the PCM16 bytes sent. Raises RuntimeError if the file could not be sent.
+        """
+        config = self.config
+        waiter = self._expect_response()
+        try:
+            with use_recorder(self.recorder):
+                sent = await send_audio_file(self.ws, path, config.modalities, config.system_message, config.voice,
+                                             config.audio_format, max_speed)
+            if not sent:
+                raise RuntimeError(f"{self.id}: could not send {path}")
+        except BaseException:
+            self._drop_waiter(waiter)
+            raise
+        result = await self._wait_response(waiter)
+        result["input_bytes"] = sent
+        return result
+
+    async def _receive(self):
+        """Receive loop of this session; any failure ends this session only."""
+        try:
+            async for message in self.ws:
+                event = decode_event(message)
+                self.events_received += 1
+                pending = self.router.dispatch(event)
+                if pending is not None:
+                    await pending
+                if self.on_event is not None:
+                    self.on_event(self, event)
+        except websockets.exceptions.ConnectionClosed as e:
+            logger.debug(f"{self.id}: connection closed: {e}")
+            self.error = e
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"{self.id}: receive loop failed: {e}", exc_info=True)
+            self.error = e
+        finally:
+            self._finish()
+
+    def _route_events(self):
+        """Register the session's handlers for the server events."""
+        router = EventRouter()
+        router.ignore(*IGNORED_EVENT_TYPES)
+        router.on("response.audio.delta", self._on_audio_delta)
+        router.on("response.text.delta", self._on_text_delta)
+        router.on("response.audio_transcript.delta", self._on_text_delta)
+        route_transcripts(router, self._transcripts)
+        router.on("response.created", self._on_response_created)
+        router.on("response.done", self._on_response_done)
+        router.on("error", self._on_error)
+        return router
+
+    def _on_audio_delta(self, event):
+        item_id = event.get("item_id")
+        if self.barge_in is not None and self.barge_in.is_interrupted(item_id):
+            return
+        pcm_audio = decode_audio(event.get("delta", ""), self.config.audio_format)
+        if pcm_audio:
+            self.recorder.mark(FIRST_AUDIO_DELTA)
+            self.audio_bytes += len(pcm_audio)
+            self.sink.write(pcm_audio, item_id)
+
+    def _on_text_delta(self, event):
+        self.recorder.mark(FIRST_TEXT_DELTA)
+
+    def _on_response_created(self, event):
+        self.recorder.mark(RESPONSE_CREATED)
+        self.response_id = event.get("response", {}).get("id")
+
+    def _on_response_done(self, event):
+        response = event.get("response", {})
+        response_id = response.get("id", self.response_id)
+        self.response_id = None
+        self.responses_done += 1
+        self.sink.end_stream()
+        self.recorder.mark(RESPONSE_DONE)
+        self.recorder.end_turn()
+        result = {
+            "id": response_id,
+            "status": response.get("status"),
+            "transcript": self._transcripts.pop_response(response_id),
+        }
+        if self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(result)
+
+    def _on_error(self, event):
+        self.errors += 1
+        logger.warning(f"{self.id}: server error: {event.get('error', {}).get('message')}")
+
+    def _finish(self):
+        """Mark the session closed and fail whatever is still waiting on it."""
+        if self.closed:
+            return
+        self.closed = True
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(ConnectionError(f"{self.id}: session closed"))
+        self.sink.close()
+        if self.on_close is not None:
+            self.on_close(self)
+
+    async def close(self):
+        """Close the connection and release the sink."""
+        if self._receive_task is not None and not self._receive_task.done():
+            self._receive_task.cancel()
+            try:
+                await self._receive_task
+            except asyncio.CancelledError:
+                pass
+        if self.ws is not None and not self.ws.closed:
+            await self.ws.close()
+        self._finish()
+        logger.debug(f"{self.id}: closed.")
+
+    def stats(self):
+        """Return the session statistics."""
+        return {
+            "events_received": self.events_received,
+            "audio_bytes": self.audio_bytes,
+            "responses_done": self.responses_done,
+            "errors": self.errors,
+            "unknown_events": sum(self.router.unknown.values()),
+            "send_queue": self.ws.stats() if self.ws is not None else None,
+            "closed": self.closed,
+        }
+
+class SessionManager:
+    """
+    Runs many RealtimeSessions on one event loop.
+    Connection setup is bounded by connect_concurrency, so opening hundreds of sessions does not stampede the server,
+    and a session that fails or disconnects is dropped from the manager without touching the others.
+    The turn timelines of all its sessions are aggregated in one TurnMetrics.
+    """
+    def __init__(self, max_sessions=1000, connect_concurrency=20, metrics: Optional[TurnMetrics] = None):
+        self.max_sessions = max_sessions
+        self.metrics = metrics or TurnMetrics()
+        self.sessions: Dict[str, RealtimeSession] = {}
+        self._connect_slots = asyncio.Semaphore(connect_concurrency)
+
+        # statistics
+        self.opened = 0
+        self.failed = 0
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __iter__(self):
+        return iter(list(self.sessions.values()))
+
+    def get(self, session_id):
+        return self.sessions.get(session_id)
+
+    async def open(self, config: Optional[SessionConfig] = None, sink: Optional[AudioSink] = None,
+                   session_id: Optional[str] = None, on_event: Optional[Callable] = None) -> RealtimeSession:
+        """Start a session and track it. Raises ConnectionError if it cannot connect."""
+        if len(self.sessions) >= self.max_sessions:
+            raise RuntimeError(f"Session limit of {self.max_sessions} reached.")
+        if session_id is not None and session_id in self.sessions:
+            raise ValueError(f"Session {session_id} already exists.")
+
+        session = RealtimeSession(config, sink, session_id, on_event, on_close=self._forget, metrics=self.metrics)
+        self.sessions[session.id] = session
+        try:
+            async with self._connect_slots:
+                await session.start()
+        except BaseException:
+            self.failed += 1
+            self.sessions.pop(session.id, None)
+            await session.close()
+            raise
+        self.opened += 1
+        return session
+
+    def _forget(self, session):
+        self.sessions.pop(session.id, None)
+
+    async def close(self, session_id):
+        """Close one session."""
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            await session.close()
+
+    async def close_all(self):
+        """Close every session, concurrently."""
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        results = await asyncio.gather(*(session.close() for session in sessions), return_exceptions=True)
+        for session, result in zip(sessions, results):
+            if isinstance(result, Exception):
+                logger.warning(f"{session.id}: error while closing: {result}")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close_all()
+
+    def stats(self):
+        """Return the manager statistics."""
+        return {
+            "active": len(self.sessions),
+            "opened": self.opened,
+            "failed": self.failed,
+            "responses_done": sum(session.responses_done for session in self.sessions.values()),
+            "audio_bytes": sum(session.audio_bytes for session in self.sessions.values()),
+        }
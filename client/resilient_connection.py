@@ -0,0 +1,398 @@
+# resilient_connection.py
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+import websockets
+from client.connection_handler import (BACKOFF_MAX, backoff_delay, get_server_url, is_fatal, open_connection,
+                                       resolve_headers)
+from client.event_decoder import json_loads, peek_event_type
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Reconnection defaults
+RECONNECT_ATTEMPTS = 5      # attempts after a drop before giving up
+RECONNECT_BASE = 0.25       # first reconnect backoff, in seconds; a dropped socket is usually back at once
+MAX_REPLAY_BYTES = 2 ** 22  # bytes of conversation items kept for replay, the oldest are forgotten first
+MAX_REPLAY_INPUT = 2 ** 20  # bytes of uncommitted input audio kept for replay, about 16 s of PCM16 at 24kHz
+
+# Sent after the append frames of each committed audio item the replay sends
+_COMMIT = json.dumps({"type": "input_audio_buffer.commit"})
+
+class ResilientConnection:
+    """
+    A websocket that reconnects by itself and resumes the conversation.
+
+    It keeps the client side of the conversation as it goes: the last session.update, the conversation items (user
+    messages and audio, and the assistant's replies as text), the last max_replay_input bytes of input audio not yet
+    committed and the response being generated. When the socket drops it reconnects with jittered exponential
+    backoff and replays that state on the new connection, so the server ends up with the same conversation and
+    regenerates an unfinished response.
+    Audio is replayed as the append frames it was sent as, committed again, with turn detection off meanwhile.
+    Messages sent while disconnected are folded into that state, so held input audio shares its limits; the others
+    (such as truncations) are held, and sent in order right after the replay.
+    It stands in for the websocket: send(), close(), closed and async iteration over the server frames, which
+    carries on across reconnections. Audio already received keeps playing, the playback thread is not involved.
+    A response cut off by the drop is generated again from the start: when the regenerated one starts sending audio,
+    interrupt_playback, if given, is called to drop what is left of the cut off one, so the two do not overlap.
+    With standby=True a second connection is kept open and idle, and a drop fails over to it without a handshake.
+    That helps when the server ends one session (a restart or an expired session), not when the network is down.
+    """
+    def __init__(self, url=None, headers=None, max_attempts=RECONNECT_ATTEMPTS, backoff_base=RECONNECT_BASE,
+                 backoff_max=BACKOFF_MAX, max_replay_bytes=MAX_REPLAY_BYTES, max_replay_input=MAX_REPLAY_INPUT,
+                 standby=False, interrupt_playback=None, clock=time.monotonic):
+        self.url = url or get_server_url()
+        self.headers = resolve_headers(self.url, headers)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_replay_bytes = max_replay_bytes
+        self.max_replay_input = max_replay_input
+        self.clock = clock
+        self.standby = standby
+        self.interrupt_playback = interrupt_playback
+        self.ws = None
+        self._standby = None        # idle pre-warmed connection
+        self._standby_task = None
+        self._connected = asyncio.Event()
+        self._reconnect_task = None
+        self._closing = False   # close() was called
+        self._failed = False    # reconnection gave up
+
+        # client side of the conversation, as JSON frames ready to replay
+        self._session_update = None     # last session.update
+        self._replay_update = None      # the same without turn detection, when it has one
+        self._items = deque()           # (conversation.item.create frame or list of append frames, bytes)
+        self._items_bytes = 0
+        self._input_audio = deque()     # input_audio_buffer.append frames sent since the last commit
+        self._input_bytes = 0
+        self._input_forgotten = 0       # bytes of them forgotten beyond max_replay_input
+        self._commits_sent = 0          # input_audio_buffer.commit frames the server has not confirmed yet
+        self._pending_response = None   # response.create of the response being generated
+        self._partial_item = None       # assistant item of that response, once the server has started it
+        self._cut_off_item = None       # partial item of the response being regenerated, still playing
+        self._replaying = False         # a new connection is being brought up to date
+        self._held = deque()            # frames sent while disconnected that the state does not carry
+
+        # statistics
+        self.recoveries = []  # one dict per reconnection: attempts, downtime and items replayed
+
+    async def connect(self, retry_count=3):
+        """Open the first connection. Returns False if it could not be opened."""
+        if self.headers is None:
+            print("Error: OPENAI_API_KEY environment variable not set.")
+            return False
+        for attempt in range(retry_count):
+            try:
+                self.ws = await open_connection(self.url, self.headers)
+                self._connected.set()
+                logger.debug("Connected to server.")
+                self._warm_standby()
+                return True
+            except Exception as e:
+                logger.error(f"Error during connection attempt {attempt + 1}: {e}")
+                if is_fatal(e):
+                    break
+            if attempt + 1 < retry_count:
+                await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+        print(f"Failed to connect after {retry_count} attempts.")
+        return False
+
+    @property
+    def closed(self):
+        """True once the connection is closed for good: by close(), or because reconnecting gave up."""
+        return self._closing or self._failed
+
+    @property
+    def reconnecting(self):
+        return self._reconnect_task is not None and not self._reconnect_task.done()
+
+    async def wait_connected(self):
+        """Wait until the connection is up again, or closed for good."""
+        await self._connected.wait()
+
+    async def send(self, message):
+        """
+        Send a frame. While reconnecting it goes into the state the replay sends, or is held and sent after the
+        replay if the state does not carry it.
+        """
+        if self.closed:
+            raise websockets.exceptions.ConnectionClosed(None, None)
+        if not self._connected.is_set():
+            # the replay may be past the part of the state this frame changes, hold it until the replay ends
+            if self._replaying or not self._record_outgoing(message):
+                logger.debug("Disconnected, holding the message until the connection is back.")
+                self._held.append(message)
+            return
+        self._record_outgoing(message)
+        ws = self.ws
+        try:
+            await ws.send(message)
+        except websockets.exceptions.ConnectionClosed:
+            # the replay will carry what this message changed
+            self._connection_lost(ws)
+
+    async def close(self):
+        """Close the connection for good."""
+        self._closing = True
+        self._connected.set()
+        if self.reconnecting:
+            self._reconnect_task.cancel()
+        if self._standby_task is not None and not self._standby_task.done():
+            self._standby_task.cancel()
+        if self._standby is not None:
+            await self._standby.close()
+            self._standby = None
+        if self.ws is not None:
+            await self.ws.close()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        while True:
+            ws = self.ws
+            try:
+                async for message in ws:
+                    if self._cut_off_item is not None and ws is self.ws:
+                        self._end_cut_off_response(message)
+                    self._record_incoming(message)
+                    yield message
+            except websockets.exceptions.ConnectionClosed as e:
+                logger.debug(f"Connection dropped: {e}")
+            if self._closing:
+                return
+
+            # the server went away without us closing: reconnect and carry on with the new connection
+            self._connection_lost(ws)
+            await self._connected.wait()
+            if self.closed:
+                return
+
+    def _connection_lost(self, ws):
+        """Start reconnecting after ws dropped, unless that is already under way."""
+        if self._closing or self._failed or ws is not self.ws or self.reconnecting:
+            return
+        self._connected.clear()
+        logger.warning("Connection to the server lost, reconnecting.")
+        self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    def _warm_standby(self):
+        """Open a standby connection in the background, if enabled and none is open or opening."""
+        if not self.standby or self._closing or self._standby is not None:
+            return
+        if self._standby_task is None or self._standby_task.done():
+            self._standby_task = asyncio.create_task(self._open_standby())
+
+    async def _open_standby(self):
+        try:
+            self._standby = await open_connection(self.url, self.headers)
+            logger.debug("Standby connection ready.")
+        except Exception as e:
+            logger.warning(f"Could not open a standby connection: {e}")
+
+    def _take_standby(self):
+        """Return the standby connection if it is still open, and forget it."""
+        standby, self._standby = self._standby, None
+        if standby is not None and not standby.open:
+            return None
+        return standby
+
+    async def _reconnect(self):
+        """Fail over to the standby connection, or reconnect with jittered exponential backoff, and replay."""
+        dropped_at = self.clock()
+
+        # the standby is already connected, only the replay is needed
+        standby = self._take_standby()
+        if standby is not None:
+            try:
+                replayed = await self._replay(standby)
+                self._resumed(standby, 0, dropped_at, replayed)
+                return
+            except websockets.exceptions.ConnectionClosed as e:
+                logger.warning(f"Standby connection lost while resuming: {e}")
+                await standby.close()
+
+        for attempt in range(self.max_attempts):
+            await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+            try:
+                ws = await open_connection(self.url, self.headers)
+            except Exception as e:
+                logger.warning(f"Reconnect attempt {attempt + 1}/{self.max_attempts} failed: {e}")
+                if is_fatal(e):
+                    break
+                continue
+            try:
+                replayed = await self._replay(ws)
+            except websockets.exceptions.ConnectionClosed as e:
+                logger.warning(f"Connection lost again while resuming: {e}")
+                await ws.close()
+                continue
+
+            self._resumed(ws, attempt + 1, dropped_at, replayed)
+            return
+
+        logger.error("Could not reconnect to the server, giving up.")
+        self._failed = True
+        self._connected.set()
+
+    def _resumed(self, ws, attempts, dropped_at, replayed):
+        """Switch to the resumed connection. attempts is 0 when the standby was used."""
+        self.ws = ws
+        self._connected.set()
+        self.recoveries.append({"attempts": attempts, "downtime": self.clock() - dropped_at,
+                                "items_replayed": replayed, "standby": attempts == 0})
+        how = "to the standby connection" if attempts == 0 else f"after {attempts} attempts"
+        logger.info(f"Reconnected {how}, {replayed} conversation items replayed.")
+        self._warm_standby()
+
+    async def _replay(self, ws):
+        """Send the recorded conversation on a new connection. Returns the number of items replayed."""
+        self._replaying = True
+        try:
+            return await self._send_state(ws)
+        finally:
+            self._replaying = False
+            # if the replay failed, what it still held goes into the state, before what is sent next
+            held, self._held = self._held, deque()
+            for message in held:
+                if not self._record_outgoing(message):
+                    self._held.append(message)
+
+    async def _send_state(self, ws):
+        """Send the conversation state, then the held frames."""
+        # commits sent on the dropped connection will not be confirmed, only the replayed ones
+        self._commits_sent = 0
+        # server VAD would commit and answer the replayed audio by itself
+        if self._session_update is not None:
+            await ws.send(self._replay_update or self._session_update)
+        for item, _ in list(self._items):
+            if isinstance(item, str):
+                await ws.send(item)
+            else:
+                for frame in item:
+                    await ws.send(frame)
+                await ws.send(_COMMIT)
+                self._commits_sent += 1
+        if self._replay_update is not None:
+            await ws.send(self._session_update)
+        if self._input_forgotten:
+            logger.warning(f"Replaying only the last {self._input_bytes} bytes of the uncommitted input audio, "
+                           f"{self._input_forgotten} bytes were not kept.")
+        for frame in list(self._input_audio):
+            await ws.send(frame)
+        if self._pending_response is not None:
+            await ws.send(self._pending_response)
+            if self._partial_item is not None:
+                self._cut_off_item, self._partial_item = self._partial_item, None
+        replayed = len(self._items)
+
+        # then the held frames, in order; one is only let go once sent, so a failed replay keeps it for the next
+        while self._held:
+            message = self._held[0]
+            await ws.send(message)
+            self._held.popleft()
+            self._record_outgoing(message)
+        return replayed
+
+    def _record_outgoing(self, message):
+        """Fold a client frame into the conversation state. Returns False if the state does not carry it."""
+        event_type = peek_event_type(message) if isinstance(message, str) else None
+        if event_type == "input_audio_buffer.append":
+            self._append_input_audio(message)
+        elif event_type == "conversation.item.create":
+            self._remember(message, len(message))
+        elif event_type == "input_audio_buffer.commit":
+            self._commits_sent += 1
+            self._commit_input_audio()
+        elif event_type == "input_audio_buffer.clear":
+            self._clear_input_audio()
+        elif event_type == "response.create":
+            self._pending_response = message
+            self._partial_item = None
+        elif event_type == "response.cancel":
+            self._pending_response = None
+            self._partial_item = self._cut_off_item = None
+        elif event_type == "session.update":
+            self._session_update = message
+            self._replay_update = None
+            event = json_loads(message)
+            if event.get("session", {}).get("turn_detection"):
+                event["session"]["turn_detection"] = None
+                self._replay_update = json.dumps(event)
+        else:
+            return False
+        return True
+
+    def _record_incoming(self, message):
+        """Fold a server frame into the conversation state."""
+        if not isinstance(message, str):
+            return
+        event_type = peek_event_type(message)
+        if event_type == "response.done":
+            self._pending_response = None
+            self._partial_item = None
+        elif event_type == "input_audio_buffer.committed":
+            if self._commits_sent:
+                # confirms a commit of ours, already recorded
+                self._commits_sent -= 1
+            else:
+                # server VAD commits the input audio by itself
+                self._commit_input_audio()
+        elif event_type == "response.output_item.added":
+            item = json_loads(message).get("item", {})
+            if item.get("role") == "assistant" and self._pending_response is not None:
+                self._partial_item = item.get("id")
+        elif event_type == "response.output_item.done":
+            item = json_loads(message).get("item", {})
+            if item.get("role") == "assistant":
+                text = "".join(content.get("transcript") or content.get("text") or ""
+                               for content in item.get("content", []))
+                if text:
+                    frame = json.dumps({
+                        "type": "conversation.item.create",
+                        "item": {"type": "message", "role": "assistant", "content": [{"type": "text", "text": text}]},
+                    })
+                    self._remember(frame, len(frame))
+
+    def _append_input_audio(self, frame):
+        """Keep an append frame for replay, forgetting the oldest ones beyond max_replay_input."""
+        self._input_audio.append(frame)
+        self._input_bytes += len(frame)
+        while self._input_bytes > self.max_replay_input and len(self._input_audio) > 1:
+            forgotten = len(self._input_audio.popleft())
+            self._input_bytes -= forgotten
+            self._input_forgotten += forgotten
+
+    def _clear_input_audio(self):
+        self._input_audio = deque()
+        self._input_bytes = self._input_forgotten = 0
+
+    def _commit_input_audio(self):
+        """Turn the input audio appended so far into a user item."""
+        if self._input_audio:
+            self._remember(list(self._input_audio), self._input_bytes)
+        self._clear_input_audio()
+
+    def _remember(self, item, size):
+        """Keep a conversation item for replay, forgetting the oldest ones beyond max_replay_bytes."""
+        self._items.append((item, size))
+        self._items_bytes += size
+        while self._items_bytes > self.max_replay_bytes and len(self._items) > 1:
+            _, forgotten = self._items.popleft()
+            self._items_bytes -= forgotten
+
+    def _end_cut_off_response(self, message):
+        """
+        Drop what is left of the response cut off by the drop once its regenerated version sends audio or finishes,
+        so they do not play over each other. Until then the cut off one keeps playing through the outage.
+        """
+        if peek_event_type(message) not in ("response.audio.delta", "response.done"):
+            return
+        if self.interrupt_playback is not None:
+            item_id, audio_end_ms = self.interrupt_playback()
+            logger.debug(f"Dropped the rest of {item_id or self._cut_off_item} after {audio_end_ms} ms, "
+                         "the regenerated response takes over.")
+        self._cut_off_item = None
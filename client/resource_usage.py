@@ -0,0 +1,27 @@
+# resource_usage.py
+import asyncio
+import os
+import sys
+
+# Seconds between samples of the resident set size
+RSS_INTERVAL = 0.1
+
+def current_rss():
+    """Resident set size of this process in bytes, or its peak where the current value is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+async def sample_peak_rss(peak, interval=RSS_INTERVAL):
+    """Keep the highest resident set size seen in peak["rss"], until cancelled."""
+    while True:
+        peak["rss"] = max(peak.get("rss", 0), current_rss())
+        await asyncio.sleep(interval)
@@ -1,12 +1,13 @@
 import json
 import uuid
 import logging
+from client.turn_metrics import RESPONSE_CREATE_SENT, mark
 
 # setup the logger
 logger = logging.getLogger(__name__)
 
 # Function to trigger the assistant's response after sending audio
-async def trigger_response(ws, modalities, system_message, voice):
+async def trigger_response(ws, modalities, system_message, voice, audio_format="pcm16"):
     """Trigger assistant response after all audio chunks are sent."""
     try:
         # get the event id
@@ -27,13 +28,14 @@ async def trigger_response(ws, modalities, system_message, voice):
         # check if we have audio in modalities
         if "audio" in modalities:
             response_data["response"]["voice"] = voice
-            response_data["response"]["output_audio_format"] = "pcm16"
+            response_data["response"]["output_audio_format"] = audio_format
 
         # Log the response data to ensure it’s constructed properly
         logger.debug(f"Triggering response with event_id: {event_id}, modalities: {modalities}, system_message: {system_message}")
 
         # Send the response creation event
         await ws.send(json.dumps(response_data))
+        mark(RESPONSE_CREATE_SENT)
         logger.debug(f"Triggered response with event_id: {event_id}")
 
     except Exception as e:
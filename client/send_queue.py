@@ -0,0 +1,197 @@
+# send_queue.py
+import asyncio
+import logging
+import time
+from collections import deque
+import websockets
+from client.event_decoder import peek_event_type
+from client.turn_metrics import LatencyHistogram
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Priority classes
+CONTROL = "control"            # stops the response in flight, overtakes everything queued
+CONVERSATION = "conversation"  # audio, items, commits, response.create and session updates, sent in order
+
+# Events that act on the response being generated, not on the conversation the queued frames build up, so sending
+# them ahead of queued audio cannot change what the server makes of it
+CONTROL_EVENT_TYPES = frozenset({"response.cancel", "conversation.item.truncate"})
+
+# Bytes of conversation frames queued before senders wait for the socket to take them
+SEND_BUFFER = 2 ** 18
+
+# Seconds close() waits for the queued frames to be written
+CLOSE_TIMEOUT = 5.0
+
+def priority_of(message):
+    """Priority class of an outgoing frame."""
+    if isinstance(message, str) and peek_event_type(message) in CONTROL_EVENT_TYPES:
+        return CONTROL
+    return CONVERSATION
+
+class SendQueue:
+    """
+    The only writer of a connection: every frame sent through it is written by one task, in priority order.
+
+    Control frames (response.cancel, conversation.item.truncate) go out before anything still queued, so a barge-in
+    does not wait behind an audio upload. Everything else keeps its order, the server applies it in sequence.
+    The writer waits for the socket to drain after each frame, so the backlog stays here where control frames can
+    overtake it, rather than in the socket's write buffer; connection_handler keeps that buffer small. Once
+    max_bytes of conversation frames are queued, send() waits for the writer to catch up, which slows the senders
+    down to what the connection takes. While a ResilientConnection reconnects, the writer waits for it to be back
+    rather than hand it frames to hold, so the senders are slowed down then too.
+    It stands in for the websocket it wraps (a websocket or a ResilientConnection): send(), close(), closed and
+    async iteration over the server frames. send() returns once the frame is queued, flush() waits until it is
+    written. The time frames spend queued is kept per priority class in delays.
+    """
+    def __init__(self, ws, max_bytes=SEND_BUFFER, clock=time.perf_counter):
+        self.ws = ws
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._lanes = {CONTROL: deque(), CONVERSATION: deque()}  # (message, size, queued at) per priority
+        self._buffered = 0               # bytes of conversation frames queued or being written
+        self._ready = asyncio.Event()    # frames are waiting for the writer
+        self._room = asyncio.Event()     # the conversation lane is below max_bytes
+        self._room.set()
+        self._idle = asyncio.Event()     # nothing queued or being written
+        self._idle.set()
+        self._writer = None
+        self._closing = False
+        self.error = None                # exception that stopped the writer, if any
+
+        # statistics
+        self.delays = {CONTROL: LatencyHistogram(), CONVERSATION: LatencyHistogram()}  # seconds queued
+        self.sent = {CONTROL: 0, CONVERSATION: 0}
+        self.bytes_sent = 0
+        self.max_buffered = 0
+        self.waits = 0                   # sends that waited for room in the queue
+        self.dropped = 0                 # frames left unsent when the connection failed
+
+    @property
+    def closed(self):
+        return self._closing or self.error is not None or self.ws.closed
+
+    @property
+    def buffered(self):
+        """Bytes of conversation frames not written yet."""
+        return self._buffered
+
+    @property
+    def reconnecting(self):
+        return getattr(self.ws, "reconnecting", False)
+
+    async def wait_connected(self):
+        await self.ws.wait_connected()
+
+    @property
+    def recoveries(self):
+        return getattr(self.ws, "recoveries", [])
+
+    def __aiter__(self):
+        return self.ws.__aiter__()
+
+    async def send(self, message):
+        """Queue a frame for the writer. Waits while the queue is full; raises ConnectionClosed once closed."""
+        if self.closed:
+            raise websockets.exceptions.ConnectionClosed(None, None)
+        priority = priority_of(message)
+        size = len(message)
+        if priority == CONVERSATION:
+            # a frame larger than the whole buffer is let through alone
+            while self._buffered and self._buffered + size > self.max_bytes:
+                self.waits += 1
+                self._room.clear()
+                await self._room.wait()
+                if self.closed:
+                    raise websockets.exceptions.ConnectionClosed(None, None)
+            self._buffered += size
+            self.max_buffered = max(self.max_buffered, self._buffered)
+
+        self._lanes[priority].append((message, size, self.clock()))
+        self._idle.clear()
+        self._ready.set()
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write())
+
+    async def flush(self):
+        """Wait until every queued frame has been written, or the connection failed."""
+        await self._idle.wait()
+
+    async def close(self):
+        """Write what is queued, within CLOSE_TIMEOUT, then close the connection."""
+        if not self._closing and self.error is None:
+            try:
+                await asyncio.wait_for(self.flush(), CLOSE_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"Closing with {self._buffered} bytes still queued.")
+        self._closing = True
+        if self._writer is not None and not self._writer.done():
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+        self._room.set()
+        await self.ws.close()
+
+    async def _write(self):
+        """
+        Writer task: send the queued frames, control first, waiting for the socket to drain after each and for the
+        connection to be back while it reconnects.
+        """
+        control, conversation = self._lanes[CONTROL], self._lanes[CONVERSATION]
+        while True:
+            if not control and not conversation:
+                self._idle.set()
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            if self.reconnecting:
+                # a ResilientConnection would take the frames at once while it is down
+                await self.ws.wait_connected()
+
+            priority = CONTROL if control else CONVERSATION
+            message, size, queued_at = self._lanes[priority][0]
+            self.delays[priority].add(self.clock() - queued_at)
+            try:
+                await self.ws.send(message)
+            except websockets.exceptions.ConnectionClosed as e:
+                self._fail(e)
+                return
+            except Exception as e:
+                logger.error(f"Error while sending: {e}", exc_info=True)
+                self._fail(e)
+                return
+            self._lanes[priority].popleft()
+            self.sent[priority] += 1
+            self.bytes_sent += size
+            if priority == CONVERSATION:
+                self._buffered -= size
+                self._room.set()
+
+    def _fail(self, error):
+        """Stop writing after the connection failed; what is still queued cannot be sent any more."""
+        logger.debug(f"Connection closed while sending: {error}")
+        self.error = error
+        self.dropped = sum(len(lane) for lane in self._lanes.values())
+        if self.dropped:
+            logger.warning(f"Connection closed with {self.dropped} frames unsent.")
+        for lane in self._lanes.values():
+            lane.clear()
+        self._buffered = 0
+        self._room.set()
+        self._idle.set()
+
+    def stats(self):
+        """Return the queue statistics, with the queueing delays per priority class."""
+        return {
+            "sent": dict(self.sent),
+            "bytes_sent": self.bytes_sent,
+            "buffered": self._buffered,
+            "max_buffered": self.max_buffered,
+            "waits": self.waits,
+            "dropped": self.dropped,
+            "delays": {priority: histogram.to_dict() for priority, histogram in self.delays.items()},
+        }
@@ -6,12 +6,18 @@ import logging
 logger = logging.getLogger(__name__)
 
 # Function to send session update
-async def send_session_update(ws, modalities, voice, system_message):
-    """Send session update to WebSocket Server"""
+async def send_session_update(ws, modalities, voice, system_message, turn_detection="server_vad", audio_format="pcm16",
+                              input_transcription=None):
+    """
+    Send session update to WebSocket Server.
+    Pass turn_detection=None when the client commits the input audio buffer itself.
+    audio_format is used for both input and output audio (pcm16, g711_ulaw or g711_alaw).
+    input_transcription names a model (e.g. whisper-1) that transcribes the user's audio as well.
+    """
     session_update = {
         "type": "session.update",
         "session": {
-            "turn_detection": {"type": "server_vad"},
+            "turn_detection": {"type": turn_detection} if turn_detection else None,
             "instructions": system_message,
             "modalities": modalities,
             "temperature": 0.8,
@@ -20,9 +26,11 @@ async def send_session_update(ws, modalities, voice, system_message):
 
     # Add audio-related fields only if "audio" is in modalities
     if "audio" in modalities:
-        session_update["session"]["input_audio_format"] = "pcm16"
-        session_update["session"]["output_audio_format"] = "pcm16"
+        session_update["session"]["input_audio_format"] = audio_format
+        session_update["session"]["output_audio_format"] = audio_format
         session_update["session"]["voice"] = voice
+    if input_transcription:
+        session_update["session"]["input_audio_transcription"] = {"model": input_transcription}
 
     # debug
     logger.debug("Sending session update")
@@ -2,10 +2,11 @@ import asyncio
 import json
 import uuid
 import logging
+from client.turn_metrics import RESPONSE_CREATE_SENT, begin_turn, mark
 
 logger = logging.getLogger(__name__)
 
-async def trigger_text_response(ws, modalities, system_message, voice):
+async def trigger_text_response(ws, modalities, system_message, voice, audio_format="pcm16"):
     """
     Trigger assistant response after sending the text message.
     This function creates a WebSocket event to trigger the assistant's response.
@@ -28,18 +29,21 @@ async def trigger_text_response(ws, modalities, system_message, voice):
         # If audio is included, add voice parameters
         if "audio" in modalities:
             response_data["response"]["voice"] = voice
-            response_data["response"]["output_audio_format"] = "pcm16"
+            response_data["response"]["output_audio_format"] = audio_format
 
         # Send the response creation event over WebSocket
         await ws.send(json.dumps(response_data))
+        mark(RESPONSE_CREATE_SENT)
         logger.debug(f"Triggered response with event_id: {event_id}")
 
     except Exception as e:
         logger.error(f"Error while triggering response: {e}", exc_info=True)
 
-async def send_text_message(ws, modalities, user_input, system_message=None, voice=None):
+async def send_text_message(ws, modalities, user_input, system_message=None, voice=None, audio_format="pcm16"):
     """Send text message as a conversation.item.create event."""
     try:
+        # a typed message starts a new turn
+        begin_turn()
         event_id = f"event_{uuid.uuid4().hex}"
         item_id = f"msg_{uuid.uuid4().hex[:28]}"
         event = {
@@ -59,7 +63,7 @@ async def send_text_message(ws, modalities, user_input, system_message=None, voi
         logger.debug(f"Sent text message with event_id: {event_id}")
         
         # Trigger assistant response (if needed)
-        await trigger_text_response(ws, modalities, system_message, voice)
+        await trigger_text_response(ws, modalities, system_message, voice, audio_format)
 
     except Exception as e:
         logger.error(f"Error while sending text message: {e}", exc_info=True)
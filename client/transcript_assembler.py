@@ -0,0 +1,48 @@
+# transcript_assembler.py
+
+class TranscriptAssembler:
+    """
+    Assembles streamed text and audio transcripts of assistant responses.
+
+    Deltas are kept per content part, keyed by (response_id, item_id, content_index), so parts of overlapping
+    responses never interleave. Each delta is appended to a list, and the list is joined once, when the part is done
+    and the server did not send the final text itself.
+    """
+    def __init__(self):
+        self._parts = {}  # (response_id, item_id, content_index) -> deltas, or [final text] once done
+
+    @staticmethod
+    def key(event):
+        """The content part an event belongs to."""
+        return event.get("response_id"), event.get("item_id"), event.get("content_index", 0)
+
+    def add(self, event):
+        """Take a response.text.delta or response.audio_transcript.delta event and return its delta."""
+        delta = event.get("delta", "")
+        if delta:
+            self._parts.setdefault(self.key(event), []).append(delta)
+        return delta
+
+    def finish(self, event, final=None):
+        """
+        Close a content part on its response.text.done or response.audio_transcript.done event and return its
+        transcript: final, the text the event carries, or else the deltas received.
+        """
+        key = self.key(event)
+        parts = self._parts.get(key, ())
+        if final is None:
+            final = "".join(parts)
+        self._parts[key] = [final]
+        return final
+
+    def partial(self, response_id, item_id, content_index=0):
+        """Return the text received so far for a content part."""
+        return "".join(self._parts.get((response_id, item_id, content_index), ()))
+
+    def pop_response(self, response_id):
+        """Forget a response, e.g. on response.done, and return its transcript, its content parts in order."""
+        keys = [key for key in self._parts if key[0] == response_id]
+        return "".join("".join(self._parts.pop(key)) for key in keys)
+
+    def clear(self):
+        self._parts.clear()
@@ -0,0 +1,249 @@
+# turn_metrics.py
+import bisect
+import contextlib
+import itertools
+import json
+import logging
+import math
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Points of a voice turn, in the order they normally happen
+SPEECH_END = "speech_end"                        # end of the user's speech detected
+AUDIO_SENT = "audio_sent"                        # user audio handed to the websocket
+RESPONSE_CREATE_SENT = "response_create_sent"    # response.create sent
+RESPONSE_CREATED = "response_created"            # response.created received
+FIRST_TEXT_DELTA = "first_text_delta"            # first text or transcript delta received
+FIRST_AUDIO_DELTA = "first_audio_delta"          # first audio delta received
+FIRST_AUDIO_PLAYED = "first_audio_played"        # first sample of the response handed to the output device
+RESPONSE_DONE = "response_done"                  # response.done received
+PLAYBACK_DRAINED = "playback_drained"            # the response audio has been played out
+MARKS = [SPEECH_END, AUDIO_SENT, RESPONSE_CREATE_SENT, RESPONSE_CREATED, FIRST_TEXT_DELTA, FIRST_AUDIO_DELTA,
+         FIRST_AUDIO_PLAYED, RESPONSE_DONE, PLAYBACK_DRAINED]
+
+# Intervals aggregated for every turn that has both ends: name -> (from mark, to mark)
+INTERVALS = {
+    "upload": (SPEECH_END, AUDIO_SENT),
+    "server_ack": (RESPONSE_CREATE_SENT, RESPONSE_CREATED),
+    "time_to_first_text": (RESPONSE_CREATE_SENT, FIRST_TEXT_DELTA),
+    "time_to_first_audio": (RESPONSE_CREATE_SENT, FIRST_AUDIO_DELTA),
+    "playback_start": (FIRST_AUDIO_DELTA, FIRST_AUDIO_PLAYED),
+    "generation": (RESPONSE_CREATED, RESPONSE_DONE),
+    "playout_tail": (RESPONSE_DONE, PLAYBACK_DRAINED),
+    "speech_end_to_first_audio_played": (SPEECH_END, FIRST_AUDIO_PLAYED),
+}
+
+# Histogram of the event loop's scheduling delay, fed by client.loop_monitor when it is enabled
+LOOP_LAG = "loop_lag"
+
+# Histogram bucket upper bounds, in seconds: 1 ms to about a minute in steps of 25%
+BUCKETS = [round(0.001 * 1.25 ** i, 6) for i in range(50)]
+
+_turn_ids = itertools.count(1)
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Return the nearest-rank percentile of the values, or None when there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def format_ms(seconds: Optional[float]) -> str:
+    """Format a duration in seconds as milliseconds."""
+    return "-" if seconds is None else f"{seconds * 1000:.2f} ms"
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations in seconds, with count, sum and max."""
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # the last bucket is everything above the largest bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th percentile, or None when empty."""
+        if not self.count:
+            return None
+        rank = max(1, -(-pct * self.count // 100))
+        seen = 0
+        for bound, count in zip(self.bounds + [self.max], self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "buckets": dict(zip([str(bound) for bound in self.bounds] + ["inf"], self.counts)),
+        }
+
+class TurnTimeline:
+    """Monotonic timestamps of the marks of one turn. Only the first occurrence of a mark is kept."""
+    def __init__(self, turn_id=None):
+        self.turn_id = turn_id or next(_turn_ids)
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name, at=None):
+        if name not in self.marks:
+            self.marks[name] = time.monotonic() if at is None else at
+
+    @property
+    def start(self):
+        return min(self.marks.values(), default=None)
+
+    def offsets(self):
+        """Seconds from the start of the turn to each mark, in time order."""
+        start = self.start
+        return {name: at - start for name, at in sorted(self.marks.items(), key=lambda mark: mark[1])}
+
+    def intervals(self):
+        """The INTERVALS this turn has both ends of, in seconds."""
+        return {name: self.marks[end] - self.marks[begin] for name, (begin, end) in INTERVALS.items()
+                if begin in self.marks and end in self.marks}
+
+    def to_dict(self):
+        return {"turn_id": self.turn_id, "offsets": self.offsets(), "intervals": self.intervals()}
+
+class TurnMetrics:
+    """
+    Aggregates finished turns into histograms: one per mark (offset from the start of the turn) and one per interval.
+    Exporters registered with add_exporter(fn) are called with every finished TurnTimeline.
+    One TurnMetrics can be shared by the recorders of many sessions.
+    """
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.exporters: List[Callable] = []
+        self.turns = 0
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    def record(self, timeline):
+        """Aggregate a finished turn and hand it to the exporters."""
+        self.turns += 1
+        for name, offset in timeline.offsets().items():
+            self.histogram(f"mark.{name}").add(offset)
+        for name, duration in timeline.intervals().items():
+            self.histogram(f"interval.{name}").add(duration)
+        for exporter in self.exporters:
+            try:
+                exporter(timeline)
+            except Exception as e:
+                logger.error(f"Turn metrics exporter failed: {e}", exc_info=True)
+
+    def histogram(self, name):
+        """Return the named histogram, created on first use."""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        return histogram
+
+    def snapshot(self):
+        """Return the histograms as plain dicts."""
+        return {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}
+
+    def summary(self):
+        """Return a printable table of the interval histograms."""
+        lines = [f"{'interval':<36}{'n':>6}{'p50':>10}{'p95':>10}{'max':>10}"]
+        for name in INTERVALS:
+            histogram = self.histograms.get(f"interval.{name}")
+            if histogram is None:
+                continue
+            p50, p95 = histogram.percentile(50), histogram.percentile(95)
+            lines.append(f"{name:<36}{histogram.count:>6}{p50 * 1000:>8.0f}ms{p95 * 1000:>8.0f}ms"
+                         f"{histogram.max * 1000:>8.0f}ms")
+        lag = self.histograms.get(LOOP_LAG)
+        if lag is not None and lag.count:
+            lines.append(f"{'event_loop_lag':<36}{lag.count:>6}{lag.percentile(50) * 1000:>8.0f}ms"
+                         f"{lag.percentile(95) * 1000:>8.0f}ms{lag.max * 1000:>8.0f}ms")
+        return "\n".join(lines)
+
+class TurnRecorder:
+    """
+    Records the timeline of the current turn of one conversation.
+    mark() opens a turn when none is open, begin_turn() starts a new one (finishing any open turn), end_turn()
+    hands the turn to the TurnMetrics. mark() only stores a timestamp, so it is safe from the audio threads, which
+    pass open_turn=False so that late playback marks do not open a turn of their own.
+    """
+    def __init__(self, metrics: Optional[TurnMetrics] = None):
+        self.metrics = metrics or TurnMetrics()
+        self.current: Optional[TurnTimeline] = None
+
+    def begin_turn(self):
+        self.end_turn()
+        self.current = TurnTimeline()
+        return self.current
+
+    def mark(self, name, at=None, open_turn=True):
+        """Mark a point of the current turn. With open_turn=False the mark is dropped when no turn is open."""
+        timeline = self.current
+        if timeline is None:
+            if not open_turn:
+                return
+            timeline = self.begin_turn()
+        timeline.mark(name, at)
+
+    def end_turn(self):
+        timeline, self.current = self.current, None
+        if timeline is not None and timeline.marks:
+            self.metrics.record(timeline)
+        return timeline
+
+# Recorder of the conversation the running code belongs to; sessions set their own
+default_recorder = TurnRecorder()
+_current_recorder: ContextVar[Optional[TurnRecorder]] = ContextVar("turn_recorder", default=None)
+
+def get_recorder() -> TurnRecorder:
+    """Return the recorder of the current context, or the process default."""
+    return _current_recorder.get() or default_recorder
+
+@contextlib.contextmanager
+def use_recorder(recorder):
+    """Make recorder the current one for the code (and the tasks it creates) inside the with block."""
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+def mark(name, at=None, open_turn=True):
+    """Mark a point of the current turn on the current recorder."""
+    get_recorder().mark(name, at, open_turn)
+
+def begin_turn():
+    """Start a new turn on the current recorder."""
+    return get_recorder().begin_turn()
+
+def end_turn():
+    """Finish the current turn on the current recorder."""
+    return get_recorder().end_turn()
+
+def log_exporter(timeline):
+    """Exporter logging one line per turn with the offset of each mark."""
+    marks = ", ".join(f"{name} +{offset * 1000:.0f}ms" for name, offset in timeline.offsets().items())
+    logger.info(f"Turn {timeline.turn_id}: {marks}")
+
+def jsonl_exporter(path):
+    """Return an exporter appending every turn as one JSON line to path."""
+    def export(timeline):
+        with open(path, "a") as f:
+            f.write(json.dumps(timeline.to_dict()) + "\n")
+    return export
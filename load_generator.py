@@ -0,0 +1,207 @@
+"""
+Synthetic load generator: simulated callers holding concurrent conversations against a realtime endpoint.
+
+Every caller is a RealtimeSession that plays a text or WAV script through the client's send path and consumes the
+responses like the terminal client does. Concurrency is ramped in stages, and each stage reports throughput,
+time to the first audio, event-loop lag, and CPU and memory per session, to find how many calls one box can carry.
+By default the mock realtime server runs in a separate process, so the numbers are the client's alone.
+
+Run from the repository root:
+    python load_generator.py --concurrency 10,50,100,200 --turns 3
+    python load_generator.py --concurrency 50 --wav question.wav --audio-format g711_ulaw
+    python load_generator.py --concurrency 20 --url ws://127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import logging
+import time
+from collections import Counter
+from pydub import AudioSegment
+from client.audio.audio_formats import AUDIO_FORMATS, PCM16, sample_rate_for
+from client.audio.audio_sinks import CallbackSink
+from client.audio.resampler import resample
+from client.loop_monitor import STALL_THRESHOLD, LoopMonitor
+from client.realtime_session import SessionConfig, SessionManager
+from client.resource_usage import current_rss, sample_peak_rss
+from client.turn_metrics import TurnMetrics, format_ms, percentile
+from mock_realtime_server import ResponseScript, start_mock_server
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+def load_script(args):
+    """Return the caller script: a list of ("text", str) or ("audio", pcm16 bytes) turns."""
+    if args.wav:
+        # convert once to mono PCM16 at the session's rate, every caller sends the same utterance
+        segment = AudioSegment.from_wav(args.wav).set_channels(1).set_sample_width(2)
+        return [("audio", resample(segment.raw_data, segment.frame_rate, sample_rate_for(args.audio_format)))]
+    if args.script:
+        with open(args.script) as f:
+            lines = [line.strip() for line in f if line.strip()]
+        return [("text", line) for line in lines]
+    return [("text", args.text)]
+
+async def run_caller(manager, config, script, turns, start_delay, results):
+    """One simulated caller: connect, play the script for the given number of turns, hang up."""
+    await asyncio.sleep(start_delay)
+    rate = sample_rate_for(config.audio_format)
+    turn = {"sent_at": None, "first_audio_at": None}
+
+    def on_audio(pcm_audio, item_id):
+        if turn["first_audio_at"] is None:
+            turn["first_audio_at"] = time.perf_counter()
+
+    try:
+        session = await manager.open(config, CallbackSink(on_audio, sample_rate=rate))
+    except Exception as e:
+        results["failures"].append(f"connect: {e}")
+        return
+
+    try:
+        for i in range(turns):
+            kind, payload = script[i % len(script)]
+            turn["sent_at"], turn["first_audio_at"] = time.perf_counter(), None
+            if kind == "audio":
+                result = await session.send_audio_message(payload, rate)
+            else:
+                result = await session.send_text(payload)
+            if result["status"] != "completed":
+                results["failures"].append(f"{session.id}: response {result['status']}")
+                continue
+            results["responses"] += 1
+            if turn["first_audio_at"] is not None:
+                results["first_audio"].append(turn["first_audio_at"] - turn["sent_at"])
+    except Exception as e:
+        results["failures"].append(f"{session.id}: {e!r}")
+    finally:
+        await manager.close(session.id)
+
+async def run_stage(url, concurrency, args, script):
+    """Run one stage of the ramp with the given number of concurrent callers and return its measurements."""
+    config = SessionConfig(modalities=["text", "audio"], voice=args.voice, system_message=args.system_message,
+                           audio_format=args.audio_format, url=url,
+                           response_timeout=args.response_timeout)
+    results = {"responses": 0, "first_audio": [], "failures": []}
+    metrics = TurnMetrics()
+    # stalls are only looked for, and attributed by the watchdog thread, for the breakdown
+    monitor = LoopMonitor(stall_threshold=STALL_THRESHOLD if args.breakdown else float("inf"),
+                          capture_stacks=args.breakdown, metrics=metrics)
+    peak = {"rss": current_rss()}
+    baseline_rss = peak["rss"]
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+
+    rss_sampler = asyncio.create_task(sample_peak_rss(peak))
+    monitor.start()
+    async with SessionManager(max_sessions=concurrency, connect_concurrency=args.connect_concurrency,
+                              metrics=metrics) as manager:
+        await asyncio.gather(*(run_caller(manager, config, script, args.turns,
+                                          args.ramp_seconds * i / concurrency, results)
+                               for i in range(concurrency)))
+    await monitor.stop()
+    rss_sampler.cancel()
+
+    wall_time = time.perf_counter() - started
+    cpu_time = time.process_time() - cpu_started
+    results.update({
+        "concurrency": concurrency,
+        "wall_time": wall_time,
+        "cpu_time": cpu_time,
+        "loop_lag": monitor.lag,
+        "rss_per_session": max(0, peak["rss"] - baseline_rss) / concurrency,
+        "turn_metrics": metrics,
+        "stalls": list(monitor.stalls),
+    })
+    return results
+
+def print_stage(results):
+    """Print one row of the ramp table."""
+    concurrency = results["concurrency"]
+    wall_time = results["wall_time"]
+    lag = results["loop_lag"]
+    print(f"{concurrency:>8}{results['responses']:>8}{len(results['failures']):>7}"
+          f"{results['responses'] / wall_time:>9.1f}"
+          f"{format_ms(percentile(results['first_audio'], 50)):>12}"
+          f"{format_ms(percentile(results['first_audio'], 95)):>12}"
+          f"{format_ms(percentile(results['first_audio'], 99)):>12}"
+          f"{format_ms(lag.percentile(99)):>12}{format_ms(lag.max if lag.count else None):>12}"
+          f"{results['cpu_time'] / wall_time * 100:>7.0f}%"
+          f"{results['cpu_time'] / concurrency * 1000:>13.1f}"
+          f"{results['rss_per_session'] / 1024:>13.0f}")
+
+def meets_targets(results, args):
+    """True if the stage stayed within the latency targets without failures."""
+    first_audio_p95 = percentile(results["first_audio"], 95)
+    loop_lag_p99 = results["loop_lag"].percentile(99) or 0.0
+    return (not results["failures"] and first_audio_p95 is not None
+            and first_audio_p95 <= args.max_first_audio_ms / 1000 and loop_lag_p99 <= args.max_loop_lag_ms / 1000)
+
+async def run(args):
+    script = load_script(args)
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_mock_server(ResponseScript(audio_chunks=args.audio_chunks, chunk_ms=args.chunk_ms,
+                                                       delta_interval=args.delta_interval_ms / 1000))
+    try:
+        print(f"Target: {url}, {args.turns} turns per caller, {args.audio_format} audio\n")
+        print(f"{'callers':>8}{'resp':>8}{'fail':>7}{'resp/s':>9}{'ttfa p50':>12}{'ttfa p95':>12}{'ttfa p99':>12}"
+              f"{'lag p99':>12}{'lag max':>12}{'cpu':>8}{'cpu ms/call':>13}{'rss KB/call':>13}")
+        carried = None
+        for concurrency in args.concurrency:
+            results = await run_stage(url, concurrency, args, script)
+            print_stage(results)
+            for failure in results["failures"][:3]:
+                logger.warning(f"  {failure}")
+            if args.breakdown:
+                print("\n" + results["turn_metrics"].summary())
+                stalls = Counter((stall["culprit"] or "unknown", stall["where"]) for stall in results["stalls"])
+                for (culprit, where), count in stalls.most_common(3):
+                    print(f"  event loop stalled {count}x by {culprit} at {where}")
+                print()
+            if meets_targets(results, args):
+                carried = concurrency
+            elif args.stop_on_miss:
+                break
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print("\ncpu is the share of one core used by the client; cpu ms/call and rss KB/call are the CPU time and "
+          "resident memory each caller cost.")
+    if carried is None:
+        print(f"No stage met p95 time to first audio <= {args.max_first_audio_ms:.0f} ms "
+              f"and p99 loop lag <= {args.max_loop_lag_ms:.0f} ms without failures.")
+    else:
+        print(f"Highest concurrency within targets (p95 time to first audio <= {args.max_first_audio_ms:.0f} ms, "
+              f"p99 loop lag <= {args.max_loop_lag_ms:.0f} ms, no failures): {carried} callers")
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Run simulated callers against a realtime endpoint.")
+    parser.add_argument("--concurrency", type=lambda value: [int(n) for n in value.split(",")], default=[10, 50, 100],
+                        help="Comma-separated concurrent callers of each ramp stage, e.g. 10,50,100.")
+    parser.add_argument("--turns", type=int, default=3, help="Responses requested by each caller.")
+    parser.add_argument("--ramp-seconds", type=float, default=1.0, help="Seconds over which a stage's callers start.")
+    parser.add_argument("--connect-concurrency", type=int, default=50, help="Connections opened at once.")
+    parser.add_argument("--text", default="Tell me a short story.", help="Text each caller sends.")
+    parser.add_argument("--script", help="File with one text message per line, sent in turn.")
+    parser.add_argument("--wav", help="WAV file each caller sends as its utterance, instead of text.")
+    parser.add_argument("--audio-format", choices=AUDIO_FORMATS, default=PCM16, help="Session audio format.")
+    parser.add_argument("--voice", default="alloy", help="Assistant voice.")
+    parser.add_argument("--system-message", default="You are a helpful assistant.", help="Session instructions.")
+    parser.add_argument("--response-timeout", type=float, default=60.0, help="Seconds to wait for each response.")
+    parser.add_argument("--url", help="Realtime endpoint to load. By default a mock server is started locally.")
+    parser.add_argument("--audio-chunks", type=int, default=10, help="Mock server: audio deltas per response.")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Mock server: audio carried by each delta.")
+    parser.add_argument("--delta-interval-ms", type=float, default=20.0, help="Mock server: pause between deltas.")
+    parser.add_argument("--max-first-audio-ms", type=float, default=500.0, help="Target p95 time to first audio.")
+    parser.add_argument("--max-loop-lag-ms", type=float, default=50.0, help="Target p99 event-loop lag.")
+    parser.add_argument("--breakdown", action="store_true",
+                        help="Print the turn latency breakdown of each stage, with its event-loop lag and stalls.")
+    parser.add_argument("--stop-on-miss", action="store_true", help="Stop the ramp at the first stage over target.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s:%(name)s:%(message)s')
+    asyncio.run(run(parse_arguments()))
@@ -1,17 +1,29 @@
 import asyncio
-import json
+import contextlib
+import functools
 import logging
 import threading
+import time
 from typing import List, Optional
 from argument_parser import parse_arguments
 import client.audio.audio_playback as audio_playback
 from client.audio.audio_decoder import decode_audio
-from client.audio.audio_playback import FLUSH_COMMAND
-from client.audio.audio_message_sender import send_audio_file, send_microphone_audio
+from client.audio.audio_formats import sample_rate_for
+from client.audio.jitter_buffer import JitterBuffer, UNDERRUN_PROBABILITY, CONCEAL_FADE
+from client.audio.audio_playback import FLUSH_COMMAND, END_OF_STREAM_COMMAND
+from client.audio.audio_message_sender import send_audio_file, send_microphone_audio, prepare_microphone
+from client.barge_in import BargeIn, SOURCE_LOCAL_VAD, SOURCE_SERVER_VAD
 from client.connection_handler import connect_to_server, close_connection
-from client.message_handler import handle_message
+from client.resilient_connection import ResilientConnection, RECONNECT_ATTEMPTS
+from client.send_queue import SendQueue, CONTROL, CONVERSATION
+from client.events import decode_event
+from client.loop_monitor import LoopMonitor
+from client.event_router import EventRouter
+from client.message_handler import IGNORED_EVENT_TYPES, route_transcripts
+from client.transcript_assembler import TranscriptAssembler
 from client.session import send_session_update
 from client.text_message_sender import send_text_message
+from client import turn_metrics
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(name)s:%(message)s')
@@ -24,79 +36,106 @@ SIGNAL_EXIT = "EXIT"
 # Define maximum retry attempts
 MAX_RETRIES = 3
 
+# Seconds to wait for the output device to open at startup
+DEVICE_OPEN_TIMEOUT = 10.0
+
+def route_events(ws, streaming_mode, message_queue, modalities, state):
+    """Register the client's handlers for the server events, in the order they run for an event."""
+    router = EventRouter()
+    router.ignore(*IGNORED_EVENT_TYPES)
+    transcripts = TranscriptAssembler()  # Accumulates the assistant's responses
+    barge_in = state.get("barge_in")  # Interrupts the assistant when the user talks over it, if enabled
+
+    # Handle audio chunk processing
+    router.on("response.audio.delta", functools.partial(handle_audio_delta, barge_in=barge_in,
+                                                         audio_format=state.get("audio_format", "pcm16")))
+
+    # Timestamp the turn
+    router.on("response.created", lambda response: turn_metrics.mark(turn_metrics.RESPONSE_CREATED))
+    router.on("response.text.delta", lambda response: turn_metrics.mark(turn_metrics.FIRST_TEXT_DELTA))
+    router.on("response.audio_transcript.delta", lambda response: turn_metrics.mark(turn_metrics.FIRST_TEXT_DELTA))
+    router.on("response.done", lambda response: turn_metrics.mark(turn_metrics.RESPONSE_DONE))
+
+    # Follow the response lifecycle, and interrupt when the server hears the user start speaking
+    if barge_in is not None:
+        for event_type in ("response.created", "response.output_item.added", "response.done"):
+            router.on(event_type, barge_in.observe)
+        router.on("input_audio_buffer.speech_started", lambda response: barge_in.interrupt(SOURCE_SERVER_VAD))
+
+    # With server turn detection, the turn starts where the server heard the user stop speaking
+    def handle_speech_stopped(response):
+        turn_metrics.begin_turn()
+        turn_metrics.mark(turn_metrics.SPEECH_END)
+
+    router.on("input_audio_buffer.speech_stopped", handle_speech_stopped)
+
+    # Print the transcript as it streams in, or in one go once it is complete
+    def print_transcript(chunk):
+        if not chunk:
+            return
+        if not state["response_started"]:
+            print("Assistant: ", end="", flush=True)  # Print only once
+            state["response_started"] = True
+        print(chunk, end="", flush=True)
+
+    if streaming_mode:
+        route_transcripts(router, transcripts, on_delta=print_transcript)
+    else:
+        route_transcripts(router, transcripts, on_final=print_transcript)
+
+    # Handle 'response.done', which closes the turn (the transcript done event precedes it)
+    async def handle_response_done(response):
+        transcripts.pop_response(response.get('response', {}).get('id'))
+        response_status = response.get('response', {}).get('status')
+
+        if response_status == 'failed':
+            await handle_error_and_retry(ws, message_queue, modalities, state)
+            return
+
+        # Reset failure count on success
+        state["failure_count"] = 0
+
+        # Wait until the response audio has been heard, the engine keeps playing after the last write.
+        # With barge-in the user may talk over the rest of it, so only wait for it to be buffered.
+        if "audio" in modalities:
+            audio_playback.enqueue_audio_chunk(FLUSH_COMMAND if barge_in is None else END_OF_STREAM_COMMAND)
+        await asyncio.to_thread(audio_playback.audio_queue.join)
+        turn_metrics.end_turn()
+
+        if state["response_started"]:
+            print(f"\nYou: ", end="", flush=True)
+
+        # Put a signal prompt in the message queue to continue the conversation
+        await message_queue.put(SIGNAL_PROMPT)
+        state["response_started"] = False
+
+    router.on("response.done", handle_response_done)
+
+    # Report errors the server sends
+    router.on("error", lambda response: logger.warning(f"Server error: {response.get('error', {}).get('message')}"))
+    return router
+
 async def receive_messages(ws, streaming_mode, message_queue, modalities, state):
     """Receive messages from the server and handle text or audio playback."""
-    transcript_buffer = ""  # Accumulates full response for assistant
+    router = route_events(ws, streaming_mode, message_queue, modalities, state)
+    state["router"] = router
 
     try:
         # Loop through messages
         async for message in ws:
             try:
-                # Receive and process the message
-                response = json.loads(message)
-
-                # Get the message type
-                message_type = response.get('type')
+                # Receive and process the message, audio deltas skip the full JSON parse
+                response = decode_event(message)
 
                 # Log the response for debugging
-                logger.debug(f"Received message of type: {message_type}")
-                if message_type != "response.audio.delta":
-                    logger.debug(f"Full response: {response}")
-
-                # Handle audio chunk processing
-                if message_type == 'response.audio.delta':
-                    await handle_audio_delta(response)
-                    continue
-
-                # Handle text and audio transcript messages
-                transcript_buffer, chunk = handle_message(response, transcript_buffer)
-
-                # Handle streaming for text or audio transcript response
-                if streaming_mode and chunk:
-                    if not state["response_started"]:
-                        print("Assistant: ", end="", flush=True)  # Print only once
-                        state["response_started"] = True
-
-                    if message_type in ['response.text.delta', 'response.audio_transcript.delta']:
-                        print(chunk, end="", flush=True)
-
-                # Handle final transcript from response.output_item.done
-                if message_type == 'response.output_item.done':
-                    content_list = response.get('item', {}).get('content', [])
-                    for content in content_list:
-                        if content.get('type') == 'audio' and 'transcript' in content:
-                            if not state["response_started"]:
-                                print("Assistant: ", end="", flush=True)
-                                state["response_started"] = True
-                            print(content['transcript'], end="", flush=True)
-
-                # Handle 'response.done' or 'response.audio_transcript.done'
-                if message_type in ['response.done', 'response.audio_transcript.done']:
-                    logger.debug(f"Received {message_type} message.")
-                    response_status = response.get('response', {}).get('status')
-
-                    if response_status == 'failed':
-                        await handle_error_and_retry(ws, message_queue, modalities, state)
-                        continue
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Received message of type: {response.get('type')}")
+                    if response.get('type') != "response.audio.delta":
+                        logger.debug(f"Full response: {response}")
 
-                    # Reset failure count on success
-                    state["failure_count"] = 0
-
-                    await asyncio.to_thread(audio_playback.audio_queue.join)
-
-                    if state["exit_requested"]:
-                        if "audio" in modalities:
-                            audio_playback.enqueue_audio_chunk(FLUSH_COMMAND)
-                            await asyncio.to_thread(audio_playback.audio_queue.join)
-
-                    if state["response_started"]:
-                        print(f"\nYou: ", end="", flush=True)
-
-                    # Put a signal prompt in the message queue to continue the conversation
-                    await message_queue.put(SIGNAL_PROMPT)
-                    state["response_started"] = False
-                    transcript_buffer = ""
-                    continue
+                pending = router.dispatch(response)
+                if pending is not None:
+                    await pending
 
             except Exception as inner_error:
                 logger.error(f"Error processing message: {inner_error}", exc_info=True)
@@ -127,33 +166,44 @@ async def handle_error_and_retry(ws, message_queue, modalities, state):
         logger.error("Maximum retry attempts reached. Exiting.")
         await message_queue.put(SIGNAL_EXIT)
 
-async def handle_audio_delta(response: dict) -> None:
-    """Handle audio chunk processing for 'response.audio.delta' messages."""
-    # get the event id
-    event_id = response.get('event_id')
-    logger.debug(f"Received audio chunk: {event_id}")
+def handle_audio_delta(response: dict, audio_format: str = "pcm16", barge_in: Optional[BargeIn] = None) -> None:
+    """
+    Handle audio chunk processing for 'response.audio.delta' messages.
+    Nothing in it waits, so it runs without a coroutine, and only reads the item id and the audio of the event.
+    """
+    # the jitter buffer measures arrivals here, not once the playback thread gets to the chunk
+    arrived_at = time.monotonic()
+
+    # drop the rest of an item the user has interrupted
+    item_id = response.get('item_id')
+    if barge_in is not None and barge_in.is_interrupted(item_id):
+        logger.debug(f"Dropping audio chunk of interrupted item {item_id}")
+        return
 
     # get the chunk
     audio_chunk = response.get("delta", "")
     
     # check if we have a chunk
     if audio_chunk:
+        turn_metrics.mark(turn_metrics.FIRST_AUDIO_DELTA)
         try:
             # decode
-            decoded_audio = decode_audio(audio_chunk)
+            decoded_audio = decode_audio(audio_chunk, audio_format)
             logger.debug(f"Decoded audio chunk size: {len(decoded_audio)} bytes")
 
             # send
-            audio_playback.enqueue_audio_chunk(decoded_audio)
+            audio_playback.enqueue_audio_chunk(decoded_audio, item_id, arrived_at)
         except Exception as e:
             logger.error(f"Error decoding audio: {e}. This will not trigger a retry.", exc_info=True)
     else:
         # empty audio chunk
-        logger.error(f"Received empty audio chunk for event_id: {event_id}")
+        logger.error(f"Received empty audio chunk for event_id: {response.get('event_id')}")
 
 
-async def send_message(ws, modalities, message_queue, audio_source=None, system_message=None, voice=None):
+async def send_message(ws, modalities, message_queue, audio_source=None, system_message=None, voice=None,
+                       stream_input=False, audio_format="pcm16", barge_in=None, input_stream_factory=None):
     """Send user messages (text or audio) and trigger assistant responses."""
+    listening = None  # with barge-in, the microphone capture running for the whole conversation
     try:
         # loop
         while True:
@@ -174,10 +224,21 @@ async def send_message(ws, modalities, message_queue, audio_source=None, system_
                         continue
 
                     # Send the user input as a text message
-                    await send_text_message(ws, modalities, user_input, system_message, voice)
+                    await send_text_message(ws, modalities, user_input, system_message, voice, audio_format)
+                elif barge_in is not None and audio_source == "mic":
+                    # The microphone keeps listening while the assistant talks, it is opened on the first prompt
+                    if listening is None:
+                        listening = asyncio.create_task(listen_with_barge_in(
+                            ws, modalities, system_message, voice, stream_input, audio_format, barge_in,
+                            input_stream_factory))
                 else:
                     # Handle audio input in the usual way
-                    await handle_prompt(modalities, audio_source, ws, system_message, voice)
+                    await handle_prompt(modalities, audio_source, ws, system_message, voice, stream_input, audio_format,
+                                        input_stream_factory)
+
+                    # an audio file is sent once, the conversation then carries on with typed input
+                    if audio_source != "mic":
+                        audio_source = None
             elif signal == SIGNAL_EXIT:
                 # Exiting
                 logger.info("Exiting application as per user request.")
@@ -190,6 +251,12 @@ async def send_message(ws, modalities, message_queue, audio_source=None, system_
     except Exception as e:
         logger.error(f"Error while sending message: {e}", exc_info=True)
         await message_queue.put(SIGNAL_EXIT)
+    finally:
+        # Close the microphone
+        if listening is not None:
+            listening.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await listening
 
 
 async def handle_prompt(
@@ -197,17 +264,23 @@ async def handle_prompt(
     audio_source: Optional[str],
     ws,
     system_message: Optional[str],
-    voice: Optional[str]
+    voice: Optional[str],
+    stream_input: bool = False,
+    audio_format: str = "pcm16",
+    input_stream_factory=None
 ) -> None:
     """Handle the PROMPT signal to send user input as text or audio."""
     if "audio" in modalities and audio_source:
         if audio_source == "mic":
             response_done_event = asyncio.Event()
             logger.debug("Audio stream started.")
-            await send_microphone_audio(ws, modalities, system_message, voice, response_done_event)
+            await send_microphone_audio(ws, modalities, system_message, voice, response_done_event, stream_input,
+                                        audio_format=audio_format, stream_factory=input_stream_factory)
             await response_done_event.wait()
         else:
-            await send_audio_file(ws, audio_source)
+            # audio_source is the path of an audio file, streamed to the server
+            if not await send_audio_file(ws, audio_source, modalities, system_message, voice, audio_format):
+                print(f"Could not send {audio_source}.")
     else:
         logger.debug("Prompting user for input")
         user_input = await asyncio.get_event_loop().run_in_executor(None, input)
@@ -218,7 +291,29 @@ async def handle_prompt(
             logger.debug("Empty user input, skipping.")
             return
 
-        await send_text_message(ws, modalities, user_input, system_message, voice)
+        await send_text_message(ws, modalities, user_input, system_message, voice, audio_format)
+
+
+async def listen_with_barge_in(
+    ws,
+    modalities: List[str],
+    system_message: Optional[str],
+    voice: Optional[str],
+    stream_input: bool,
+    audio_format: str,
+    barge_in: BargeIn,
+    input_stream_factory=None
+) -> None:
+    """
+    Keep the microphone open for the whole conversation, so the user can talk over the assistant, until cancelled.
+    With stream_input every frame is streamed and the session uses server VAD: the server ends the turns, and its
+    input_audio_buffer.speech_started interrupts the assistant. Otherwise the local VAD sends each utterance and
+    interrupts the assistant as soon as it hears speech.
+    """
+    on_speech_start = None if stream_input else (lambda: barge_in.interrupt(SOURCE_LOCAL_VAD))
+    await send_microphone_audio(ws, modalities, system_message, voice, asyncio.Event(), stream_input,
+                                audio_format=audio_format, on_speech_start=on_speech_start, continuous=True,
+                                server_vad=stream_input, stream_factory=input_stream_factory)
 
 
 async def prompt_user_choice(failure_count: int) -> str:
@@ -260,36 +355,119 @@ async def clean_shutdown(playback_thread: threading.Thread, ws, modalities: List
     logger.debug("WebSocket connection closed.")
 
 
-async def main(modalities, streaming_mode, audio_source=None, system_message=None, voice=None):
-    """Main function to manage connection, message sending, and receiving."""
-    # Start the playback thread and retrieve the thread instance
-    playback_thread = audio_playback.start_playback_thread()
+async def connect_and_configure(modalities, voice, system_message, turn_detection, audio_format,
+                                reconnect_attempts=RECONNECT_ATTEMPTS, standby=False, url=None):
+    """Connect to the server and send the session configuration. Returns the connection, or None."""
+    # Connect to the server, reconnecting and resuming the conversation if the connection drops
+    if reconnect_attempts:
+        ws = ResilientConnection(url, max_attempts=reconnect_attempts, standby=standby,
+                                 interrupt_playback=audio_playback.interrupt_playback)
+        if not await ws.connect():
+            return None
+    else:
+        ws = await connect_to_server(url=url)
+        if ws is None:
+            return None
+
+    # Every frame goes out through one writer task, so a response.cancel overtakes audio still queued
+    ws = SendQueue(ws)
+
+    # Send the session update
+    await send_session_update(ws, modalities, voice, system_message, turn_detection, audio_format)
+    return ws
+
+
+async def start_up(modalities, audio_source, system_message, voice, stream_input, audio_format, jitter_buffer,
+                   reconnect_attempts=RECONNECT_ATTEMPTS, standby=False, url=None, stream_factory=None,
+                   prepare_input=prepare_microphone, barge_in=False):
+    """
+    Bring up the connection and the audio devices concurrently: the websocket handshake and the session update run
+    while the playback thread opens the output device and PortAudio gets the microphone ready.
+    Returns (ws, playback_thread, timings), ws is None when the connection failed. timings holds the seconds from
+    the start to each part being ready, and to "ready" when all of them are.
+    """
+    started = time.perf_counter()
+    timings = {}
+
+    async def timed(name, awaitable):
+        result = await awaitable
+        timings[name] = time.perf_counter() - started
+        return result
+
+    # The playback thread opens the output device by itself
+    playback_thread = audio_playback.start_playback_thread(stream_factory, sample_rate_for(audio_format), jitter_buffer)
     logger.debug(f"Playback thread started: {playback_thread.is_alive()}")
 
-    # Connect to the server
-    ws = await connect_to_server()
+    # The client commits streamed microphone audio and audio files itself, otherwise the server detects the end of
+    # speech. With barge-in, streamed microphone audio never stops, and the server detects the turns in it.
+    turn_detection = None if (stream_input and not barge_in) or audio_source not in (None, "mic") else "server_vad"
+    parts = [
+        timed("connected", connect_and_configure(modalities, voice, system_message, turn_detection, audio_format,
+                                                 reconnect_attempts, standby, url)),
+        timed("output_device", asyncio.to_thread(audio_playback.wait_for_playback_ready, DEVICE_OPEN_TIMEOUT)),
+    ]
+    if audio_source == "mic":
+        parts.append(timed("input_device", asyncio.to_thread(prepare_input, audio_format)))
+    ws, *_ = await asyncio.gather(*parts)
+    timings["ready"] = time.perf_counter() - started
+
+    logger.info(f"Ready in {timings['ready'] * 1000:.0f} ms ("
+                + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items() if name != "ready")
+                + ").")
+    return ws, playback_thread, timings
+
+
+async def main(modalities, streaming_mode, audio_source=None, system_message=None, voice=None, stream_input=False,
+               audio_format="pcm16", underrun_probability=UNDERRUN_PROBABILITY, concealment=CONCEAL_FADE,
+               barge_in=False, reconnect_attempts=RECONNECT_ATTEMPTS, standby=False, loop_monitor=False, url=None,
+               stream_factory=None, input_stream_factory=None):
+    """
+    Main function to manage connection, message sending, and receiving.
+    url, stream_factory and input_stream_factory stand in for the endpoint and the audio devices, e.g. in benchmarks.
+    """
+    # Watch the event loop for stalls from startup on, its lag is reported with the turn metrics
+    monitor = None
+    if loop_monitor:
+        monitor = LoopMonitor(metrics=turn_metrics.default_recorder.metrics)
+        monitor.start()
+
+    # Connect and configure the session while the audio devices open
+    jitter_buffer = JitterBuffer(underrun_probability, concealment=concealment)
+    barge_in = barge_in and "audio" in modalities
+    prepare_input = prepare_microphone if input_stream_factory is None else (lambda audio_format: True)
+    ws, playback_thread, startup_timings = await start_up(modalities, audio_source, system_message, voice,
+                                                          stream_input, audio_format, jitter_buffer,
+                                                          reconnect_attempts, standby, url, stream_factory,
+                                                          prepare_input, barge_in)
 
     # Check if connection was successful
     if ws is None:
         logger.error("Failed to connect to server.")
         audio_playback.stop_playback_thread(playback_thread)
+        await stop_loop_monitor(monitor)
         return
 
     # Create a message queue
     message_queue = asyncio.Queue()
     logger.debug(f"Created message_queue: {message_queue}")
 
+    # Interrupts the assistant when the user talks over it
+    barge_in_handler = None
+    if barge_in:
+        barge_in_handler = BargeIn(ws, audio_playback.interrupt_playback, audio_playback.is_playback_active)
+
     # Initialize state dictionary
     state = {
-        "response_started": False,    # Tracks if the assistant has started responding
-        "exit_requested": False,      # Tracks if exit is requested to control FLUSH_COMMAND enqueuing
-        "failure_count": 0            # Tracks the number of consecutive failures
+        "router": None,                # Routes the server events, set by receive_messages
+        "response_started": False,     # Tracks if the assistant has started responding
+        "exit_requested": False,       # Tracks if exit is requested to control FLUSH_COMMAND enqueuing
+        "failure_count": 0,            # Tracks the number of consecutive failures
+        "audio_format": audio_format,  # Input and output audio format negotiated for the session
+        "barge_in": barge_in_handler,  # Barge-in handler, or None when disabled
+        "startup": startup_timings     # Seconds from startup until the connection and devices were ready
     }
 
     try:
-        # Send the session update
-        await send_session_update(ws, modalities, voice, system_message)
-
         # Start chatting
         print("Start chatting! (Press Ctrl+C to exit)\n")
         print(f"\nYou: ", end="", flush=True)
@@ -300,7 +478,9 @@ async def main(modalities, streaming_mode, audio_source=None, system_message=Non
 
         # Asynchronously receive and send messages
         receive_task = asyncio.create_task(receive_messages(ws, streaming_mode, message_queue, modalities, state))
-        send_task = asyncio.create_task(send_message(ws, modalities, message_queue, audio_source, system_message, voice))
+        send_task = asyncio.create_task(send_message(ws, modalities, message_queue, audio_source, system_message, voice,
+                                                     stream_input, audio_format, state["barge_in"],
+                                                     input_stream_factory))
 
         # Wait for both tasks to complete
         await asyncio.gather(receive_task, send_task)
@@ -324,8 +504,34 @@ async def main(modalities, streaming_mode, audio_source=None, system_message=Non
         # Handle any unexpected errors
         logger.error(f"An error occurred: {e}", exc_info=True)
     finally:
+        # Report the server events nothing handled
+        router = state.get("router")
+        if router is not None and router.unknown:
+            logger.info(f"Unhandled server events: {dict(router.unknown)}")
+
+        # Report how long outgoing frames waited for the socket
+        for priority in (CONTROL, CONVERSATION):
+            delays = ws.delays[priority]
+            if delays.count:
+                logger.debug(f"Send queue, {priority}: {delays.count} frames, queued p95 "
+                             f"{delays.percentile(95) * 1000:.1f} ms, max {delays.max * 1000:.1f} ms.")
+
         # Perform clean shutdown
         await clean_shutdown(playback_thread, ws, modalities)
+        await stop_loop_monitor(monitor)
+
+
+async def stop_loop_monitor(monitor: Optional[LoopMonitor]) -> None:
+    """Stop the event-loop monitor, if enabled, and report the lag and what stalled the loop."""
+    if monitor is None:
+        return
+    await monitor.stop()
+    stats = monitor.stats()
+    if stats["samples"]:
+        logger.info(f"Event loop lag: p99 {stats['p99'] * 1000:.0f} ms, max {stats['max'] * 1000:.0f} ms, "
+                    f"{stats['stalls']} stalls over {monitor.stall_threshold * 1000:.0f} ms.")
+    for stall in monitor.stalls:
+        logger.info(f"  {stall['duration'] * 1000:.0f} ms: {stall['culprit'] or 'unknown'} at {stall['where']}")
 
 
 if __name__ == "__main__":
@@ -338,19 +544,52 @@ if __name__ == "__main__":
     # Streaming mode
     streaming_mode = not args.no_streaming
 
-    # Optional audio source
+    # Optional audio source, the microphone or the path of an audio file
     audio_source = args.audio_source if args.mode == "audio" else None
+    if audio_source == "file":
+        audio_source = args.audio_file
 
     # System prompt and voice from arguments
     system_message = args.system_prompt
     voice = args.voice
 
+    # Stream microphone input as it is captured
+    stream_input = args.stream_input and audio_source == "mic"
+
+    # Audio format for both directions
+    audio_format = args.audio_format
+
+    # Playback jitter buffer settings
+    underrun_probability = args.underrun_probability
+    concealment = args.concealment
+
+    # Interrupt the assistant by talking over it, this needs the microphone
+    barge_in = args.barge_in and audio_source == "mic"
+
+    # Reconnect after a dropped connection, 0 disables it, optionally failing over to a standby connection
+    reconnect_attempts = args.reconnect_attempts
+    standby = args.standby_connection and reconnect_attempts > 0
+
+    # Export the latency timeline of each turn
+    metrics = turn_metrics.default_recorder.metrics
+    if args.turn_metrics:
+        metrics.add_exporter(turn_metrics.log_exporter)
+    if args.turn_metrics_file:
+        metrics.add_exporter(turn_metrics.jsonl_exporter(args.turn_metrics_file))
+
     try:
         # Run main
-        asyncio.run(main(modalities, streaming_mode, audio_source, system_message, voice))
+        asyncio.run(main(modalities, streaming_mode, audio_source, system_message, voice, stream_input, audio_format,
+                         underrun_probability, concealment, barge_in, reconnect_attempts, standby,
+                         args.loop_monitor))
     except KeyboardInterrupt:
         # Disconnect
         logger.info("\nDisconnected from server by user.")
     except Exception as e:
         # Handle any unexpected errors
         logger.error(f"An error occurred: {e}", exc_info=True)
+
+    # Show where the turns spent their time
+    if args.turn_metrics and metrics.turns:
+        print(f"\nLatency breakdown over {metrics.turns} turns:")
+        print(metrics.summary())
@@ -0,0 +1,379 @@
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional
+import websockets
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# PCM16 output parameters
+SAMPLE_RATE = 24000
+G711_SAMPLE_RATE = 8000
+SAMPLE_WIDTH = 2
+
+# Silence, in seconds, after which server VAD ends the user's turn
+SERVER_VAD_SILENCE = 0.5
+
+@dataclass
+class ResponseScript:
+    """Scripted content and timing for every assistant response the mock server produces."""
+    text: str = "Ahoy there, this is the mock realtime server speaking."
+    audio_chunks: int = 10          # number of response.audio.delta events per response
+    chunk_ms: int = 100             # audio duration carried by each audio delta
+    first_delta_delay: float = 0.05 # seconds between response.created and the first delta
+    delta_interval: float = 0.0     # seconds between consecutive deltas
+    tone_hz: float = 440.0          # frequency of the generated tone, so the audio is audible
+
+def _event_id():
+    return f"event_{uuid.uuid4().hex[:20]}"
+
+@lru_cache(maxsize=16)
+def _tone(duration_ms, frequency, audio_format="pcm16"):
+    """
+    Generate a base64 sine tone in the session's output audio format.
+    PCM16 is built without numpy, so the server has no audio dependencies unless a G.711 session asks for them.
+    """
+    rate = SAMPLE_RATE if audio_format == "pcm16" else G711_SAMPLE_RATE
+    samples = rate * duration_ms // 1000
+    step = 2 * math.pi * frequency / rate
+    values = (int(8000 * math.sin(step * i)) for i in range(samples))
+    pcm = b"".join(v.to_bytes(2, "little", signed=True) for v in values)
+    if audio_format != "pcm16":
+        from client.audio.audio_formats import encode_audio
+        pcm = encode_audio(pcm, audio_format)
+    return base64.b64encode(pcm).decode()
+
+class MockRealtimeServer:
+    """
+    A local stand-in for the realtime websocket API.
+    It speaks enough of the event protocol to drive the client end to end with scriptable timing.
+    With server_vad turn detection, an energy VAD listens to the appended audio: speech interrupts the response in
+    flight and is reported with input_audio_buffer.speech_started, and once it stops the buffer is committed and a
+    response created, as the realtime API does.
+    """
+    def __init__(self, host="127.0.0.1", port=0, script: Optional[ResponseScript] = None, handshake_delay=0.0):
+        self.host = host
+        self.port = port
+        self.script = script or ResponseScript()
+        self.handshake_delay = handshake_delay  # seconds added to every opening handshake, like a remote endpoint
+        self.received: List[dict] = []  # every client event, stamped with its arrival time and connection number
+        self.connections = 0            # connections accepted so far
+        self._server = None
+        self._senders = set()  # send functions of the connected clients
+        self._sockets = {}     # websockets of the connected clients by connection number
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self):
+        """Start listening and return the websocket url."""
+        self._server = await websockets.serve(self._handle, self.host, self.port, max_size=None,
+                                              process_request=self._delay_handshake)
+
+        # resolve the port when an ephemeral one was requested
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.debug(f"Mock realtime server listening on {self.url}")
+        return self.url
+
+    async def stop(self):
+        """Stop the server and close every open connection."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def emit_speech_started(self, audio_start_ms=0):
+        """
+        Tell every connected client that server VAD heard the user start speaking, as when they talk over the
+        assistant. Returns the time.monotonic() at which the event was sent.
+        """
+        sent_at = time.monotonic()
+        for send in list(self._senders):
+            await send({"type": "input_audio_buffer.speech_started", "audio_start_ms": audio_start_ms,
+                        "item_id": f"item_{uuid.uuid4().hex[:20]}"})
+        return sent_at
+
+    def drop_connections(self, connection=None):
+        """
+        Drop every client connection, or only the given connection number, abruptly and without a close handshake,
+        as when the network goes away. Returns the time.monotonic() at which they were dropped.
+        """
+        dropped_at = time.monotonic()
+        for number, ws in list(self._sockets.items()):
+            if connection is None or number == connection:
+                ws.transport.abort()
+        return dropped_at
+
+    async def _delay_handshake(self, path, request_headers):
+        """Hold the opening handshake for handshake_delay seconds, then let it go ahead."""
+        if self.handshake_delay:
+            await asyncio.sleep(self.handshake_delay)
+        return None
+
+    async def _handle(self, ws, path=None):
+        """Serve a single client connection."""
+        self.connections += 1
+        connection = self.connections
+        self._sockets[connection] = ws
+        session = {"modalities": ["text", "audio"], "output_audio_format": "pcm16"}
+        items = []
+        input_audio_bytes = 0
+        response_task = None
+        vad = None  # server VAD over the appended audio, created once the session asks for it
+
+        async def send(event):
+            event.setdefault("event_id", _event_id())
+            await ws.send(json.dumps(event))
+
+        def input_bytes_per_second():
+            # G.711 is one byte per sample at 8 kHz
+            input_format = session.get("input_audio_format", "pcm16")
+            return SAMPLE_RATE * SAMPLE_WIDTH if input_format == "pcm16" else G711_SAMPLE_RATE
+
+        async def commit(item_id=None):
+            nonlocal input_audio_bytes
+            item = {"id": item_id or f"item_{uuid.uuid4().hex[:20]}", "type": "message", "role": "user",
+                    "content": [{"type": "input_audio", "transcript": None}]}
+            items.append(item)
+            await send({"type": "input_audio_buffer.committed", "item_id": item["id"]})
+            await send({"type": "conversation.item.created", "item": item})
+            if session.get("input_audio_transcription"):
+                duration_ms = input_audio_bytes * 1000 // input_bytes_per_second()
+                await send({"type": "conversation.item.input_audio_transcription.completed",
+                            "item_id": item["id"], "content_index": 0,
+                            "transcript": f"Mock transcript of {duration_ms} ms of audio."})
+            input_audio_bytes = 0
+            return item
+
+        async def respond(options):
+            nonlocal response_task
+            if response_task is not None and not response_task.done():
+                await send({"type": "error", "error": {"type": "invalid_request_error",
+                                                       "message": "Conversation already has an active response"}})
+                return
+            modalities = options.get("modalities") or session["modalities"]
+            audio_format = options.get("output_audio_format") or session["output_audio_format"]
+            response_task = asyncio.create_task(self._stream_response(send, modalities, items, audio_format))
+
+        async def detect_turns(audio):
+            nonlocal vad
+            from client.audio.audio_decoder import decode_audio
+            from client.audio.vad import StreamingVAD, SPEECH_START, SPEECH_END
+            input_format = session.get("input_audio_format", "pcm16")
+            if vad is None:
+                vad = StreamingVAD(SAMPLE_RATE if input_format == "pcm16" else G711_SAMPLE_RATE,
+                                   hangover=SERVER_VAD_SILENCE)
+            change = vad.process(decode_audio(audio, input_format))
+            audio_ms = input_audio_bytes * 1000 // input_bytes_per_second()
+            if change == SPEECH_START:
+                # the user talks over the assistant, the response in flight is cancelled
+                if response_task is not None and not response_task.done():
+                    response_task.cancel()
+                await send({"type": "input_audio_buffer.speech_started", "audio_start_ms": audio_ms,
+                            "item_id": f"item_{uuid.uuid4().hex[:20]}"})
+            elif change == SPEECH_END:
+                item_id = f"item_{uuid.uuid4().hex[:20]}"
+                await send({"type": "input_audio_buffer.speech_stopped", "audio_end_ms": audio_ms, "item_id": item_id})
+                await commit(item_id)
+                await respond({})
+
+        await send({"type": "session.created", "session": dict(session)})
+        self._senders.add(send)
+
+        try:
+            async for message in ws:
+                event = json.loads(message)
+                event["_received_at"] = time.monotonic()
+                event["_connection"] = connection
+                self.received.append(event)
+                event_type = event.get("type")
+
+                if event_type == "session.update":
+                    session.update(event.get("session", {}))
+                    await send({"type": "session.updated", "session": dict(session)})
+
+                elif event_type == "conversation.item.create":
+                    item = dict(event.get("item", {}))
+                    item.setdefault("id", f"item_{uuid.uuid4().hex[:20]}")
+                    items.append(item)
+                    await send({"type": "conversation.item.created",
+                                "previous_item_id": items[-2]["id"] if len(items) > 1 else None,
+                                "item": item})
+
+                elif event_type == "input_audio_buffer.append":
+                    input_audio_bytes += len(event.get("audio", "")) * 3 // 4
+                    if (session.get("turn_detection") or {}).get("type") == "server_vad":
+                        await detect_turns(event.get("audio", ""))
+
+                elif event_type == "input_audio_buffer.commit":
+                    await commit()
+
+                elif event_type == "input_audio_buffer.clear":
+                    input_audio_bytes = 0
+                    await send({"type": "input_audio_buffer.cleared"})
+
+                elif event_type == "response.create":
+                    await respond(event.get("response", {}))
+
+                elif event_type == "response.cancel":
+                    if response_task is not None and not response_task.done():
+                        response_task.cancel()
+
+                elif event_type == "conversation.item.truncate":
+                    await send({"type": "conversation.item.truncated",
+                                "item_id": event.get("item_id"),
+                                "content_index": event.get("content_index", 0),
+                                "audio_end_ms": event.get("audio_end_ms", 0)})
+
+                else:
+                    await send({"type": "error", "error": {"type": "invalid_request_error",
+                                                           "message": f"Unknown event type: {event_type}"}})
+        except websockets.exceptions.ConnectionClosed:
+            logger.debug("Mock client disconnected.")
+        finally:
+            self._senders.discard(send)
+            self._sockets.pop(connection, None)
+            if response_task is not None and not response_task.done():
+                response_task.cancel()
+
+    async def _stream_response(self, send, modalities, items, audio_format="pcm16"):
+        """Stream one scripted response: created, deltas at the scripted pace, then the done events."""
+        script = self.script
+        response_id = f"resp_{uuid.uuid4().hex[:20]}"
+        item_id = f"item_{uuid.uuid4().hex[:20]}"
+        with_audio = "audio" in modalities
+        content_type = "audio" if with_audio else "text"
+        ids = {"response_id": response_id, "item_id": item_id, "output_index": 0, "content_index": 0}
+
+        # split the text across the deltas
+        words = script.text.split(" ")
+        delta_count = max(script.audio_chunks if with_audio else len(words), 1)
+        per_delta = math.ceil(len(words) / delta_count)
+        text_parts = [" ".join(words[i * per_delta:(i + 1) * per_delta]) + " " for i in range(delta_count)]
+        text_parts[-1] = text_parts[-1].rstrip()
+
+        status = "completed"
+        try:
+            await send({"type": "response.created", "response": {"id": response_id, "object": "realtime.response",
+                                                                  "status": "in_progress", "output": []}})
+            await send({"type": "response.output_item.added", "response_id": response_id, "output_index": 0,
+                        "item": {"id": item_id, "type": "message", "role": "assistant", "content": []}})
+            await send({"type": "response.content_part.added", **ids, "part": {"type": content_type}})
+            await asyncio.sleep(script.first_delta_delay)
+
+            for i in range(delta_count):
+                if i and script.delta_interval:
+                    await asyncio.sleep(script.delta_interval)
+                if with_audio:
+                    await send({"type": "response.audio_transcript.delta", **ids, "delta": text_parts[i]})
+                    await send({"type": "response.audio.delta", **ids, "delta": _tone(script.chunk_ms, script.tone_hz, audio_format)})
+                else:
+                    await send({"type": "response.text.delta", **ids, "delta": text_parts[i]})
+        except asyncio.CancelledError:
+            status = "cancelled"
+        except websockets.exceptions.ConnectionClosed:
+            return
+
+        # finish the content part and the item
+        transcript = "".join(text_parts)
+        if with_audio:
+            content = {"type": "audio", "transcript": transcript}
+            if status == "completed":
+                await send({"type": "response.audio.done", **ids})
+                await send({"type": "response.audio_transcript.done", **ids, "transcript": transcript})
+        else:
+            content = {"type": "text", "text": transcript}
+            if status == "completed":
+                await send({"type": "response.text.done", **ids, "text": transcript})
+        item = {"id": item_id, "type": "message", "role": "assistant", "status": status, "content": [content]}
+        items.append(item)
+        try:
+            if status == "completed":
+                await send({"type": "response.content_part.done", **ids, "part": content})
+            await send({"type": "response.output_item.done", "response_id": response_id, "output_index": 0, "item": item})
+            await send({"type": "response.done", "response": {"id": response_id, "object": "realtime.response",
+                                                              "status": status, "output": [item]}})
+        except websockets.exceptions.ConnectionClosed:
+            logger.debug("Mock client disconnected before the response finished.")
+
+
+async def serve_forever(host, port, script):
+    """Run the mock server until interrupted."""
+    async with MockRealtimeServer(host, port, script) as server:
+        print(f"Mock realtime server listening on {server.url}")
+        print(f"Point the client at it with: OPENAI_REALTIME_URL={server.url} python main.py")
+        await asyncio.Future()
+
+
+def free_port():
+    """Ask the OS for a free local port."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock_server(script: Optional[ResponseScript] = None):
+    """
+    Run the mock server in its own process, so its work does not count against the client being measured.
+    Returns (process, url) once it accepts connections.
+    """
+    script = script or ResponseScript()
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--port", str(port), "--audio-chunks", str(script.audio_chunks),
+         "--chunk-ms", str(script.chunk_ms), "--first-delta-delay", str(script.first_delta_delay),
+         "--delta-interval", str(script.delta_interval)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, f"ws://127.0.0.1:{port}"
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("The mock realtime server did not start.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the realtime websocket API.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+    parser.add_argument("--audio-chunks", type=int, default=10, help="Audio deltas per response.")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Audio duration per delta in milliseconds.")
+    parser.add_argument("--first-delta-delay", type=float, default=0.05, help="Seconds before the first delta.")
+    parser.add_argument("--delta-interval", type=float, default=0.0, help="Seconds between deltas.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(name)s:%(message)s')
+    try:
+        asyncio.run(serve_forever(args.host, args.port, ResponseScript(
+            audio_chunks=args.audio_chunks,
+            chunk_ms=args.chunk_ms,
+            first_delta_delay=args.first_delta_delay,
+            delta_interval=args.delta_interval,
+        )))
+    except KeyboardInterrupt:
+        pass
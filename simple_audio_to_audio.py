@@ -9,6 +9,7 @@ import sys
 from dotenv import load_dotenv
 from client.audio.audio_message_sender import trigger_response
 from client.session import send_session_update
+from client.audio.resampler import resample
 
 # Load environment variables
 load_dotenv()
@@ -28,7 +29,8 @@ ssl_context.verify_mode = ssl.CERT_NONE
 # Audio settings
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
-RATE = 16000
+RATE = 16000  # capture rate of the microphone
+SESSION_RATE = 24000  # the session expects 24kHz PCM16
 CHUNK = 1024
 DURATION = 5  # seconds
 
@@ -40,13 +42,13 @@ def capture_audio(duration=DURATION):
     stream.stop_stream()
     stream.close()
     p.terminate()
-    audio_bytes = b''.join(frames)
+    audio_bytes = resample(b''.join(frames), RATE, SESSION_RATE)
     return base64.b64encode(audio_bytes).decode('utf-8')
 
 def play_audio(audio_bytes):
     """Play the audio bytes using PyAudio."""
     p = pyaudio.PyAudio()
-    stream = p.open(format=FORMAT, channels=CHANNELS, rate=RATE, output=True)
+    stream = p.open(format=FORMAT, channels=CHANNELS, rate=SESSION_RATE, output=True)
     stream.write(audio_bytes)
     stream.stop_stream()
     stream.close()
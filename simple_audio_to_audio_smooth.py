@@ -11,6 +11,7 @@ from dotenv import load_dotenv
 from client.session import send_session_update
 from client.audio.audio_message_sender import trigger_response
 from client.audio.audio_playback import start_playback_thread, stop_playback_thread, enqueue_audio_chunk, FLUSH_COMMAND, wait_for_playback_finish
+from client.audio.resampler import resample
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -31,7 +32,8 @@ if not API_KEY:
 # Audio settings
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
-RATE = 16000
+RATE = 16000  # capture rate of the microphone
+SESSION_RATE = 24000  # the session expects 24kHz PCM16
 CHUNK = 1024
 DURATION = 5  # seconds
 
@@ -63,7 +65,7 @@ def capture_audio(duration=DURATION):
     stream.close()
     p.terminate()
 
-    audio_bytes = b''.join(frames)
+    audio_bytes = resample(b''.join(frames), RATE, SESSION_RATE)
     audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
     return audio_base64
 
@@ -9,6 +9,7 @@ import pyaudio
 from dotenv import load_dotenv
 from client.audio.audio_playback import enqueue_audio_chunk, start_playback_thread, stop_playback_thread, FLUSH_COMMAND, wait_for_playback_finish
 from client.session import send_session_update
+from client.audio.resampler import resample
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -29,7 +30,8 @@ ssl_context.verify_mode = ssl.CERT_NONE
 # Audio capture settings
 AUDIO_FORMAT = pyaudio.paInt16
 CHANNELS = 1
-RATE = 16000
+RATE = 16000  # capture rate of the microphone
+SESSION_RATE = 24000  # the session expects 24kHz PCM16
 CHUNK = 1024
 DURATION = 5  # Capture duration in seconds
 
@@ -41,7 +43,7 @@ def capture_audio(duration=DURATION):
     stream.stop_stream()
     stream.close()
     p.terminate()
-    audio_bytes = b''.join(frames)
+    audio_bytes = resample(b''.join(frames), RATE, SESSION_RATE)
     return base64.b64encode(audio_bytes).decode('utf-8')
 
 async def listen_for_audio_responses(ws):
@@ -0,0 +1,110 @@
+"""
+Interruption latency of a barge-in, driven by hand: the device callback is called directly and the clock is fake, so
+the bound holds on any machine. Run from the repository root:
+    python -m unittest tests.test_barge_in
+"""
+import asyncio
+import json
+import unittest
+from client.audio.playback_engine import PlaybackEngine
+from client.barge_in import BargeIn, SOURCE_SERVER_VAD
+
+SAMPLE_RATE = 24000
+BLOCK = 0.02    # seconds pulled by each device callback
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeStream:
+    """An output stream that never calls back by itself, the test pulls the blocks."""
+    def __init__(self, callback, **kwargs):
+        self.callback = callback
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+class BargeInLatencyTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.streams = []
+        self.engine = PlaybackEngine(sample_rate=SAMPLE_RATE, block_duration=BLOCK, clock=self.clock,
+                                     stream_factory=self.open_stream)
+        self.engine.start()
+        self.block_bytes = self.engine.blocksize * self.engine.frame_size
+
+    def open_stream(self, **kwargs):
+        self.streams.append(FakeStream(**kwargs))
+        return self.streams[-1]
+
+    def pull(self):
+        """Let one device period pass and return the block the device played."""
+        self.clock.now += BLOCK
+        out = bytearray(self.block_bytes)
+        self.streams[0].callback(out, self.engine.blocksize, None, None)
+        return bytes(out)
+
+    def test_cancel_silences_playback_within_one_period(self):
+        # one second of the assistant's answer, of which 200 ms are played
+        self.engine.write(b"\x01\x02" * SAMPLE_RATE, item_id="item_1")
+        for _ in range(10):
+            self.assertTrue(any(self.pull()))
+
+        ws = FakeWebSocket()
+        barge_in = BargeIn(ws, self.engine.interrupt, lambda: self.engine.is_playing, clock=self.clock)
+        barge_in.observe({"type": "response.created", "response": {"id": "resp_1"}})
+        barge_in.observe({"type": "response.output_item.added", "item": {"id": "item_1"}})
+        record = asyncio.run(barge_in.interrupt(SOURCE_SERVER_VAD))
+
+        # the very next period is silent, and so is the rest of the item when it arrives late
+        self.assertFalse(any(self.pull()))
+        self.assertLessEqual(self.engine.flush_latencies[-1], BLOCK)
+        self.engine.write(b"\x01\x02" * SAMPLE_RATE, item_id="item_1")
+        self.assertFalse(any(self.pull()))
+
+        # the response is cancelled and the item truncated at what the device played
+        self.assertEqual([event["type"] for event in ws.sent], ["response.cancel", "conversation.item.truncate"])
+        self.assertEqual(record["audio_end_ms"], 200)
+        self.assertEqual(ws.sent[1]["audio_end_ms"], 200)
+        self.assertEqual(self.engine.underruns, 0)
+
+    def test_interrupt_during_a_callback_is_not_an_underrun(self):
+        self.engine.write(b"\x01\x02" * SAMPLE_RATE, item_id="item_1")
+        for _ in range(10):
+            self.pull()
+
+        # the barge-in lands while the device callback is on its way to the lock
+        engine, lock = self.engine, self.engine._lock
+
+        class InterruptFirst:
+            def __enter__(self):
+                engine._lock = lock
+                engine.interrupt()
+                return lock.__enter__()
+
+            def __exit__(self, *exc_info):
+                return lock.__exit__(*exc_info)
+
+        engine._lock = InterruptFirst()
+        self.assertFalse(any(self.pull()))
+        self.assertEqual(engine.underruns, 0)
+        self.assertFalse(engine.is_playing)
+
+if __name__ == "__main__":
+    unittest.main()